@@ -0,0 +1,224 @@
+# app/adf_text.py
+
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Hashable, List, Optional, Tuple
+from .config import settings
+
+# Inline nodes that render as text inside a paragraph, heading or code block
+_TEXT_BLOCKS = ("paragraph", "heading", "codeBlock")
+_INLINE_NODES = ("text", "hardBreak", "mention", "emoji", "inlineCard", "status", "date")
+
+# Stack markers around table rows and cells, which collect their text in their own buffer
+_START_CELL = "start_cell"
+_END_CELL = "end_cell"
+_END_ROW = "end_row"
+
+_SPACES = re.compile(r"[ \t\u00a0]+")
+
+def _inline_atom(node: Dict) -> str:
+    # Text of an inline node without content (mentions, emojis, cards, ...)
+    node_type = node.get("type")
+    attrs = node.get("attrs") or {}
+    if node_type == "text":
+        return node.get("text", "")
+    if node_type == "hardBreak":
+        return "\n"
+    if node_type == "emoji":
+        return attrs.get("text") or attrs.get("shortName", "")
+    if node_type == "inlineCard":
+        return attrs.get("url", "")
+    if node_type == "date":
+        try:
+            return datetime.fromtimestamp(int(attrs.get("timestamp")) / 1000, timezone.utc).date().isoformat()
+        except (TypeError, ValueError):
+            return ""
+    return attrs.get("text", "")
+
+def _int_attr(node: Dict, name: str, default: int) -> int:
+    # Integer attribute of a node; malformed values (None, "", "x") fall back to the default
+    try:
+        return int((node.get("attrs") or {}).get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+def inline_text(node: Dict) -> str:
+    """
+    Text of a paragraph-like node: inline nodes concatenated, whitespace collapsed per line.
+    Code blocks keep their line layout.
+    """
+    content = node.get("content") or []
+    parts = []
+    for child in content:
+        # Common case: plain text nodes with marks only
+        if child.__class__ is not dict or child.get("type") != "text":
+            break
+        parts.append(child.get("text", ""))
+    else:
+        content = ()
+    if content:
+        parts = []
+        stack = list(reversed(content))
+        while stack:
+            child = stack.pop()
+            if not isinstance(child, dict):
+                continue
+            if child.get("content"):
+                stack.extend(reversed(child["content"]))
+            else:
+                parts.append(_inline_atom(child))
+    text = "".join(parts)
+    if node.get("type") == "codeBlock":
+        return text.strip("\n")
+    if "\n" in text:
+        return "\n".join(_SPACES.sub(" ", line).strip() for line in text.split("\n")).strip()
+    if "  " in text or "\t" in text or "\u00a0" in text:
+        text = _SPACES.sub(" ", text)
+    return text.strip()
+
+def _emit(lines: List[str], text: str, first: str, rest: str):
+    # Append a block's text: its first line with the first prefix, following lines with the rest prefix
+    if "\n" not in text:
+        lines.append(first + text)
+        return
+    text_lines = text.split("\n")
+    lines.append(first + text_lines[0])
+    lines.extend(rest + line for line in text_lines[1:])
+
+def _simple_cell_text(cell: Dict) -> Optional[str]:
+    # Text of a table cell holding only paragraphs, None when it needs the full walk
+    texts = []
+    for child in cell.get("content") or []:
+        if child.__class__ is not dict or child.get("type") not in _TEXT_BLOCKS:
+            return None
+        texts.append(inline_text(child).replace("\n", " "))
+    return " ".join(text for text in texts if text)
+
+def flatten_adf(adf: Dict) -> str:
+    """
+    Flatten an Atlassian Document Format (ADF) document to compact, structure-aware plain text.
+    Headings become "#" lines, list items "- " or "1. " lines (nested lists indented),
+    table rows "| a | b |" lines and block quotes "> " lines.
+    The document is walked with an explicit stack, so nesting depth is not limited by recursion.
+    :param adf: ADF structure (dict), e.g. a Jira description
+    :return: Plain text, one line per block
+    """
+    if not adf or not isinstance(adf, dict):
+        return ""
+    # Line buffers: the document, plus one per open table row and cell
+    outputs: List[List[str]] = [[]]
+    # Frames: (node, prefix of the node's first line, prefix of its following lines)
+    stack: List[Tuple[object, str, str]] = [(adf, "", "")]
+    while stack:
+        node, first, rest = stack.pop()
+        if node.__class__ is str:
+            if node == _START_CELL:
+                outputs.append([])
+            elif node == _END_CELL:
+                cell = " ".join(line.strip() for line in outputs.pop() if line.strip())
+                outputs[-1].append(cell)
+            else:
+                cells = outputs.pop()
+                if any(cells):
+                    outputs[-1].append(f"{first}| " + " | ".join(cells) + " |")
+            continue
+        if not isinstance(node, dict):
+            continue
+
+        node_type = node.get("type")
+        children = node.get("content") or []
+        if node_type in _TEXT_BLOCKS or node_type in _INLINE_NODES:
+            text = inline_text(node) if node_type in _TEXT_BLOCKS else inline_text({"content": [node]})
+            if text:
+                if node_type == "heading":
+                    text = "#" * min(max(_int_attr(node, "level", 1), 1), 6) + " " + text
+                _emit(outputs[-1], text, first, rest)
+            continue
+
+        if node_type in ("bulletList", "orderedList"):
+            start = _int_attr(node, "order", 1) if node_type == "orderedList" else 1
+            frames = []
+            for index, item in enumerate(children):
+                marker = "- " if node_type == "bulletList" else f"{start + index}. "
+                frames.append((item, (first if index == 0 else rest) + marker, rest + " " * len(marker)))
+            stack.extend(reversed(frames))
+            continue
+
+        if node_type == "tableRow":
+            cells = [_simple_cell_text(cell) for cell in children]
+            if None not in cells:
+                if any(cells):
+                    outputs[-1].append(f"{first}| " + " | ".join(cells) + " |")
+                continue
+            # Cells with lists or other nested blocks collect their lines in their own buffer
+            outputs.append([])
+            stack.append((_END_ROW, first, rest))
+            for cell in reversed(children):
+                stack.extend([(_END_CELL, "", ""), (cell, "", ""), (_START_CELL, "", "")])
+            continue
+
+        if node_type == "blockquote":
+            first, rest = first + "> ", rest + "> "
+        # Containers (doc, list items, tables, panels, ...): only the first child continues the first line
+        for index in range(len(children) - 1, 0, -1):
+            stack.append((children[index], rest, rest))
+        if children:
+            stack.append((children[0], first, rest))
+
+    return "\n".join(outputs[0]).strip()
+
+class FlattenMemo:
+    """
+    Bounded LRU of values derived from ADF descriptions, keyed by (issue key, updated).
+    A story's description only changes together with its `updated` timestamp, so
+    entries never need invalidation; old versions are evicted as LRU.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        :param max_entries: Entries kept before the least recently used is evicted
+        """
+        self.max_entries = max_entries or settings.ADF_MEMO_MAX_ENTRIES
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[object]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: object):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+# Shared memo of flattened story descriptions
+flatten_memo = FlattenMemo()
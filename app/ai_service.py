@@ -1,17 +1,95 @@
 # app/ai_service.py
 
-import requests
+import asyncio
+import copy
 import json
 import logging
+import math
 import re
-from typing import List, Dict
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from .config import settings
-from .jira_service import JiraService
+from .jira_service import JiraService, AsyncJiraService
+from .http_transport import HTTPTransport
+from .generation_cache import GenerationCache, generation_cache as shared_generation_cache
+from .generation_stats import AUTO_MODEL, GenerationStats, generation_stats as shared_generation_stats
+from .llm_json import JSONArrayStreamParser, extract_json_array
+from .adf_text import FlattenMemo, flatten_adf, flatten_memo as shared_flatten_memo, inline_text
+from .schemas import GeneratedAIOTestCases
+from pydantic import TypeAdapter, ValidationError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+def _strict_json_schema(node):
+    # Adapt a pydantic JSON schema to strict structured outputs: every property required, no extra properties
+    if isinstance(node, list):
+        return [_strict_json_schema(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+    strict = {}
+    for key, value in node.items():
+        if key == "default" or (key == "title" and isinstance(value, str)):
+            continue
+        if key == "properties":
+            strict[key] = {name: _strict_json_schema(prop) for name, prop in value.items()}
+        else:
+            strict[key] = _strict_json_schema(value)
+    if "properties" in strict:
+        strict["required"] = list(strict["properties"])
+        strict["additionalProperties"] = False
+    return strict
+
+# Validator and response_format of structured-output mode, built once from the AIO test case schema
+GENERATED_TEST_CASES_ADAPTER = TypeAdapter(GeneratedAIOTestCases)
+TEST_CASES_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "test_cases",
+        "strict": True,
+        "schema": _strict_json_schema(GeneratedAIOTestCases.model_json_schema()),
+    },
+}
+
+# Story-independent instructions sent as the system message, so providers can cache them as a prompt prefix.
+# status and scriptType are constants added by normalize_test_case and are not requested from the model.
+TEST_CASE_SYSTEM_PROMPT = (
+    "You are a professional QA engineer writing test cases for Jira stories.\n"
+    "For the given story, generate as many relevant test cases as needed.\n\n"
+    "Each test case must be a JSON object with the following fields:\n"
+    "- title (string)\n"
+    "- description (string)\n"
+    "- precondition (string, optional)\n"
+    "- steps (array of objects, each with: step (string), data (string, optional), expectedResult (string), stepType (string, always exactly \"TEXT\"))\n"
+    "- jiraRequirementIDs (array of strings, always contains the Story ID)\n\n"
+    "Example for Story ID 10001:\n"
+    "[{\"title\": \"Login with valid credentials\", \"description\": \"Verify that a user can log in with valid email and password.\", "
+    "\"precondition\": \"User is on the login page.\", \"steps\": [{\"step\": \"Enter valid email and password\", \"data\": \"valid@email.com / valid_password123\", "
+    "\"expectedResult\": \"Credentials are entered\", \"stepType\": \"TEXT\"}, {\"step\": \"Click \\\"Login\\\"\", \"data\": \"\", "
+    "\"expectedResult\": \"User is redirected to dashboard\", \"stepType\": \"TEXT\"}], \"jiraRequirementIDs\": [\"10001\"]}]\n\n"
+    "Output only a valid JSON array of test cases, without any explanations or extra text. "
+    "If the output does not fit, do not cut off in the middle—return only complete objects. "
+    "If a field is missing, use an empty string (\"\") or an empty array as appropriate, instead of null or omitting the field."
+)
+
+# System message used when the instructions are part of the user prompt (PROMPT_STATIC_PREFIX disabled)
+LEGACY_SYSTEM_PROMPT = "You are an expert QA assistant."
+
+_TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough BPE token count without a tokenizer: a token per punctuation character and per 4 word characters.
+    Good enough to compare prompt variants; providers report exact counts in `usage`.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PIECE.findall(text))
+
 class AIService:
+    # Jira client class used to fetch stories (overridden by the async variant)
+    jira_service_class = JiraService
+
     def __init__(
         self,
         jira_domain: str,
@@ -19,52 +97,125 @@ class AIService:
         jira_api_token: str,
         openrouter_url: str,
         openrouter_api_key: str,
+        transport: Optional[HTTPTransport] = None,
+        generation_cache: Optional[GenerationCache] = None,
+        generation_stats: Optional[GenerationStats] = None,
+        flatten_memo: Optional[FlattenMemo] = None,
     ):
         """
         Initialize AIService with configuration from settings.
+        :param transport: Shared pooled HTTP transport (a private one is created if omitted)
+        :param generation_cache: LLM result cache (the process-wide shared cache if omitted)
+        :param generation_stats: Generation history behind model="auto" (the process-wide shared history if omitted)
+        :param flatten_memo: Memo of flattened descriptions per (issue key, updated) (the process-wide shared memo if omitted)
         """
-        self.jira_service = JiraService(
+        self.transport = transport or HTTPTransport()
+        self.generation_cache = generation_cache or shared_generation_cache
+        self.generation_stats = generation_stats or shared_generation_stats
+        self.flatten_memo = flatten_memo or shared_flatten_memo
+        self.jira_service = self.jira_service_class(
             domain=jira_domain or settings.JIRA_DOMAIN,
             email=jira_email or settings.JIRA_EMAIL,
-            api_token=jira_api_token or settings.JIRA_API_TOKEN
+            api_token=jira_api_token or settings.JIRA_API_TOKEN,
+            transport=self.transport
         )
 
         self.openrouter_url = openrouter_url or settings.OPENROUTER_URL
         self.openrouter_api_key = openrouter_api_key or settings.OPENROUTER_API_KEY
+
+        # Single-flight bookkeeping: identical concurrent generations share one upstream call
+        self._inflight: Dict[Tuple, object] = {}
+        self._inflight_lock = threading.Lock()
+        self.flights = 0
+        self.coalesced = 0
+
+        # Parse outcomes per model and mode ("structured" or "prompt")
+        self._parse_stats: Dict[Tuple[str, str], Dict[str, int]] = {}
               
     
     @staticmethod
     def flatten_adf_description(adf: dict) -> str:
         """
         Flatten the Atlassian Document Format (ADF) description to plain text.
+        Lists, tables and headings keep their structure as bullet, "| cell |" and "#" lines.
         :param adf: ADF structure (dict) from the Jira story's description field
         :return: Plain text description
         """
-        plain_text = []
+        return flatten_adf(adf)
 
-        def extract_text(nodes):
-            # Recursively extract text from ADF nodes
-            for node in nodes:
-                if node.get("type") == "text":
-                    plain_text.append(node.get("text", ""))
-                elif "content" in node:
-                    extract_text(node["content"])
+    @staticmethod
+    def split_adf_sections(adf: dict, max_chars: Optional[int] = None) -> List[str]:
+        """
+        Split an ADF description into chunks that can be generated separately.
+        Headings start a new section, every list item (typically an acceptance criterion)
+        is kept whole, and consecutive blocks of a section are packed up to max_chars.
+        :param adf: ADF structure (dict) from the Jira story's description field
+        :param max_chars: Maximum chunk size in characters (settings.GENERATION_CHUNK_MAX_CHARS if omitted)
+        :return: Plain text chunks, each starting with its section heading
+        """
+        if not adf or not isinstance(adf, dict):
+            return []
+        units = []
+        heading = ""
+        for block in adf.get("content", []):
+            block_type = block.get("type")
+            if block_type == "heading":
+                heading = inline_text(block)
+                continue
+            items = block.get("content", []) if block_type in ("bulletList", "orderedList") else [block]
+            for item in items:
+                text = AIService.flatten_adf_description(item)
+                if text.strip():
+                    units.append((heading, text))
+        return AIService._pack_sections(units, max_chars or settings.GENERATION_CHUNK_MAX_CHARS)
 
-        if adf and isinstance(adf, dict):
-            extract_text(adf.get("content", []))
-        
-        return " ".join(plain_text)
+    @staticmethod
+    def split_text_sections(text: str, max_chars: Optional[int] = None) -> List[str]:
+        """
+        Split an already flattened description (e.g. from the local mirror) into chunks on sentence boundaries.
+        """
+        units = [("", sentence) for sentence in re.split(r"(?<=[.!?])\s+", text or "") if sentence.strip()]
+        return AIService._pack_sections(units, max_chars or settings.GENERATION_CHUNK_MAX_CHARS)
+
+    @staticmethod
+    def _pack_sections(units: List[Tuple[str, str]], max_chars: int) -> List[str]:
+        # Pack consecutive (heading, text) units of the same section into chunks of at most max_chars
+        chunks = []
+        heading = None
+        lines: List[str] = []
+        size = 0
+        for unit_heading, text in units:
+            if lines and (unit_heading != heading or size + len(text) > max_chars):
+                chunks.append("\n".join(([heading] if heading else []) + lines))
+                lines, size = [], 0
+            heading = unit_heading
+            lines.append(text)
+            size += len(text) + 1
+        if lines:
+            chunks.append("\n".join(([heading] if heading else []) + lines))
+        return chunks
 
 #-----------------------------------------------------------------------------------------------------------
     @staticmethod
-    def create_test_case_prompt(story_key: str, story_id: str, summary: str, description: str) -> str:
+    def create_test_case_prompt(story_key: str, story_id: str, summary: str, description: str, static_prefix: Optional[bool] = None) -> str:
         """
         Create a prompt for OpenRouter AI to generate multiple structured test cases in a specific JSON format.
+        With a static prefix the prompt only holds the story; the instructions are sent
+        as the TEST_CASE_SYSTEM_PROMPT system message.
         :param story_key: Jira story key, e.g. 'TG-1'
         :param summary: Story summary
         :param description: Flattened story description
+        :param static_prefix: Leave the instructions to the system message (settings.PROMPT_STATIC_PREFIX if omitted)
         :return: Prompt string
         """
+        if settings.PROMPT_STATIC_PREFIX if static_prefix is None else static_prefix:
+            return (
+                f"Jira Key: {story_key}\n"
+                f"Story ID: {story_id}\n"
+                f"Summary: {summary}\n"
+                f"Description: {description}\n\n"
+                "Generate the test cases for this story."
+            )
         prompt = (
             f"You are a professional QA engineer.\n"
             f"Based on the following Jira story, generate as many relevant test cases as needed.\n"
@@ -122,147 +273,444 @@ class AIService:
             "If a field is missing, use an empty string (\"\") or an empty array as appropriate, instead of null or omitting the field."
         )
         return prompt
-#-----------------------------------------------------------------------------------------------------------
+
     @staticmethod
-    def send_prompt_to_openrouter(prompt: str, model: str, temperature: float, max_tokens: int) -> dict:
-      url = settings.OPENROUTER_URL
+    def create_packed_test_case_prompt(stories: List[Dict]) -> str:
+        """
+        Create one prompt asking for the test cases of several small stories at once.
+        Every test case names the story it belongs to in a `storyKey` field.
+        :param stories: Story dictionaries (see story_from_jira_issue)
+        :return: Prompt string
+        """
+        story_blocks = "\n\n".join(
+            f"Jira Key: {story['key']}\n"
+            f"Story ID: {story['id']}\n"
+            f"Summary: {story['summary']}\n"
+            f"Description: {story['description']}"
+            for story in stories
+        )
+        if settings.PROMPT_STATIC_PREFIX:
+            return (
+                f"Generate the test cases of each of the following {len(stories)} Jira stories.\n\n"
+                f"{story_blocks}\n\n"
+                "Every test case additionally has a storyKey field (string, the Jira Key of the story it belongs to), "
+                "and its jiraRequirementIDs contain the Story ID of that story. "
+                "Output one JSON array containing the test cases of all stories and cover every story."
+            )
+        return (
+            f"You are a professional QA engineer.\n"
+            f"Based on each of the following {len(stories)} Jira stories, generate as many relevant test cases as needed.\n\n"
+            f"{story_blocks}\n\n"
+            "Each test case must be a JSON object with the following fields:\n"
+            "- storyKey (string, the Jira Key of the story the test case belongs to)\n"
+            "- title (string)\n"
+            "- description (string)\n"
+            "- precondition (string, optional)\n"
+            "- steps (array of objects, each with: step (string), data (string, optional), expectedResult(string), stepType(string, always exactly this value):\"TEXT\")\n"
+            "- jiraRequirementIDs (array of strings, always contains the Story ID of that story)\n\n"
+            "Example:\n"
+            "[\n"
+            f"  {{\"storyKey\": \"{stories[0]['key']}\", \"title\": \"Update user profile name\", \"description\": \"Verify that a user can change the profile name.\", "
+            "\"precondition\": \"User is logged in.\", \"steps\": [{\"step\": \"Change the name and save\", \"data\": \"Jane\", "
+            f"\"expectedResult\": \"The new name is shown\", \"stepType\": \"TEXT\"}}], \"jiraRequirementIDs\": [\"{stories[0]['id']}\"]}}\n"
+            "]\n\n"
+            "Output only one valid JSON array containing the test cases of all stories, without any explanations or extra text. "
+            "Cover every story. If the output does not fit, do not cut off in the middle—return only complete objects. "
+            "If a field is missing, use an empty string (\"\") or an empty array as appropriate, instead of null or omitting the field."
+        )
+
+    @staticmethod
+    def create_continuation_prompt(prompt: str, test_cases: List[Dict]) -> str:
+        """
+        Create a follow-up prompt asking for the test cases missing from a truncated response.
+        :param prompt: Original story prompt
+        :param test_cases: Test cases generated so far
+        :return: Prompt string
+        """
+        if not test_cases:
+            return (
+                f"{prompt}\n\n"
+                "Your previous answer was cut off before the first test case was complete. "
+                "Keep each test case short and return only complete objects in the JSON array."
+            )
+        titles = "\n".join(f"- {tc['title']}" for tc in test_cases)
+        return (
+            f"{prompt}\n\n"
+            "Your previous answer was cut off. These test cases were already generated:\n"
+            f"{titles}\n\n"
+            "Generate only the remaining test cases that are not covered above, in the same JSON array format. "
+            "Return an empty array [] if nothing is missing."
+        )
+#-----------------------------------------------------------------------------------------------------------
+    def _openrouter_request(self, prompt: str, model: str, temperature: float, max_tokens: int, structured: bool = False) -> Tuple[str, Dict, Dict]:
+      # URL, headers and JSON body of an OpenRouter chat completion request
+      url = self.openrouter_url
       headers = {
-          "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+          "Authorization": f"Bearer {self.openrouter_api_key}",
           "Content-Type": "application/json"
       }
       data = {
           "model": model,  # Model dynamically passed
           "messages": [
-              {"role": "system", "content": "You are an expert QA assistant."},
+              self._system_message(model),
               {"role": "user", "content": prompt}
           ],
           "temperature": temperature,
           "max_tokens": max_tokens
       }
-      response = requests.post(url, headers=headers, json=data)
+      if structured:
+          # Ask for output matching the test case JSON schema; providers without support ignore it
+          data["response_format"] = TEST_CASES_RESPONSE_FORMAT
+      return url, headers, data
+
+    @staticmethod
+    def _system_message(model: str) -> Dict:
+      # Static instructions as system message, with an explicit cache breakpoint for providers that need one
+      if not settings.PROMPT_STATIC_PREFIX:
+          return {"role": "system", "content": LEGACY_SYSTEM_PROMPT}
+      if model.startswith(tuple(settings.PROMPT_CACHE_CONTROL_MODELS)):
+          return {"role": "system", "content": [{"type": "text", "text": TEST_CASE_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]}
+      return {"role": "system", "content": TEST_CASE_SYSTEM_PROMPT}
+
+    def _cache_key(self, prompt: str, model: str, temperature: float, max_tokens: int, structured: bool = False) -> str:
+        # Generation cache key, including the system message the prompt is sent with
+        system_prompt = self._system_message(model)["content"]
+        return self.generation_cache.make_key(prompt, model, temperature, max_tokens, structured, json.dumps(system_prompt) if isinstance(system_prompt, list) else system_prompt)
+
+    def prompt_token_report(self, story: Dict) -> Dict:
+        """
+        Estimated prompt tokens of a story with the full legacy prompt and with the static prefix.
+        Once the prefix is cached by the provider, only `story_tokens` are billed at the full rate.
+        :param story: Story dictionary (see story_from_jira_issue)
+        :return: Token counts before and after, with the saving per uncached token
+        """
+        legacy = self.create_test_case_prompt(story["key"], story["id"], story["summary"], story["description"], static_prefix=False)
+        compact = self.create_test_case_prompt(story["key"], story["id"], story["summary"], story["description"], static_prefix=True)
+        before = estimate_tokens(LEGACY_SYSTEM_PROMPT) + estimate_tokens(legacy)
+        prefix_tokens = estimate_tokens(TEST_CASE_SYSTEM_PROMPT)
+        story_tokens = estimate_tokens(compact)
+        return {
+            "key": story["key"],
+            "before_tokens": before,
+            "after_tokens": prefix_tokens + story_tokens,
+            "static_prefix_tokens": prefix_tokens,
+            "story_tokens": story_tokens,
+            "saved_tokens_uncached": before - story_tokens,
+            "saved_percent_uncached": round(100 * (before - story_tokens) / before, 1) if before else 0.0,
+        }
+
+    def send_prompt_to_openrouter(self, prompt: str, model: str, temperature: float, max_tokens: int, structured: bool = False) -> dict:
+      url, headers, data = self._openrouter_request(prompt, model, temperature, max_tokens, structured)
+      response = self.transport.post(url, headers=headers, json=data)
       return response.json() if response.status_code == 200 else {"error": response.text}
     
+    @staticmethod
+    def normalize_test_case(tc: Dict, i: int = 0) -> Optional[Dict]:
+        """
+        Normalize one parsed test case to the AIO test case shape.
+        :param tc: Test case object parsed from the AI response
+        :param i: Position of the test case, used in log messages
+        :return: Normalized test case, or None if it must be skipped
+        """
+        if not isinstance(tc, dict):
+            logging.warning(f"Test case {i} is not a dictionary, skipping")
+            return None
+
+        try:
+            steps = tc.get("steps", [])
+            if not isinstance(steps, list):
+                steps = []
+
+            # Properly structured steps
+            structured_steps = [
+                                {
+                                "step": step.get("step", "").strip(),
+                                "data": step.get("data", "").strip(),
+                                "expectedResult": step.get("expectedResult", "").strip(),
+                                "stepType": "TEXT"
+                                }
+                                for step in steps
+                                if isinstance(step, dict)
+                                ]
+
+            normalized_case = {
+                "title": str(tc.get("title") or "").strip(),
+                "description": str(tc.get("description") or "").strip(),
+                "precondition": str(tc.get("precondition") or "").strip(),
+                "status": {
+                    "name": "Published",
+                    "description": "The test is ready for execution"
+                },
+                "scriptType": {
+                    "name": "Classic",
+                    "description": "Steps represented in default representation - step, data and expected results",
+                    "isEnabled": True
+                },
+                "steps": structured_steps,
+                "jiraRequirementIDs": tc.get("jiraRequirementIDs", []) if isinstance(tc.get("jiraRequirementIDs"), list) else [] 
+            }
+
+            # Skip test cases with empty title (required field)
+            if not normalized_case["title"]:
+                logging.warning(f"Test case {i} has empty title, skipping")
+                return None
+
+            logging.info(f"Successfully normalized test case {i}: {normalized_case['title']}")
+            return normalized_case
+
+        except Exception as e:
+            logging.error(f"Error normalizing test case {i}: {e}")
+            return None
+
     @staticmethod
     def safe_parse_test_cases(ai_content: str) -> List[Dict[str, str]]:
         """
         Safely parse test cases from AI response, handling incomplete or slightly invalid JSON.
         """
+        return AIService._parse_test_cases(ai_content)[0]
+
+    @staticmethod
+    def _parse_test_cases(ai_content: str) -> Tuple[List[Dict[str, str]], bool]:
+        # Normalized test cases of an AI response, and whether its JSON array was closed
         if not ai_content or ai_content.strip() == "":
             logging.error("AI content is empty")
-            return []
+            return [], False
 
-        # Use regex to extract the first JSON array from the response
-        match = re.search(r'\[\s*{.*}\s*\]', ai_content, re.DOTALL)
-        if not match:
+        # Single linear pass over the response; complete objects survive a truncated array
+        test_cases, complete = extract_json_array(ai_content)
+        if not test_cases:
             logging.error("No JSON array found in AI response")
-            return []
+            logging.error(f"Attempted to parse: {ai_content[:500]}...")
+            return [], complete
+        if not complete:
+            logging.warning(f"AI response JSON array is truncated, salvaged {len(test_cases)} complete test cases")
 
-        json_str = match.group(0)
-        logging.info(f"Attempting to parse JSON of length: {len(json_str)}")
+        # Normalize each test case to ensure all required fields exist
+        normalized = []
+        for i, tc in enumerate(test_cases):
+            normalized_case = AIService.normalize_test_case(tc, i)
+            if normalized_case is not None:
+                normalized.append(normalized_case)
 
-        def try_parse(s):
-            try:
-                return json.loads(s)
-            except Exception as e:
-                logging.error(f"JSON parse error: {e}")
-                return None
+        logging.info(f"Successfully normalized {len(normalized)} test cases out of {len(test_cases)}")
+        return normalized, complete
 
-        # First attempt
-        test_cases = try_parse(json_str)
-        if test_cases is None:
-            # Try to auto-fix common issues: remove trailing commas before } or ]
-            fixed = re.sub(r',(\s*[}\]])', r'\1', json_str)
-            test_cases = try_parse(fixed)
-            if test_cases is None:
-                logging.error(f"Attempted to parse: {json_str[:500]}...")
-                return []
+    def story_from_jira_issue(self, jira_story: Dict) -> Dict:
+        """
+        Extract story key, id, summary, flattened description and `updated` from a Jira issue.
+        :param jira_story: Full issue object as returned by Jira
+        :return: Story dictionary in the same shape as a mirrored story
+        """
+        fields = jira_story.get("fields", {})
+        return {
+            "key": jira_story.get("key", ""),
+            "id": jira_story.get("id", ""),
+            "summary": fields.get("summary", ""),
+            "description": self._flatten_description(jira_story.get("key", ""), fields),
+            "updated": fields.get("updated"),
+            # Source ADF, split into sections only for section-chunked generation
+            "adf": fields.get("description"),
+        }
 
-        if not isinstance(test_cases, list):
-            logging.error("AI response is not a list")
-            return []
+    def _memo_key(self, issue_key: str, updated: Optional[str], part: str) -> Optional[Tuple]:
+        # Flatten memo key of a story; stories without a key or `updated` timestamp are not memoized
+        return (self.jira_service.domain, issue_key, updated, part) if issue_key and updated else None
 
-        # Normalize each test case to ensure all required fields exist
-        normalized = []
-        for i, tc in enumerate(test_cases):
-            if not isinstance(tc, dict):
-                logging.warning(f"Test case {i} is not a dictionary, skipping")
-                continue
+    def _memoized(self, memo_key: Optional[Tuple], compute):
+        # Memoized value while the issue's `updated` timestamp is unchanged
+        value = self.flatten_memo.get(memo_key) if memo_key else None
+        if value is None:
+            value = compute()
+            if memo_key:
+                self.flatten_memo.put(memo_key, value)
+        return value
 
-            try:
-                steps = tc.get("steps", [])
-                if not isinstance(steps, list):
-                    steps = []
-
-                # Properly structured steps
-                structured_steps = [
-                                    {
-                                    "step": step.get("step", "").strip(),
-                                    "data": step.get("data", "").strip(),
-                                    "expectedResult": step.get("expectedResult", "").strip(),
-                                    "stepType": "TEXT"
-                                    }
-                                    for step in steps
-                                    if isinstance(step, dict)
-                                    ]
-
-                normalized_case = {
-                    "title": str(tc.get("title") or "").strip(),
-                    "description": str(tc.get("description") or "").strip(),
-                    "precondition": str(tc.get("precondition") or "").strip(),
-                    "status": {
-                        "name": "Published",
-                        "description": "The test is ready for execution"
-                    },
-                    "scriptType": {
-                        "name": "Classic",
-                        "description": "Steps represented in default representation - step, data and expected results",
-                        "isEnabled": True
-                    },
-                    "steps": structured_steps,
-                    "jiraRequirementIDs": tc.get("jiraRequirementIDs", []) if isinstance(tc.get("jiraRequirementIDs"), list) else [] 
-                }
+    def _flatten_description(self, issue_key: str, fields: Dict) -> str:
+        # Flattened description of an issue
+        adf = fields.get("description") or {}
+        return self._memoized(self._memo_key(issue_key, fields.get("updated"), "description"), lambda: self.flatten_adf_description(adf))
 
-                # Skip test cases with empty title (required field)
-                if not normalized_case["title"]:
-                    logging.warning(f"Test case {i} has empty title, skipping")
-                    continue
+    def _story_sections(self, story: Dict) -> List[str]:
+        # Structure-aware chunks of a Jira story's ADF; mirrored stories only have text and split on sentences
+        if not story.get("adf"):
+            return self.split_text_sections(story["description"])
+        memo_key = self._memo_key(story.get("key", ""), story.get("updated"), "sections")
+        return list(self._memoized(memo_key, lambda: tuple(self.split_adf_sections(story["adf"]))))
 
-                normalized.append(normalized_case)
-                logging.info(f"Successfully normalized test case {i}: {normalized_case['title']}")
+    @staticmethod
+    def is_packable(story: Dict) -> bool:
+        # Small stories share a prompt; larger ones are generated on their own
+        return len(story.get("summary") or "") + len(story.get("description") or "") <= settings.PACKING_MAX_STORY_CHARS
+
+    @staticmethod
+    def _packs(stories: List[Dict]) -> Tuple[List[List[Dict]], List[Dict]]:
+        # Packs of small stories, and the stories generated one by one (large ones and a leftover single story)
+        small = [story for story in stories if AIService.is_packable(story)]
+        single = [story for story in stories if not AIService.is_packable(story)]
+        size = max(1, settings.PACKING_MAX_STORIES)
+        packs = [small[i:i + size] for i in range(0, len(small), size)]
+        if packs and len(packs[-1]) == 1:
+            single.extend(packs.pop())
+        return packs, single
 
-            except Exception as e:
-                logging.error(f"Error normalizing test case {i}: {e}")
+    def split_packed_test_cases(self, ai_content: str, stories: List[Dict]) -> Dict[str, List[Dict]]:
+        """
+        Split the response to a packed prompt into normalized test cases per story key.
+        Test cases are matched by `storyKey`, or by requirement ID when the key is missing,
+        and always reference the requirement ID of the story they were matched to.
+        :return: Test cases per story key; stories without test cases have an empty list
+        """
+        return self._split_packed_test_cases(ai_content, stories)[0]
+
+    def _split_packed_test_cases(self, ai_content: str, stories: List[Dict]) -> Tuple[Dict[str, List[Dict]], Optional[str]]:
+        # Test cases per story key, and the story whose test cases a truncated response cut off
+        keys = {story["key"].upper(): story["key"] for story in stories}
+        ids = {str(story["id"]): story["key"] for story in stories}
+        story_ids = {story["key"]: str(story["id"]) for story in stories}
+        grouped: Dict[str, List[Dict]] = {story["key"]: [] for story in stories}
+        last_key = None
+        objects, complete = extract_json_array(ai_content or "")
+        for i, obj in enumerate(objects):
+            if not isinstance(obj, dict):
                 continue
+            key = keys.get(str(obj.get("storyKey") or "").strip().upper())
+            if key is None:
+                requirement_ids = obj.get("jiraRequirementIDs") if isinstance(obj.get("jiraRequirementIDs"), list) else []
+                key = next((ids[str(rid)] for rid in requirement_ids if str(rid) in ids), None)
+            test_case = self.normalize_test_case(obj, i) if key is not None else None
+            if test_case is not None:
+                # A case listed under one story must not reference the others of the pack
+                test_case["jiraRequirementIDs"] = [story_ids[key]]
+                grouped[key].append(test_case)
+                last_key = key
+        return grouped, (last_key if not complete else None)
 
-        logging.info(f"Successfully normalized {len(normalized)} test cases out of {len(test_cases)}")
-        return normalized
+    @staticmethod
+    def _message_content(response: dict) -> str:
+        # Message content of an OpenRouter response, "" for errors
+        if "error" in response:
+            logging.error(f"Error from OpenRouter: {response['error']}")
+            return ""
+        return (response.get("choices") or [{}])[0].get("message", {}).get("content") or ""
 
-    def process_jira_story_and_send_to_openrouter(self, issue_key: str, model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666) -> dict:
-        # Step 1: Fetch the Jira story using the key
-        logging.info(f"Fetching Jira story for key: {issue_key}")
-        jira_story = self.jira_service.get_user_story_by_key(issue_key)
-        if not jira_story:
-            logging.error(f"Jira story with key {issue_key} not found")
-            return {"error": f"Jira story with key {issue_key} not found."}
+    def _pack_request(self, pack: List[Dict], model: str, temperature: float, max_tokens: int, use_cache: bool) -> Tuple[str, str, int, str, Optional[str]]:
+        # Prompt, model, token limit and cache key of a pack, plus the cached content if any
+        prompt = self.create_packed_test_case_prompt(pack)
+        if model == AUTO_MODEL:
+            # The model chosen for the largest story, with the token limits of all stories
+            choices = [self._resolve_model(story, model, max_tokens) for story in pack]
+            model = max(zip(pack, choices), key=lambda entry: len(entry[0].get("description") or ""))[1][0]
+            pack_tokens = sum(tokens for _, tokens in choices)
+        else:
+            pack_tokens = max_tokens * len(pack)
+        cache_key = self._cache_key(prompt, model, temperature, pack_tokens)
+        cached = self.generation_cache.get(cache_key) if use_cache else None
+        return prompt, model, pack_tokens, cache_key, cached
+
+    def _packed_results(self, pack: List[Dict], content: str, cache_key: str, model: str, cached: bool, elapsed_ms: float) -> Tuple[Dict[str, Dict], List[Dict]]:
+        # Per-story results of a packed response, and the stories missing from it
+        grouped, cut_off = self._split_packed_test_cases(content, pack)
+        if cut_off is not None:
+            # The response ended inside this story's test cases; they are probably incomplete
+            logging.warning(f"Packed response was cut off in the test cases of {cut_off}")
+            grouped[cut_off] = []
+        if any(grouped.values()) and not cached:
+            self.generation_cache.put(cache_key, model, content)
+        results = {key: {"test_cases": cases, "packed": True, "elapsed_ms": elapsed_ms} for key, cases in grouped.items() if cases}
+        missing = [story for story in pack if not grouped[story["key"]]]
+        if missing:
+            logging.warning(f"Packed response is missing {', '.join(story['key'] for story in missing)}, generating them on their own")
+        return results, missing
+
+    @staticmethod
+    def _story_entry(result: dict, started: float) -> Dict:
+        # Per-story entry of a generation result, with the error of a story that produced no test cases
+        entry = {"test_cases": result.get("test_cases") or [], "packed": False, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+        if "error" in result:
+            entry["error"] = str(result["error"])
+        return entry
+
+    def generate_story_result(self, story: Dict, model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666, use_cache: bool = True) -> Dict:
+        """
+        Generate test cases for one pre-loaded story and report why none were generated.
+        :param story: Story dictionary (see story_from_jira_issue)
+        :return: {"test_cases", "packed", "elapsed_ms"}, plus "error" when the generation failed
+        """
+        started = time.perf_counter()
+        try:
+            result = self.process_jira_story_and_send_to_openrouter(story["key"], model, temperature, max_tokens, story, use_cache)
+        except Exception as e:
+            logging.error(f"Error generating test cases for story {story['key']}: {e}")
+            result = {"error": str(e)}
+        return self._story_entry(result, started)
 
-        # Step 2: Extract story key, id, summary, and description
-        story_key = jira_story.get("key", "")
-        story_id = jira_story.get("id", "")
-        story_summary = jira_story.get("fields", {}).get("summary", "")
-        adf_description = jira_story.get("fields", {}).get("description", {})
-        story_description = self.flatten_adf_description(adf_description)
+    def generate_packed_test_cases(self, stories: List[Dict], model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666, use_cache: bool = True) -> Dict[str, Dict]:
+        """
+        Generate test cases for many stories, packing small stories into shared prompts.
+        Stories missing from a packed response fall back to a single-story request.
+        :param stories: Story dictionaries (see story_from_jira_issue)
+        :param max_tokens: Token limit per story; a pack may use max_tokens times its size
+        :return: Per story key: {"test_cases", "packed", "elapsed_ms"}, plus "error" for a failed single-story request
+        """
+        packs, single = self._packs(stories)
+        results: Dict[str, Dict] = {}
+        for pack in packs:
+            started = time.perf_counter()
+            prompt, pack_model, pack_tokens, cache_key, cached = self._pack_request(pack, model, temperature, max_tokens, use_cache)
+            content = cached
+            if content is None:
+                logging.info(f"Sending packed prompt for {len(pack)} stories to OpenRouter with model: {pack_model}")
+                try:
+                    response = self.send_prompt_to_openrouter(prompt, pack_model, temperature, pack_tokens)
+                except Exception as e:
+                    response = {"error": str(e)}
+                content = self._message_content(response)
+            packed, missing = self._packed_results(pack, content, cache_key, pack_model, cached is not None, round((time.perf_counter() - started) * 1000, 1))
+            results.update(packed)
+            single.extend(missing)
+
+        for story in single:
+            results[story["key"]] = self.generate_story_result(story, model, temperature, max_tokens, use_cache)
+        return {story["key"]: results.get(story["key"], {"test_cases": [], "packed": False, "elapsed_ms": 0.0}) for story in stories}
+
+    def _chunk_stories(self, story: Dict) -> List[Dict]:
+        # One story dictionary per description chunk, each telling the model which part it covers
+        chunks = self._story_sections(story)
+        if len(chunks) <= 1:
+            return [story]
+        return [
+            {**story, "description": f"(Part {index} of {len(chunks)} of the story. Generate test cases for this part only.)\n{chunk}"}
+            for index, chunk in enumerate(chunks, start=1)
+        ]
 
-        logging.info(f"Processing story: {story_id}, {story_key} - {story_summary}")
-        logging.info(f"Description length: {len(story_description)} characters")
+    def _merge_chunk_results(self, results: List[List[Dict]]) -> List[Dict]:
+        # Merge per-chunk test cases in chunk order, dropping duplicate titles
+        merged: List[Dict] = []
+        for test_cases in results:
+            self._merge_test_cases(merged, test_cases)
+        logging.info(f"Merged {sum(len(r) for r in results)} chunk test cases into {len(merged)}")
+        return merged
 
-        # Step 3: Create the initial prompt
-        prompt = self.create_test_case_prompt(story_key, story_id, story_summary, story_description)
+    def _build_story_prompt(self, story: Dict) -> str:
+        # Create the prompt for a story dictionary (see story_from_jira_issue)
+        logging.info(f"Processing story: {story['id']}, {story['key']} - {story['summary']}")
+        logging.info(f"Description length: {len(story['description'])} characters")
+
+        prompt = self.create_test_case_prompt(story["key"], story["id"], story["summary"], story["description"])
         logging.info(f"Generated prompt length: {len(prompt)} characters")
+        return prompt
 
-        # Step 4: Send request to OpenRouter API
-        logging.info(f"Sending request to OpenRouter with model: {model}, temperature: {temperature}, max_tokens: {max_tokens}")
-        response = self.send_prompt_to_openrouter(prompt, model, temperature, max_tokens)
+    def _load_story(self, issue_key: str) -> Optional[Dict]:
+        # Fetch the Jira story using the key and reduce it to a story dictionary
+        logging.info(f"Fetching Jira story for key: {issue_key}")
+        jira_story = self.jira_service.get_user_story_by_key(issue_key)
+        if not jira_story:
+            logging.error(f"Jira story with key {issue_key} not found")
+            return None
+        return self.story_from_jira_issue(jira_story)
 
+    def _test_cases_from_openrouter_response(self, response: dict) -> dict:
+        # Extract the message content from an OpenRouter response and parse test cases from it
         if "error" in response:
             logging.error(f"Error from OpenRouter: {response['error']}")
             return {"error": response["error"]}
@@ -273,7 +721,11 @@ class AIService:
             return {"error": "No content returned from OpenRouter."}
 
         logging.info("Received response from OpenRouter. Attempting to parse test cases.")
-        test_cases = self.safe_parse_test_cases(ai_message_content)
+        return self._test_cases_from_content(ai_message_content)
+
+    def _test_cases_from_content(self, ai_message_content: str) -> dict:
+        # Parse and normalize test cases from raw LLM message content
+        test_cases, complete = self._parse_test_cases(ai_message_content)
 
         if not test_cases:
             logging.warning("No valid test cases parsed from OpenRouter response.")
@@ -282,18 +734,294 @@ class AIService:
         logging.info(f"Returning {len(test_cases)} test cases.")
         return {
             "test_cases": test_cases,
-            "raw_response": ai_message_content
+            "raw_response": ai_message_content,
+            "truncated": not complete
         }
 
-    def generate_and_normalize_test_cases(self, issue_key: str, model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666) -> List[Dict[str, str]]:
+    def _test_cases_from_structured_content(self, ai_message_content: str) -> Optional[dict]:
+        # Validate structured output against the test case schema; None when it does not match
+        try:
+            parsed = GENERATED_TEST_CASES_ADAPTER.validate_json(ai_message_content)
+        except ValidationError as e:
+            logging.warning(f"Structured output failed schema validation ({e.error_count()} errors)")
+            return None
+        test_cases = []
+        for i, tc in enumerate(parsed.test_cases):
+            normalized_case = self.normalize_test_case(tc.model_dump(), i)
+            if normalized_case is not None:
+                test_cases.append(normalized_case)
+        if not test_cases:
+            return None
+        return {"test_cases": test_cases, "raw_response": ai_message_content}
+
+    def _parse_generation(self, response: dict, model: str, structured: bool) -> dict:
+        """
+        Parse an OpenRouter response and record the parse outcome for the model.
+        Structured responses are validated against the schema; when they do not match,
+        the tolerant parser is tried before the generation counts as failed.
+        """
+        if "error" in response:
+            return self._test_cases_from_openrouter_response(response)
+        result = None
+        if structured:
+            content = self._message_content(response)
+            result = self._test_cases_from_structured_content(content) if content else None
+        validated = result is not None
+        if result is None:
+            result = self._test_cases_from_openrouter_response(response)
+        self._record_parse(model, "structured" if structured else "prompt", validated or not structured, "error" not in result)
+        return result
+
+    def _record_parse(self, model: str, mode: str, validated: bool, parsed: bool):
+        with self._inflight_lock:
+            stats = self._parse_stats.setdefault((model, mode), {"responses": 0, "failures": 0, "repaired": 0})
+            stats["responses"] += 1
+            if not parsed:
+                stats["failures"] += 1
+            elif not validated:
+                stats["repaired"] += 1
+
+    def parse_stats(self) -> List[Dict]:
+        """
+        Parse-failure rate per model and mode. `repaired` counts structured responses that
+        failed schema validation but were recovered by the tolerant parser.
+        """
+        with self._inflight_lock:
+            return [
+                {
+                    "model": model,
+                    "mode": mode,
+                    **stats,
+                    "failure_rate": round(stats["failures"] / stats["responses"], 4) if stats["responses"] else 0.0,
+                }
+                for (model, mode), stats in sorted(self._parse_stats.items())
+            ]
+
+    def _cached_generation(self, prompt: str, model: str, temperature: float, max_tokens: int, use_cache: bool, structured: bool = False) -> Tuple[str, Optional[dict]]:
+        # Cache key of a generation and the parsed cached result, if any
+        cache_key = self._cache_key(prompt, model, temperature, max_tokens, structured)
+        if not use_cache:
+            return cache_key, None
+        cached_content = self.generation_cache.get(cache_key)
+        if cached_content is None:
+            return cache_key, None
+        logging.info(f"Generation cache hit for model {model}, skipping OpenRouter")
+        result = self._test_cases_from_content(cached_content)
+        return cache_key, ({**result, "cached": True} if "error" not in result else None)
+
+    def _store_generation(self, cache_key: str, model: str, result: dict):
+        # Only successful generations are cached; continued ones as their merged test cases
+        if "error" not in result:
+            content = json.dumps(result["test_cases"]) if result.get("continuations") else result["raw_response"]
+            self.generation_cache.put(cache_key, model, content)
+
+    @staticmethod
+    def _response_truncated(response: dict, result: dict) -> bool:
+        # Output cut off by max_tokens, or parsed test cases whose JSON array was never closed
+        choice = (response.get("choices") or [{}])[0]
+        return choice.get("finish_reason") == "length" or bool(result.get("truncated"))
+
+    @staticmethod
+    def _completion_tokens(response: dict, max_tokens: int) -> int:
+        # Tokens spent by one completion; the full limit is assumed when usage is not reported
+        return (response.get("usage") or {}).get("completion_tokens") or max_tokens
+
+    @staticmethod
+    def _merge_test_cases(test_cases: List[Dict], new_cases: List[Dict]) -> int:
+        # Append test cases whose titles are not present yet, return how many were added
+        seen = {tc["title"].casefold() for tc in test_cases}
+        added = 0
+        for tc in new_cases:
+            title = tc["title"].casefold()
+            if title in seen:
+                continue
+            seen.add(title)
+            test_cases.append(tc)
+            added += 1
+        return added
+
+    @staticmethod
+    def _should_continue(truncated: bool, spent: int, rounds: int, max_tokens: int) -> bool:
+        # Continue only truncated generations, also those cut off before the first complete test case,
+        # that are within the round and token budget
+        if not truncated or rounds >= settings.GENERATION_MAX_CONTINUATIONS:
+            return False
+        if spent + max_tokens > settings.GENERATION_TOKEN_BUDGET:
+            logging.info(f"Generation token budget of {settings.GENERATION_TOKEN_BUDGET} reached, not continuing")
+            return False
+        return True
+
+    def _apply_continuation(self, result: dict, more: dict) -> bool:
+        # Merge the parsed continuation `more` into result; False when nothing new was added
+        result["continuations"] = result.get("continuations", 0) + 1
+        if "error" in more:
+            return False
+        if "error" in result:
+            # The first response was cut off before any test case was complete
+            del result["error"]
+            result.update(test_cases=[], raw_response="")
+        result["raw_response"] = f"{result['raw_response']}\n{more['raw_response']}" if result["raw_response"] else more["raw_response"]
+        added = self._merge_test_cases(result["test_cases"], more["test_cases"])
+        logging.info(f"Continuation {result['continuations']} added {added} test cases")
+        return added > 0
+
+    def _continue_truncated_generation(self, prompt: str, response: dict, result: dict, model: str, temperature: float, max_tokens: int) -> dict:
+        """
+        Ask for the remaining test cases while the response was cut off by max_tokens.
+        :param prompt: Original story prompt
+        :param response: First OpenRouter response
+        :param result: Parsed result of the first response, extended in place
+        :return: Result with the merged test cases
+        """
+        spent = self._completion_tokens(response, max_tokens)
+        truncated = self._response_truncated(response, result)
+        rounds = 0
+        while self._should_continue(truncated, spent, rounds, max_tokens):
+            rounds += 1
+            test_cases = result.get("test_cases") or []
+            logging.info(f"Response truncated after {len(test_cases)} test cases, requesting continuation {rounds}")
+            response = self.send_prompt_to_openrouter(self.create_continuation_prompt(prompt, test_cases), model, temperature, max_tokens)
+            spent += self._completion_tokens(response, max_tokens)
+            more = self._test_cases_from_openrouter_response(response)
+            truncated = self._response_truncated(response, more)
+            if not self._apply_continuation(result, more):
+                break
+        if "error" not in result:
+            result["completion_tokens"] = spent
+        return result
+
+    def _resolve_model(self, story: Dict, model: str, max_tokens: int) -> Tuple[str, int]:
+        # Model and max_tokens for the story; model="auto" chooses both from the generation history
+        if model != AUTO_MODEL:
+            return model, max_tokens
+        choice = self.generation_stats.select(len(story.get("description") or ""), default_max_tokens=max_tokens)
+        logging.info(f"Auto mode chose {choice['model']} with max_tokens={choice['max_tokens']} for {story['key']} ({choice['reason']})")
+        return choice["model"], choice["max_tokens"]
+
+    def _record_generation(self, story: Dict, model: str, max_tokens: int, response: dict, result: dict, started: float):
+        # Add an uncached generation to the history; OpenRouter errors say nothing about the story
+        if "error" in response:
+            return
+        self._record_sample(
+            story, model, max_tokens,
+            completion_tokens=result.get("completion_tokens") or self._completion_tokens(response, max_tokens),
+            test_cases=len(result.get("test_cases") or []),
+            started=started,
+            truncated=self._response_truncated(response, result),
+            continuations=result.get("continuations", 0),
+        )
+
+    def _record_sample(self, story: Dict, model: str, max_tokens: int, completion_tokens: int, test_cases: int, started: float, truncated: bool, continuations: int = 0):
+        # One generation of the story in the history used by auto mode
+        self.generation_stats.record(
+            issue_key=story["key"],
+            model=model,
+            description_chars=len(story.get("description") or ""),
+            max_tokens=max_tokens,
+            completion_tokens=completion_tokens,
+            test_cases=test_cases,
+            latency_ms=round((time.perf_counter() - started) * 1000, 1),
+            truncated=truncated,
+            continuations=continuations,
+        )
+
+    @staticmethod
+    def _flight_key(issue_key: str, model: str, temperature: float, max_tokens: int, story: Optional[Dict], use_cache: bool, structured: bool) -> Tuple:
+        # Requests for the same story and settings coalesce; a supplied story (mirror, chunk) is part of the key,
+        # and a cache bypass only joins other bypassing requests
+        return (issue_key.strip().upper(), model, float(temperature), int(max_tokens), story["description"] if story else None, bool(use_cache), bool(structured))
+
+    def _coalesced_result(self, result: dict) -> dict:
+        # Private copy of a shared result for a request that joined an in-flight generation
+        return {**copy.deepcopy(result), "coalesced": True}
+
+    def coalescing_stats(self) -> Dict:
+        """
+        Upstream generations started and requests that joined one already in flight.
+        """
+        with self._inflight_lock:
+            requests = self.flights + self.coalesced
+            return {
+                "in_flight": len(self._inflight),
+                "flights": self.flights,
+                "coalesced": self.coalesced,
+                "coalesced_rate": round(self.coalesced / requests, 4) if requests else 0.0,
+            }
+
+    def process_jira_story_and_send_to_openrouter(self, issue_key: str, model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666, story: Optional[Dict] = None, use_cache: bool = True, structured: bool = False) -> dict:
+        """
+        Generate test cases for a story. Concurrent calls with the same issue key, model,
+        temperature and max_tokens share one Jira fetch and LLM call.
+        """
+        key = self._flight_key(issue_key, model, temperature, max_tokens, story, use_cache, structured)
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = Future()
+                self._inflight[key] = flight
+                self.flights += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            logging.info(f"Joining in-flight generation for {issue_key}")
+            return self._coalesced_result(flight.result())
+
+        try:
+            result = self._generate_story_result(issue_key, model, temperature, max_tokens, story, use_cache, structured)
+            flight.set_result(result)
+            # The shared result stays untouched for the requests that joined it
+            return copy.deepcopy(result)
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _generate_story_result(self, issue_key: str, model: str, temperature: float, max_tokens: int, story: Optional[Dict], use_cache: bool, structured: bool = False) -> dict:
+        # Step 1: Fetch the Jira story using the key, unless a (mirrored) story was supplied
+        story = story or self._load_story(issue_key)
+        if not story:
+            return {"error": f"Jira story with key {issue_key} not found."}
+
+        # Step 2-3: Create the initial prompt from the story fields
+        prompt = self._build_story_prompt(story)
+        model, max_tokens = self._resolve_model(story, model, max_tokens)
+
+        # Step 4: Reuse a cached generation of the identical prompt and settings
+        cache_key, cached = self._cached_generation(prompt, model, temperature, max_tokens, use_cache, structured)
+        if cached is not None:
+            return cached
+
+        # Step 5: Send request to OpenRouter API
+        logging.info(f"Sending request to OpenRouter with model: {model}, temperature: {temperature}, max_tokens: {max_tokens}")
+        started = time.perf_counter()
+        response = self.send_prompt_to_openrouter(prompt, model, temperature, max_tokens, structured)
+
+        # Step 6: Parse and normalize the test cases
+        result = self._parse_generation(response, model, structured)
+
+        # Step 7: Request the remaining test cases if the output was cut off
+        result = self._continue_truncated_generation(prompt, response, result, model, temperature, max_tokens)
+        self._record_generation(story, model, max_tokens, response, result, started)
+        self._store_generation(cache_key, model, result)
+        return result
+
+    def generate_and_normalize_test_cases(self, issue_key: str, model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666, story: Optional[Dict] = None, use_cache: bool = True, structured: bool = False) -> List[Dict[str, str]]:
         """
         Complete method to generate and normalize test cases for a Jira story.
         Returns normalized test cases ready for database storage.
+        :param story: Optional pre-loaded story (e.g. from the local mirror) to skip the Jira fetch
+        :param use_cache: Set to False to bypass the generation cache
+        :param structured: Request JSON-schema structured output and validate it instead of repairing free text
         """
         try:
             # Get AI response and parsed test cases
             logging.info(f"Starting test case generation for story: {issue_key}")
-            result = self.process_jira_story_and_send_to_openrouter(issue_key, model, temperature, max_tokens)
+            result = self.process_jira_story_and_send_to_openrouter(issue_key, model, temperature, max_tokens, story, use_cache, structured)
 
             if "error" in result:
                 logging.error(f"Error in AI response: {result['error']}")
@@ -307,3 +1035,353 @@ class AIService:
             logging.error(f"Error generating test cases for story {issue_key}: {e}")
             return []
 
+    def generate_chunked_test_cases(self, issue_key: str, model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666, story: Optional[Dict] = None, use_cache: bool = True) -> List[Dict[str, str]]:
+        """
+        Generate test cases for a long story section by section, in parallel, and merge them.
+        Stories that fit in a single chunk are generated as usual.
+        :param story: Optional pre-loaded story (e.g. from the local mirror) to skip the Jira fetch
+        :param use_cache: Set to False to bypass the generation cache
+        """
+        story = story or self._load_story(issue_key)
+        if not story:
+            return []
+        chunk_stories = self._chunk_stories(story)
+        if len(chunk_stories) == 1:
+            return self.generate_and_normalize_test_cases(issue_key, model, temperature, max_tokens, story, use_cache)
+
+        logging.info(f"Generating test cases for {issue_key} in {len(chunk_stories)} chunks")
+        with ThreadPoolExecutor(max_workers=min(len(chunk_stories), settings.GENERATION_CHUNK_CONCURRENCY)) as executor:
+            results = list(executor.map(
+                lambda chunk_story: self.generate_and_normalize_test_cases(issue_key, model, temperature, max_tokens, chunk_story, use_cache),
+                chunk_stories
+            ))
+        return self._merge_chunk_results(results)
+
+
+class AsyncAIService(AIService):
+    """
+    Awaitable variant of AIService. Jira and OpenRouter calls go through the pooled
+    async HTTP client, so a generation does not block the event loop while it waits.
+    """
+    jira_service_class = AsyncJiraService
+
+    async def send_prompt_to_openrouter(self, prompt: str, model: str, temperature: float, max_tokens: int, structured: bool = False) -> dict:
+        url, headers, data = self._openrouter_request(prompt, model, temperature, max_tokens, structured)
+        response = await self.transport.apost(url, headers=headers, json=data)
+        return response.json() if response.status_code == 200 else {"error": response.text}
+
+    async def _load_story(self, issue_key: str) -> Optional[Dict]:
+        logging.info(f"Fetching Jira story for key: {issue_key}")
+        jira_story = await self.jira_service.get_user_story_by_key(issue_key)
+        if not jira_story:
+            logging.error(f"Jira story with key {issue_key} not found")
+            return None
+        return self.story_from_jira_issue(jira_story)
+
+    async def _aresolve_model(self, story: Dict, model: str, max_tokens: int) -> Tuple[str, int]:
+        # _resolve_model off the event loop when auto mode reads the generation history
+        if model != AUTO_MODEL:
+            return model, max_tokens
+        return await asyncio.to_thread(self._resolve_model, story, model, max_tokens)
+
+    async def _continue_truncated_generation(self, prompt: str, response: dict, result: dict, model: str, temperature: float, max_tokens: int) -> dict:
+        spent = self._completion_tokens(response, max_tokens)
+        truncated = self._response_truncated(response, result)
+        rounds = 0
+        while self._should_continue(truncated, spent, rounds, max_tokens):
+            rounds += 1
+            test_cases = result.get("test_cases") or []
+            logging.info(f"Response truncated after {len(test_cases)} test cases, requesting continuation {rounds}")
+            response = await self.send_prompt_to_openrouter(self.create_continuation_prompt(prompt, test_cases), model, temperature, max_tokens)
+            spent += self._completion_tokens(response, max_tokens)
+            more = self._test_cases_from_openrouter_response(response)
+            truncated = self._response_truncated(response, more)
+            if not self._apply_continuation(result, more):
+                break
+        if "error" not in result:
+            result["completion_tokens"] = spent
+        return result
+
+    async def process_jira_story_and_send_to_openrouter(self, issue_key: str, model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666, story: Optional[Dict] = None, use_cache: bool = True, structured: bool = False) -> dict:
+        key = self._flight_key(issue_key, model, temperature, max_tokens, story, use_cache, structured)
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            with self._inflight_lock:
+                self.coalesced += 1
+            logging.info(f"Joining in-flight generation for {issue_key}")
+            return self._coalesced_result(await asyncio.shield(task))
+
+        # The shared task keeps running for the other requests if this one is cancelled
+        task = asyncio.ensure_future(self._generate_story_result(issue_key, model, temperature, max_tokens, story, use_cache, structured))
+        with self._inflight_lock:
+            self._inflight[key] = task
+            self.flights += 1
+        task.add_done_callback(lambda done: self._inflight.pop(key, None) if self._inflight.get(key) is done else None)
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def _generate_story_result(self, issue_key: str, model: str, temperature: float, max_tokens: int, story: Optional[Dict], use_cache: bool, structured: bool = False) -> dict:
+        story = story or await self._load_story(issue_key)
+        if not story:
+            return {"error": f"Jira story with key {issue_key} not found."}
+
+        prompt = self._build_story_prompt(story)
+        model, max_tokens = await self._aresolve_model(story, model, max_tokens)
+        # The persistent cache tier is SQLite I/O; keep it off the event loop
+        cache_key, cached = await asyncio.to_thread(self._cached_generation, prompt, model, temperature, max_tokens, use_cache, structured)
+        if cached is not None:
+            return cached
+
+        logging.info(f"Sending request to OpenRouter with model: {model}, temperature: {temperature}, max_tokens: {max_tokens}")
+        started = time.perf_counter()
+        response = await self.send_prompt_to_openrouter(prompt, model, temperature, max_tokens, structured)
+        result = self._parse_generation(response, model, structured)
+        result = await self._continue_truncated_generation(prompt, response, result, model, temperature, max_tokens)
+        await asyncio.to_thread(self._record_generation, story, model, max_tokens, response, result, started)
+        await asyncio.to_thread(self._store_generation, cache_key, model, result)
+        return result
+
+    async def generate_and_normalize_test_cases(self, issue_key: str, model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666, story: Optional[Dict] = None, use_cache: bool = True, structured: bool = False) -> List[Dict[str, str]]:
+        """
+        Awaitable version of AIService.generate_and_normalize_test_cases.
+        """
+        try:
+            logging.info(f"Starting async test case generation for story: {issue_key}")
+            result = await self.process_jira_story_and_send_to_openrouter(issue_key, model, temperature, max_tokens, story, use_cache, structured)
+
+            if "error" in result:
+                logging.error(f"Error in AI response: {result['error']}")
+                return []
+
+            test_cases = result.get("test_cases", [])
+            logging.info(f"Final result: {len(test_cases)} normalized test cases")
+            return test_cases
+
+        except Exception as e:
+            logging.error(f"Error generating test cases for story {issue_key}: {e}")
+            return []
+
+    async def generate_story_result(self, story: Dict, model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666, use_cache: bool = True) -> Dict:
+        """
+        Awaitable version of AIService.generate_story_result.
+        """
+        started = time.perf_counter()
+        try:
+            result = await self.process_jira_story_and_send_to_openrouter(story["key"], model, temperature, max_tokens, story, use_cache)
+        except Exception as e:
+            logging.error(f"Error generating test cases for story {story['key']}: {e}")
+            result = {"error": str(e)}
+        return self._story_entry(result, started)
+
+    async def generate_chunked_test_cases(self, issue_key: str, model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666, story: Optional[Dict] = None, use_cache: bool = True) -> List[Dict[str, str]]:
+        """
+        Awaitable version of AIService.generate_chunked_test_cases.
+        """
+        story = story or await self._load_story(issue_key)
+        if not story:
+            return []
+        chunk_stories = self._chunk_stories(story)
+        if len(chunk_stories) == 1:
+            return await self.generate_and_normalize_test_cases(issue_key, model, temperature, max_tokens, story, use_cache)
+
+        logging.info(f"Generating test cases for {issue_key} in {len(chunk_stories)} chunks")
+        semaphore = asyncio.Semaphore(settings.GENERATION_CHUNK_CONCURRENCY)
+
+        async def generate_chunk(chunk_story: Dict) -> List[Dict[str, str]]:
+            async with semaphore:
+                return await self.generate_and_normalize_test_cases(issue_key, model, temperature, max_tokens, chunk_story, use_cache)
+
+        results = await asyncio.gather(*(generate_chunk(chunk_story) for chunk_story in chunk_stories))
+        return self._merge_chunk_results(results)
+
+    async def generate_packed_test_cases(self, stories: List[Dict], model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666, use_cache: bool = True, concurrency: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        Awaitable version of AIService.generate_packed_test_cases; packs and single-story
+        requests run concurrently, at most `concurrency` at a time.
+        """
+        packs, single = self._packs(stories)
+        semaphore = asyncio.Semaphore(concurrency or settings.BATCH_OPENROUTER_CONCURRENCY)
+        results: Dict[str, Dict] = {}
+
+        async def generate_single(story: Dict):
+            async with semaphore:
+                results[story["key"]] = await self.generate_story_result(story, model, temperature, max_tokens, use_cache)
+
+        async def generate_pack(pack: List[Dict]) -> List[Dict]:
+            async with semaphore:
+                started = time.perf_counter()
+                prompt, pack_model, pack_tokens, cache_key, cached = await asyncio.to_thread(self._pack_request, pack, model, temperature, max_tokens, use_cache)
+                content = cached
+                if content is None:
+                    logging.info(f"Sending packed prompt for {len(pack)} stories to OpenRouter with model: {pack_model}")
+                    try:
+                        response = await self.send_prompt_to_openrouter(prompt, pack_model, temperature, pack_tokens)
+                    except Exception as e:
+                        response = {"error": str(e)}
+                    content = self._message_content(response)
+                packed, missing = await asyncio.to_thread(self._packed_results, pack, content, cache_key, pack_model, cached is not None, round((time.perf_counter() - started) * 1000, 1))
+                results.update(packed)
+            # Fallback requests for stories the packed response did not cover
+            await asyncio.gather(*(generate_single(story) for story in missing))
+
+        await asyncio.gather(*(generate_pack(pack) for pack in packs), *(generate_single(story) for story in single))
+        return {story["key"]: results.get(story["key"], {"test_cases": [], "packed": False, "elapsed_ms": 0.0}) for story in stories}
+
+    async def race_models(self, issue_key: str, models: Optional[List[str]] = None, temperature: float = 0.7, max_tokens: int = 666, story: Optional[Dict] = None, stagger: Optional[float] = None, use_cache: bool = True) -> dict:
+        """
+        Send the same prompt to several models and keep the first usable answer.
+        Models are started all at once, or one after another every `stagger` seconds
+        while no model has answered (a failed answer starts the next model right away).
+        The first response that parses into test cases wins; the other requests are cancelled.
+        :param models: Models to race, in start order (settings.AVAILABLE_MODELS if omitted)
+        :param stagger: Seconds between model starts (settings.GENERATION_RACE_STAGGER if omitted)
+        :return: Generation result with the winning "model", its "latency_ms" and per-model "race" outcomes
+        """
+        models = list(dict.fromkeys(models or settings.AVAILABLE_MODELS))
+        stagger = settings.GENERATION_RACE_STAGGER if stagger is None else stagger
+        story = story or await self._load_story(issue_key)
+        if not story:
+            return {"error": f"Jira story with key {issue_key} not found.", "race": []}
+
+        prompt = self._build_story_prompt(story)
+        for model in models:
+            _, cached = await asyncio.to_thread(self._cached_generation, prompt, model, temperature, max_tokens, use_cache)
+            if cached is not None:
+                return {**cached, "model": model, "latency_ms": 0.0, "race": []}
+
+        started = time.perf_counter()
+        remaining = list(models)
+        pending: Dict[asyncio.Future, str] = {}
+        outcomes: List[Dict] = []
+        winner = None
+
+        async def attempt(model: str):
+            response = await self.send_prompt_to_openrouter(prompt, model, temperature, max_tokens)
+            return response, self._test_cases_from_openrouter_response(response)
+
+        def launch():
+            model = remaining.pop(0)
+            logging.info(f"Race: starting {model} for {issue_key}")
+            pending[asyncio.ensure_future(attempt(model))] = model
+
+        try:
+            while winner is None and (pending or remaining):
+                if remaining and (not pending or stagger <= 0):
+                    launch()
+                    continue
+                done, _ = await asyncio.wait(list(pending), timeout=stagger if remaining else None, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Nobody answered within the stagger delay: hedge with the next model
+                    launch()
+                    continue
+                for task in done:
+                    model = pending.pop(task)
+                    latency_ms = round((time.perf_counter() - started) * 1000, 1)
+                    try:
+                        response, result = task.result()
+                    except Exception as e:
+                        response, result = {}, {"error": str(e)}
+                    if "error" in result:
+                        outcomes.append({"model": model, "status": "failed", "latency_ms": latency_ms, "error": str(result["error"])[:200]})
+                    elif winner is None:
+                        outcomes.append({"model": model, "status": "won", "latency_ms": latency_ms})
+                        winner = (model, response, result, latency_ms)
+                    else:
+                        outcomes.append({"model": model, "status": "finished", "latency_ms": latency_ms})
+        finally:
+            for task, model in pending.items():
+                task.cancel()
+                outcomes.append({"model": model, "status": "cancelled"})
+            # Let cancelled requests release their connections before returning
+            await asyncio.gather(*pending, return_exceptions=True)
+        outcomes.extend({"model": model, "status": "not_started"} for model in remaining)
+
+        if winner is None:
+            logging.error(f"Race: no model produced test cases for {issue_key}")
+            return {"error": "No model produced valid test cases.", "race": outcomes}
+
+        model, response, result, latency_ms = winner
+        logging.info(f"Race: {model} won for {issue_key} after {latency_ms} ms")
+        result = await self._continue_truncated_generation(prompt, response, result, model, temperature, max_tokens)
+        cache_key = self._cache_key(prompt, model, temperature, max_tokens)
+        await asyncio.to_thread(self._store_generation, cache_key, model, result)
+        return {**result, "model": model, "latency_ms": latency_ms, "race": outcomes}
+
+    async def stream_test_cases(self, issue_key: str, model: str="meta-llama/llama-3-8b-instruct", temperature: float = 0.7, max_tokens: int = 666, story: Optional[Dict] = None, use_cache: bool = True) -> AsyncIterator[Dict]:
+        """
+        Generate test cases with a streamed OpenRouter completion, emitting each
+        normalized test case as soon as its JSON object is complete.
+        Yields events: {"event": "test_case", "index", "test_case"}, then a final
+        {"event": "done", ...} or {"event": "error", "error"}.
+        """
+        story = story or await self._load_story(issue_key)
+        if not story:
+            yield {"event": "error", "error": f"Jira story with key {issue_key} not found."}
+            return
+
+        prompt = self._build_story_prompt(story)
+        model, max_tokens = await self._aresolve_model(story, model, max_tokens)
+        cache_key, cached = await asyncio.to_thread(self._cached_generation, prompt, model, temperature, max_tokens, use_cache)
+        if cached is not None:
+            for index, test_case in enumerate(cached["test_cases"]):
+                yield {"event": "test_case", "index": index, "test_case": test_case}
+            yield {"event": "done", "total": len(cached["test_cases"]), "cached": True, "truncated": False, "finish_reason": None}
+            return
+
+        url, headers, data = self._openrouter_request(prompt, model, temperature, max_tokens)
+        data["stream"] = True
+        parser = JSONArrayStreamParser()
+        content_parts = []
+        finish_reason = None
+        usage = None
+        started = time.perf_counter()
+        emitted = 0
+        position = 0
+
+        logging.info(f"Streaming request to OpenRouter with model: {model}, temperature: {temperature}, max_tokens: {max_tokens}")
+        async with self.transport.astream("POST", url, headers=headers, json=data) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logging.error(f"Error from OpenRouter: {body[:500]!r}")
+                yield {"event": "error", "error": body.decode("utf-8", errors="replace")}
+                return
+
+            async for line in response.aiter_lines():
+                # Server-sent events: "data: {...}" lines, ": comment" keep-alives, "data: [DONE]" at the end
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(payload)
+                except ValueError:
+                    continue
+                if "error" in chunk:
+                    yield {"event": "error", "error": chunk["error"]}
+                    return
+
+                usage = chunk.get("usage") or usage
+                choice = (chunk.get("choices") or [{}])[0]
+                finish_reason = choice.get("finish_reason") or finish_reason
+                delta = (choice.get("delta") or {}).get("content") or ""
+                if not delta:
+                    continue
+                content_parts.append(delta)
+                for parsed in parser.feed(delta):
+                    test_case = self.normalize_test_case(parsed, position)
+                    position += 1
+                    if test_case is not None:
+                        yield {"event": "test_case", "index": emitted, "test_case": test_case}
+                        emitted += 1
+
+        completion_tokens = (usage or {}).get("completion_tokens") or max_tokens
+        truncated = finish_reason == "length" or parser.truncated
+        await asyncio.to_thread(self._record_sample, story, model, max_tokens, completion_tokens, emitted, started, truncated)
+        if not emitted:
+            logging.warning("No valid test cases parsed from streamed OpenRouter response.")
+        elif truncated:
+            # Streams are not continued; caching the cut-off set would let later calls skip their continuation
+            logging.warning(f"Streamed generation for {issue_key} was truncated, not caching it.")
+        else:
+            await asyncio.to_thread(self._store_generation, cache_key, model, {"raw_response": "".join(content_parts)})
+        yield {"event": "done", "total": emitted, "cached": False, "truncated": truncated, "finish_reason": finish_reason}
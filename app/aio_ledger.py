@@ -0,0 +1,208 @@
+# app/aio_ledger.py
+
+import hashlib
+import json
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from . import models
+from .database import SessionLocal, engine
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Seconds a push waits before checking again whether a concurrent push of the same case finished
+CLAIM_POLL_INTERVAL = 0.05
+
+def _utcnow() -> datetime:
+    # Naive UTC timestamps, as stored by SQLite DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _sha256(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _requirement_ids(test_case: Dict) -> List[str]:
+    ids = test_case.get("jiraRequirementIDs")
+    return sorted(str(requirement_id) for requirement_id in ids) if isinstance(ids, list) else []
+
+def identity_hash(project_key: str, test_case: Dict) -> str:
+    """
+    Identity of a test case across generations: project, requirement IDs and case-insensitive title.
+    """
+    return _sha256([project_key.upper(), _requirement_ids(test_case), str(test_case.get("title") or "").strip().casefold()])
+
+def content_hash(test_case: Dict) -> str:
+    """
+    Hash of the normalized case content pushed to AIO: title, description, precondition, steps and requirement IDs.
+    """
+    steps = [
+        [str(step.get("step") or ""), str(step.get("data") or ""), str(step.get("expectedResult") or "")]
+        for step in test_case.get("steps") or []
+        if isinstance(step, dict)
+    ]
+    return _sha256([
+        str(test_case.get("title") or "").strip(),
+        str(test_case.get("description") or "").strip(),
+        str(test_case.get("precondition") or "").strip(),
+        steps,
+        _requirement_ids(test_case),
+    ])
+
+class AIOSyncLedger:
+    """
+    Local record of the test cases created in AIO.
+
+    Each row maps a case identity (project, requirement IDs, title) to the AIO key it
+    was created as and the hash of the content last pushed. Pushing a case again is
+    then skipped when its content is unchanged, or sent as an update of the existing
+    AIO test case when it changed.
+
+    A push claims the case's row before it sends anything, inserting it under the
+    unique identity for a new case. Concurrent pushes of the same case, in this or
+    another process, see the claim and wait for its outcome instead of creating a
+    duplicate.
+    """
+
+    def __init__(self, session_factory: Optional[sessionmaker] = None):
+        """
+        :param session_factory: Session factory of the ledger table (the app database if omitted)
+        """
+        self.session_factory = session_factory or SessionLocal
+        self._table_ready = False
+        self._lock = threading.Lock()
+
+    def _session(self):
+        # Create the ledger table on first use, so the ledger also works outside app.main
+        if not self._table_ready:
+            models.AIOSyncEntry.__table__.create(bind=self.session_factory.kw.get("bind", engine), checkfirst=True)
+            self._table_ready = True
+        return self.session_factory()
+
+    @staticmethod
+    def _entry(row: models.AIOSyncEntry) -> Dict:
+        return {"aio_key": row.aio_key, "aio_id": row.aio_id, "content_hash": row.content_hash}
+
+    def lookup(self, project_key: str, test_case: Dict) -> Optional[Dict]:
+        """
+        Ledger entry of a test case, or None if it was never pushed.
+        :return: {"aio_key", "aio_id", "content_hash"}
+        """
+        db = self._session()
+        try:
+            row = db.query(models.AIOSyncEntry).filter(models.AIOSyncEntry.identity_hash == identity_hash(project_key, test_case)).first()
+            return self._entry(row) if row is not None else None
+        finally:
+            db.close()
+
+    def claim(self, project_key: str, test_case: Dict, lease_seconds: float) -> Tuple[str, Optional[Dict], Optional[str]]:
+        """
+        Claim a test case for one push, so that only one push at a time creates or updates it.
+        :param lease_seconds: Seconds after which an unreleased claim (e.g. of a crashed push) expires
+        :return: (status, entry, claim token). Status "claimed" comes with the token to pass to
+                 record() or release(); "unchanged" means AIO already has this content;
+                 "busy" means another push holds the claim.
+        """
+        identity = identity_hash(project_key, test_case)
+        now = _utcnow()
+        token = uuid.uuid4().hex
+        db = self._session()
+        try:
+            row = db.query(models.AIOSyncEntry).filter(models.AIOSyncEntry.identity_hash == identity).first()
+            if row is None:
+                # New case: the unique identity lets exactly one concurrent push insert the row
+                db.add(models.AIOSyncEntry(
+                    identity_hash=identity,
+                    project_key=project_key,
+                    title=str(test_case.get("title") or "")[:255],
+                    claim_token=token,
+                    claimed_until=now + timedelta(seconds=lease_seconds),
+                    created_at=now,
+                    updated_at=now,
+                ))
+                try:
+                    db.commit()
+                    return "claimed", None, token
+                except IntegrityError:
+                    db.rollback()
+                    row = db.query(models.AIOSyncEntry).filter(models.AIOSyncEntry.identity_hash == identity).first()
+                    if row is None:
+                        raise
+            entry = self._entry(row)
+            if row.claimed_until is not None and row.claimed_until > now:
+                return "busy", entry, None
+            if row.aio_key and row.content_hash == content_hash(test_case):
+                return "unchanged", entry, None
+            claimed = db.query(models.AIOSyncEntry).filter(
+                models.AIOSyncEntry.id == row.id,
+                or_(models.AIOSyncEntry.claimed_until.is_(None), models.AIOSyncEntry.claimed_until <= now)
+            ).update({"claim_token": token, "claimed_until": now + timedelta(seconds=lease_seconds)}, synchronize_session=False)
+            db.commit()
+            return ("claimed", entry, token) if claimed else ("busy", entry, None)
+        finally:
+            db.close()
+
+    def release(self, project_key: str, test_case: Dict, token: str):
+        """
+        Drop a claim without recording a push, e.g. after AIO rejected it.
+        """
+        db = self._session()
+        try:
+            db.query(models.AIOSyncEntry).filter(
+                models.AIOSyncEntry.identity_hash == identity_hash(project_key, test_case),
+                models.AIOSyncEntry.claim_token == token
+            ).update({"claim_token": None, "claimed_until": None}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def record(self, project_key: str, test_case: Dict, aio_key: Optional[str], aio_id: Optional[str]):
+        """
+        Store or update the AIO key and content hash of a pushed test case, releasing its claim.
+        """
+        identity = identity_hash(project_key, test_case)
+        values = {
+            "project_key": project_key,
+            "title": str(test_case.get("title") or "")[:255],
+            "content_hash": content_hash(test_case),
+            "aio_key": aio_key,
+            "aio_id": str(aio_id) if aio_id is not None else None,
+            "claim_token": None,
+            "claimed_until": None,
+            "updated_at": _utcnow(),
+        }
+        # One writer at a time, so concurrent pushes of a batch do not race on the unique identity
+        with self._lock:
+            db = self._session()
+            try:
+                row = db.query(models.AIOSyncEntry).filter(models.AIOSyncEntry.identity_hash == identity).first()
+                if row is None:
+                    row = models.AIOSyncEntry(identity_hash=identity, created_at=values["updated_at"])
+                    db.add(row)
+                for name, value in values.items():
+                    setattr(row, name, value)
+                db.commit()
+            except IntegrityError as e:
+                db.rollback()
+                logging.error(f"AIO ledger: could not record {values['title']}: {e}")
+            finally:
+                db.close()
+
+    def forget(self, project_key: str, test_case: Dict):
+        """
+        Drop the entry of a test case, e.g. after it was deleted in AIO.
+        """
+        with self._lock:
+            db = self._session()
+            try:
+                db.query(models.AIOSyncEntry).filter(models.AIOSyncEntry.identity_hash == identity_hash(project_key, test_case)).delete(synchronize_session=False)
+                db.commit()
+            finally:
+                db.close()
+
+# Shared ledger used by every PMService unless one is injected explicitly
+aio_ledger = AIOSyncLedger()
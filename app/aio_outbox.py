@@ -0,0 +1,272 @@
+# app/aio_outbox.py
+
+import json
+import logging
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, sessionmaker
+from . import crud, models
+from .config import settings
+from .database import SessionLocal, engine
+
+if TYPE_CHECKING:
+    from .pm_service import PMService
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+OUTBOX_STATUSES = ("sending", "pending", "sent", "dead")
+
+# HTTP statuses worth retrying besides 5xx; other 4xx answers fail the same way on every attempt
+RETRYABLE_STATUS_CODES = (408, 425, 429)
+
+def _utcnow() -> datetime:
+    # Naive UTC timestamps, as stored by SQLite DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def is_retryable(outcome: Dict) -> bool:
+    """
+    Whether a failed push may succeed later: connection errors, timeouts, throttling and 5xx answers.
+    """
+    status_code = outcome.get("status_code")
+    return status_code is None or status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+
+def backoff_delay(attempts: int, base: float, cap: float) -> float:
+    """
+    Seconds to wait after the given number of failed attempts: exponential backoff with jitter,
+    a random wait between half and all of base * 2^(attempts - 1), capped at `cap`.
+    """
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return random.uniform(delay / 2, delay)
+
+def outbox_summary(entry: models.AIOOutboxEntry, include_payload: bool = False) -> Dict:
+    """
+    JSON-friendly view of an outbox entry.
+    :param include_payload: Add the test case sent to AIO
+    """
+    summary = {
+        "outbox_id": entry.id,
+        "status": entry.status,
+        "project_key": entry.project_key,
+        "title": entry.title,
+        "attempts": entry.attempts or 0,
+        "next_attempt_at": entry.next_attempt_at.isoformat() if entry.next_attempt_at and entry.status == "pending" else None,
+        "last_status_code": entry.last_status_code,
+        "last_error": entry.last_error,
+        "aio_key": entry.aio_key,
+        "created_at": entry.created_at.isoformat() if entry.created_at else None,
+        "sent_at": entry.sent_at.isoformat() if entry.sent_at else None,
+    }
+    if include_payload:
+        summary["payload"] = json.loads(entry.payload) if entry.payload else None
+    return summary
+
+class AIOOutbox:
+    """
+    Transactional outbox of AIO test case pushes, backed by the `aio_outbox` table.
+
+    Every payload is stored before it is sent, so a push that fails on a connection
+    error, throttling or a 5xx answer is not lost: it waits as "pending" for the
+    OutboxDrainer, which retries it with exponential backoff and jitter. After
+    max_attempts, or on an answer that cannot succeed later (other 4xx), the entry
+    is dead-lettered and kept for inspection and replay.
+
+    An entry is "sending" under a lease of lease_seconds while its push is in flight.
+    Drainers only take it back once the lease expired, i.e. its sender died, so a
+    drainer starting in another process never re-sends a push that is still running.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[sessionmaker] = None,
+        max_attempts: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        lease_seconds: Optional[float] = None,
+    ):
+        """
+        :param session_factory: Session factory of the outbox table (the app database if omitted)
+        :param max_attempts: Send attempts before an entry is dead-lettered (settings.AIO_OUTBOX_MAX_ATTEMPTS if omitted)
+        :param backoff_base: Seconds before the first retry (settings.AIO_OUTBOX_BACKOFF_BASE if omitted)
+        :param backoff_max: Longest wait between two retries (settings.AIO_OUTBOX_BACKOFF_MAX if omitted)
+        :param lease_seconds: Longest a push may stay sending before it is retried (settings.AIO_OUTBOX_LEASE_SECONDS if omitted)
+        """
+        self.session_factory = session_factory or SessionLocal
+        self.max_attempts = max_attempts or settings.AIO_OUTBOX_MAX_ATTEMPTS
+        self.backoff_base = settings.AIO_OUTBOX_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = settings.AIO_OUTBOX_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.lease_seconds = lease_seconds or settings.AIO_OUTBOX_LEASE_SECONDS
+        self._table_ready = False
+
+    def _session(self):
+        # Create the outbox table on first use, so the outbox also works outside app.main
+        if not self._table_ready:
+            models.AIOOutboxEntry.__table__.create(bind=self.session_factory.kw.get("bind", engine), checkfirst=True)
+            self._table_ready = True
+        return self.session_factory()
+
+    def _lease_expiry(self, now: datetime) -> datetime:
+        # End of the lease of an entry starting to send at `now`
+        return now + timedelta(seconds=self.lease_seconds)
+
+    def add(self, project_key: str, test_case: Dict) -> int:
+        """
+        Store a payload about to be sent as the entry's first attempt.
+        :return: Outbox entry ID
+        """
+        db = self._session()
+        try:
+            now = _utcnow()
+            entry = crud.create_outbox_entry(db, project_key, str(test_case.get("title") or "")[:255], json.dumps(test_case), now, self._lease_expiry(now))
+            return entry.id
+        finally:
+            db.close()
+
+    def settle(self, entry_id: int, outcome: Dict) -> Optional[str]:
+        """
+        Record the outcome of an attempt: sent, pending with its next retry time, or dead.
+        :param outcome: Push outcome as returned by PMService.deliver_aio_test_case
+        :return: New status of the entry, None if it no longer exists
+        """
+        db = self._session()
+        try:
+            entry = crud.get_outbox_entry(db, entry_id)
+            if entry is None:
+                return None
+            now = _utcnow()
+            if outcome["status"] != "failed":
+                crud.update_outbox_entry(db, entry, now, status="sent", aio_key=outcome.get("key"), sent_at=now, last_status_code=outcome.get("status_code"), last_error=None, claimed_until=None)
+                return "sent"
+            values = {"last_status_code": outcome.get("status_code"), "last_error": outcome.get("error"), "claimed_until": None}
+            if is_retryable(outcome) and (entry.attempts or 0) < self.max_attempts:
+                delay = backoff_delay(entry.attempts or 1, self.backoff_base, self.backoff_max)
+                crud.update_outbox_entry(db, entry, now, status="pending", next_attempt_at=now + timedelta(seconds=delay), **values)
+                logging.info(f"AIO outbox: {entry.title} failed attempt {entry.attempts}, retrying in {delay:.1f}s")
+                return "pending"
+            crud.update_outbox_entry(db, entry, now, status="dead", **values)
+            logging.error(f"AIO outbox: {entry.title} dead-lettered after {entry.attempts} attempts: {entry.last_error}")
+            return "dead"
+        finally:
+            db.close()
+
+    def claim_due(self, limit: int) -> List[Tuple[int, str, Dict]]:
+        """
+        Claim pending entries whose retry time has come, after requeueing entries whose sender died.
+        :return: (entry ID, project key, test case) per claimed entry
+        """
+        self.requeue_interrupted()
+        db = self._session()
+        try:
+            now = _utcnow()
+            return [(entry.id, entry.project_key, json.loads(entry.payload)) for entry in crud.claim_due_outbox_entries(db, now, limit, self._lease_expiry(now))]
+        finally:
+            db.close()
+
+    def requeue_interrupted(self) -> int:
+        """
+        Make entries still sending after their lease expired (shutdown or crash of their sender) due for a retry.
+        Entries of pushes still in flight, in this or another process, are left alone.
+        :return: Number of requeued entries
+        """
+        db = self._session()
+        try:
+            requeued = crud.requeue_expired_outbox_entries(db, _utcnow())
+        finally:
+            db.close()
+        if requeued:
+            logging.info(f"AIO outbox: requeued {requeued} interrupted pushes")
+        return requeued
+
+    def replay(self, db: Session, entry: models.AIOOutboxEntry) -> models.AIOOutboxEntry:
+        """
+        Make a dead or pending entry due now, with a fresh set of attempts.
+        :raises ValueError: For an entry that was already sent or is being sent
+        """
+        if entry.status not in ("dead", "pending"):
+            raise ValueError(f"Only dead or pending entries can be replayed, entry is {entry.status}")
+        now = _utcnow()
+        return crud.update_outbox_entry(db, entry, now, status="pending", attempts=0, next_attempt_at=now)
+
+# Shared outbox used by every PMService unless one is injected explicitly
+aio_outbox = AIOOutbox()
+
+class OutboxDrainer:
+    """
+    Background thread retrying due outbox entries through the synchronous PMService.
+    Entries are claimed conditionally and sending entries are only retried once their
+    lease expired, so several processes may drain the same outbox.
+    """
+
+    def __init__(self, pm_service: "PMService", outbox: Optional[AIOOutbox] = None, poll_interval: Optional[float] = None, batch: Optional[int] = None):
+        """
+        :param pm_service: Synchronous PMService used for the retries
+        :param outbox: Outbox to drain (the PMService's outbox if omitted)
+        :param poll_interval: Seconds the drainer waits before checking for due retries again
+        :param batch: Due entries claimed per round (settings.AIO_OUTBOX_BATCH if omitted)
+        """
+        self.pm_service = pm_service
+        self.outbox = outbox or pm_service.outbox or aio_outbox
+        self.poll_interval = poll_interval or settings.AIO_OUTBOX_POLL_INTERVAL
+        self.batch = batch or settings.AIO_OUTBOX_BATCH
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def start(self):
+        """
+        Start the drainer thread.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._worker, name="aio-outbox-drainer", daemon=True)
+        self._thread.start()
+        logging.info("AIO outbox: drainer started")
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop the drainer. An entry still being sent is retried once its lease expires.
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def replay(self, db: Session, entry: models.AIOOutboxEntry) -> models.AIOOutboxEntry:
+        """
+        Replay an entry and wake up the drainer.
+        :raises ValueError: For an entry that was already sent or is being sent
+        """
+        entry = self.outbox.replay(db, entry)
+        self._wakeup.set()
+        return entry
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logging.error(f"AIO outbox: drainer error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def run_once(self) -> int:
+        """
+        Retry the due entries of one batch in the calling thread.
+        :return: Number of retried entries, 0 when nothing was due
+        """
+        claimed = self.outbox.claim_due(self.batch)
+        for entry_id, project_key, test_case in claimed:
+            if self._stop.is_set():
+                # Left sending; retried once its lease expires
+                return len(claimed)
+            try:
+                outcome = self.pm_service.deliver_aio_test_case(project_key, test_case)
+            except Exception as e:
+                outcome = {"status": "failed", "key": None, "status_code": None, "error": str(e)}
+            self.outbox.settle(entry_id, outcome)
+        return len(claimed)
@@ -0,0 +1,131 @@
+# app/batch_generation.py
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from .ai_service import AsyncAIService
+from .config import settings
+from .jira_service import STORY_FIELDS, normalize_issue_key
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+def batch_jql(project_key: str, jql: Optional[str] = None) -> str:
+    """
+    JQL selecting the batch's stories: the extra filter within the project, or all of its stories.
+    """
+    if jql and jql.strip():
+        return f"project={project_key} AND ({jql})"
+    return f"project={project_key} AND issuetype=Story"
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def _in_project(issue_key: str, project_key: str) -> bool:
+    # Issue keys carry their project key as prefix
+    return issue_key.rsplit("-", 1)[0] == project_key.strip().upper()
+
+def _failed_result(issue_key: str, error: str) -> Dict:
+    return {"key": issue_key, "status": "failed", "total_generated": 0, "test_cases": [], "elapsed_ms": 0.0, "error": error}
+
+def _story_result(issue_key: str, entry: Dict, packed: bool) -> Dict:
+    # Batch result of a story from its generation entry; a story without test cases reports why
+    test_cases = entry["test_cases"]
+    result = {"key": issue_key, "status": "ok" if test_cases else "failed", "total_generated": len(test_cases), "test_cases": test_cases, "elapsed_ms": entry["elapsed_ms"]}
+    if packed:
+        result["packed"] = entry["packed"]
+    if not test_cases:
+        result["error"] = entry.get("error") or "No valid test cases could be generated"
+    return result
+
+async def generate_batch(
+    ai_service: AsyncAIService,
+    project_key: str,
+    jql: Optional[str] = None,
+    issue_keys: Optional[List[str]] = None,
+    model: str = "meta-llama/llama-3-8b-instruct",
+    temperature: float = 0.7,
+    max_tokens: int = 666,
+    use_cache: bool = True,
+    jira_concurrency: Optional[int] = None,
+    openrouter_concurrency: Optional[int] = None,
+    pack: bool = False,
+) -> Dict:
+    """
+    Generate test cases for many stories of a project.
+    Stories are fetched with bulk searches (explicit keys) or a paged JQL search, and
+    each story is handed to OpenRouter as soon as it arrives, with at most
+    `openrouter_concurrency` generations in flight. A failing story is reported in
+    its result and does not abort the batch. Results are reported in input order.
+    :param project_key: Jira project key, e.g. 'TG'
+    :param jql: Extra JQL filter within the project, used when no issue keys are given
+    :param issue_keys: Explicit issue keys to generate for; keys of other projects fail without being fetched
+    :param jira_concurrency: Parallel Jira searches (settings.JIRA_BULK_CONCURRENCY if omitted)
+    :param openrouter_concurrency: Parallel generations (settings.BATCH_OPENROUTER_CONCURRENCY if omitted)
+    :param pack: Combine small stories into shared prompts; stories are then generated once all are fetched
+    :return: Summary with per-story results, timings and failures
+    """
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(openrouter_concurrency or settings.BATCH_OPENROUTER_CONCURRENCY)
+
+    async def generate(index: int, story: Dict) -> Tuple[int, Dict]:
+        async with semaphore:
+            entry = await ai_service.generate_story_result(story, model, temperature, max_tokens, use_cache)
+            return index, _story_result(story["key"], entry, packed=False)
+
+    async def generate_packed(stories: List[Tuple[int, Dict]]) -> List[Tuple[int, Dict]]:
+        packed = await ai_service.generate_packed_test_cases([story for _, story in stories], model, temperature, max_tokens, use_cache, openrouter_concurrency)
+        return [(index, _story_result(story["key"], packed[story["key"]], packed=True)) for index, story in stories]
+
+    def submit(index: int, story: Dict):
+        # Start generating right away, or keep the story for packing
+        if pack:
+            stories.append((index, story))
+        else:
+            tasks.append(asyncio.ensure_future(generate(index, story)))
+
+    tasks: List[asyncio.Future] = []
+    stories: List[Tuple[int, Dict]] = []
+    # (input position, result) pairs; generations finish in any order
+    indexed: List[Tuple[int, Dict]] = []
+    try:
+        if issue_keys:
+            fetch: List[Tuple[int, str]] = []
+            for index, issue_key in enumerate(issue_keys):
+                normalized = normalize_issue_key(issue_key)
+                if normalized and not _in_project(normalized, project_key):
+                    indexed.append((index, _failed_result(issue_key, f"Issue is not in project {project_key}")))
+                else:
+                    fetch.append((index, issue_key))
+            bulk = await ai_service.jira_service.get_user_stories_by_keys([issue_key for _, issue_key in fetch], jira_concurrency) if fetch else {"results": []}
+            for (index, _), entry in zip(fetch, bulk["results"]):
+                if entry["found"]:
+                    submit(index, ai_service.story_from_jira_issue(entry["story"]))
+                else:
+                    indexed.append((index, _failed_result(entry["key"], entry["error"])))
+        else:
+            index = 0
+            async for issue in ai_service.jira_service.iter_issues(batch_jql(project_key, jql), STORY_FIELDS):
+                submit(index, ai_service.story_from_jira_issue(issue))
+                index += 1
+        jira_ms = _elapsed_ms(started)
+        indexed.extend(await generate_packed(stories) if pack else await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    results = [result for _, result in sorted(indexed, key=lambda pair: pair[0])]
+
+    failed = [result["key"] for result in results if result["status"] == "failed"]
+    logging.info(f"Batch generation for {project_key}: {len(results) - len(failed)} succeeded, {len(failed)} failed")
+    return {
+        "project_key": project_key,
+        "total_stories": len(results),
+        "succeeded": len(results) - len(failed),
+        "failed": failed,
+        "total_generated": sum(result["total_generated"] for result in results),
+        "jira_ms": jira_ms,
+        "elapsed_ms": _elapsed_ms(started),
+        "results": results,
+    }
@@ -28,14 +28,83 @@ class Settings(BaseSettings):
     JIRA_PROJECT_KEY: str = "PROJ"
     JIRA_EMAIL: str = "your-email@example.com"
     JIRA_API_TOKEN: str = "your-jira-api-token"
+    JIRA_PAGE_SIZE: int = 100  # Issues requested per search page (Jira caps this at 100)
+    JIRA_BULK_CHUNK_SIZE: int = 100  # Issue keys per `key in (...)` search in bulk fetches
+    JIRA_BULK_CONCURRENCY: int = 4  # Bulk fetch chunks searched in parallel
+    JIRA_MIRROR_SYNC_OVERLAP_MINUTES: int = 5  # Extra minutes re-requested by incremental mirror syncs
+    STORY_CACHE_MAX_ENTRIES: int = 1024  # Jira issues kept in the story cache
+    STORY_CACHE_TTL: float = 30.0  # Seconds a cached story is used before revalidating its `updated` timestamp
+    ADF_MEMO_MAX_ENTRIES: int = 2048  # Flattened descriptions memoized per (issue key, updated)
 
     # OpenRouter AI configuration
     OPENROUTER_URL: str = "https://openrouter.ai/api"
     OPENROUTER_API_KEY: str = "your-openrouter-api-key"
 
+    # Prompt layout
+    PROMPT_STATIC_PREFIX: bool = True  # Send the fixed instructions as a cacheable system prefix instead of repeating them in each prompt
+    PROMPT_CACHE_CONTROL_MODELS: list[str] = ["anthropic/", "google/gemini"]  # Model prefixes that need explicit cache_control breakpoints
+
+    # LLM generation cache
+    GENERATION_CACHE_MEMORY_ENTRIES: int = 256  # Generations kept in the in-memory LRU tier
+    GENERATION_CACHE_TTL: float = 7 * 24 * 3600.0  # Seconds a cached generation stays valid
+    GENERATION_CACHE_MAX_BYTES: int = 50 * 1024 * 1024  # Size budget of the persistent SQLite tier
+
+    # Continuation of generations truncated by max_tokens
+    GENERATION_MAX_CONTINUATIONS: int = 3  # Follow-up requests for the remaining test cases (0 disables)
+    GENERATION_TOKEN_BUDGET: int = 4000  # Completion tokens one generation may spend across all its requests
+
+    # Section-chunked generation of long stories
+    GENERATION_CHUNK_MAX_CHARS: int = 1500  # Description characters per chunk; sections and list items are not split
+    GENERATION_CHUNK_CONCURRENCY: int = 4  # Chunks generated in parallel
+    BATCH_OPENROUTER_CONCURRENCY: int = 4  # Stories generated in parallel by batch requests
+
+    # Packing of several small stories into one prompt
+    PACKING_MAX_STORY_CHARS: int = 600  # Stories with a longer summary + description are generated on their own
+    PACKING_MAX_STORIES: int = 5  # Stories per packed prompt
+
+    # Hedged multi-model generation (race mode)
+    GENERATION_RACE_STAGGER: float = 0.0  # Seconds before the next model is started if none answered yet (0 starts all at once)
+
+    # Adaptive model and max_tokens selection (model="auto")
+    AUTO_DEFAULT_MODEL: str = "meta-llama/llama-3-8b-instruct"  # Used until enough generations of similar size are recorded
+    AUTO_MIN_SAMPLES: int = 5  # Recorded generations of similar size a model needs before auto mode considers it
+    AUTO_MAX_TRUNCATION_RATE: float = 0.05  # Target share of first responses cut off by max_tokens
+    AUTO_MAX_FAILURE_RATE: float = 0.2  # Models producing no test cases more often are not chosen
+    AUTO_TOKEN_HEADROOM: float = 1.15  # Factor applied to the recorded output tokens
+    AUTO_MIN_TOKENS: int = 256  # Bounds of the chosen max_tokens
+    AUTO_MAX_TOKENS: int = 4000
+    AUTO_SIZE_FLOOR_CHARS: int = 200  # Descriptions shorter than this are compared as if they had this length
+    AUTO_HISTORY_SIZE: int = 2000  # Recent generations kept in memory for selection
+
+    # Background job queue
+    JOB_WORKERS: int = 2  # Worker threads executing queued jobs (0 disables workers in this process)
+    JOB_POLL_INTERVAL: float = 1.0  # Seconds an idle worker waits before checking for new jobs
+    JOB_LEASE_SECONDS: float = 60.0  # Lease of a running job, renewed by its process; other processes requeue it once expired
+    JOB_PUSH_BATCH: int = 8  # Test cases a job pushes to AIO concurrently per committed step
+
     # AIO Tests configuration
     AIO_API_TOKEN: str = "your-aio-api-token"
     AIO_API_URL: str = "https://api.aio.com/v1"  # Default URL, can be overridden
+    AIO_PUSH_CONCURRENCY: int = 8  # Test cases pushed to AIO in parallel
+    AIO_RATE_LIMIT: float = 10.0  # Requests per second per AIO host (0 disables the limit)
+    AIO_RATE_BURST: int = 10  # Requests that may start at once before the rate limit spaces them
+    AIO_LINK_BATCH_SIZE: int = 50  # Keys added to an AIO test set or test cycle per request
+    AIO_SYNC_LEDGER: bool = True  # Skip unchanged and update changed test cases already pushed to AIO
+    AIO_SYNC_CLAIM_SECONDS: float = 60.0  # Longest a push holds a test case; concurrent pushes of it wait meanwhile
+    AIO_OUTBOX: bool = True  # Store each AIO payload before sending and retry failed pushes in the background
+    AIO_OUTBOX_DRAIN: bool = True  # Run the outbox retry worker in this process
+    AIO_OUTBOX_MAX_ATTEMPTS: int = 6  # Send attempts before a payload is dead-lettered
+    AIO_OUTBOX_BACKOFF_BASE: float = 2.0  # Seconds before the first retry, doubled for each following one
+    AIO_OUTBOX_BACKOFF_MAX: float = 300.0  # Longest wait between two retries
+    AIO_OUTBOX_POLL_INTERVAL: float = 1.0  # Seconds the drainer waits before checking for due retries
+    AIO_OUTBOX_BATCH: int = 20  # Due retries claimed per drain round
+    AIO_OUTBOX_LEASE_SECONDS: float = 600.0  # Longest a push may stay sending before a drainer retries it (keep above HTTP_TIMEOUT)
+
+    # Outbound HTTP transport configuration (shared by Jira, OpenRouter and AIO calls)
+    HTTP_POOL_CONNECTIONS: int = 10  # Number of connection pools cached per host session
+    HTTP_POOL_MAXSIZE: int = 20      # Keep-alive connections kept open per host
+    HTTP_TIMEOUT: float = 120.0      # Default request timeout in seconds
+    HTTP2_ENABLED: bool = False      # Use HTTP/2 where the client supports it
 
     class Config:
         env_file = ".env"
@@ -1,5 +1,9 @@
 # app/crud.py
 
+import json
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session  # Correct type for DB session
 from app import models, schemas
 
@@ -57,6 +61,229 @@ def get_generated_test_cases(db: Session, skip: int = 0, limit: int = 10):
     return db.query(models.GeneratedTestCase).offset(skip).limit(limit).all()
 
 
+# ----------------------------------------
+# Local Jira mirror
+# ----------------------------------------
+def get_jira_story(db: Session, story_key: str):
+    # Retrieve a mirrored Jira story by its issue key
+    return db.query(models.JiraStory).filter(models.JiraStory.story_key == story_key).first()
+
+def get_jira_stories(db: Session, project_key: str, issue_type: Optional[str] = None):
+    # Retrieve the mirrored stories of a project, optionally filtered by issue type
+    query = db.query(models.JiraStory).filter(models.JiraStory.project_key == project_key)
+    if issue_type:
+        query = query.filter(models.JiraStory.issue_type == issue_type)
+    return query.order_by(models.JiraStory.id).all()
+
+def upsert_jira_stories(db: Session, stories: List[schemas.JiraStoryMirrorCreate], synced_at: datetime) -> int:
+    # Insert new or update changed mirrored stories in one transaction, returns the number of rows written
+    keys = [story.story_key for story in stories]
+    existing = {}
+    for i in range(0, len(keys), 500):
+        rows = db.query(models.JiraStory).filter(models.JiraStory.story_key.in_(keys[i:i + 500])).all()
+        existing.update({row.story_key: row for row in rows})
+
+    written = 0
+    for story in stories:
+        db_story = existing.get(story.story_key)
+        if db_story is not None and db_story.updated == story.updated:
+            continue  # Unchanged since the last sync
+        if db_story is None:
+            db_story = models.JiraStory(story_key=story.story_key)
+            db.add(db_story)
+            existing[story.story_key] = db_story
+        for var, value in story.model_dump().items():
+            setattr(db_story, var, value)
+        db_story.synced_at = synced_at
+        written += 1
+    db.commit()
+    return written
+
+def get_jira_sync_state(db: Session, project_key: str):
+    # Retrieve the incremental sync state of a project
+    return db.query(models.JiraSyncState).filter(models.JiraSyncState.project_key == project_key).first()
+
+def set_jira_sync_state(db: Session, project_key: str, last_sync: datetime):
+    # Record the start time of the last successful sync of a project
+    state = get_jira_sync_state(db, project_key)
+    if state is None:
+        state = models.JiraSyncState(project_key=project_key)
+        db.add(state)
+    state.last_sync = last_sync
+    db.commit()
+    db.refresh(state)
+    return state
+
+# Create a queued background job
+def create_job(db: Session, job_type: str, project_key: Optional[str], issue_key: str, params: str, created_at: datetime):
+    job = models.Job(
+        job_type=job_type,
+        status="queued",
+        project_key=project_key,
+        issue_key=issue_key,
+        params=params,
+        generated=0,
+        pushed=0,
+        push_unchanged=0,
+        push_failed=0,
+        push_position=0,
+        attempts=0,
+        created_at=created_at,
+        updated_at=created_at
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+# Get a job by ID
+def get_job(db: Session, job_id: int):
+    return db.query(models.Job).filter(models.Job.id == job_id).first()
+
+# Get the most recent jobs, optionally of one status
+def get_jobs(db: Session, status: Optional[str] = None, limit: int = 50):
+    query = db.query(models.Job)
+    if status:
+        query = query.filter(models.Job.status == status)
+    return query.order_by(models.Job.id.desc()).limit(limit).all()
+
+# Update fields of a job and record the time of the change
+def update_job(db: Session, job: models.Job, updated_at: datetime, **values):
+    for field, value in values.items():
+        setattr(job, field, value)
+    job.updated_at = updated_at
+    db.commit()
+    db.refresh(job)
+    return job
+
+# Atomically move the oldest queued job to running under the owner's lease; None when the queue is empty
+def claim_next_job(db: Session, started_at: datetime, owner: str, lease_expires_at: datetime):
+    while True:
+        job = db.query(models.Job).filter(models.Job.status == "queued").order_by(models.Job.id).first()
+        if job is None:
+            return None
+        # The status condition makes the claim safe against other workers picking the same job
+        claimed = db.query(models.Job).filter(models.Job.id == job.id, models.Job.status == "queued").update(
+            {"status": "running", "started_at": started_at, "updated_at": started_at, "attempts": models.Job.attempts + 1, "lease_owner": owner, "lease_expires_at": lease_expires_at},
+            synchronize_session=False
+        )
+        db.commit()
+        if claimed:
+            db.refresh(job)
+            return job
+
+# Extend the leases of the jobs an owner is running
+def renew_job_leases(db: Session, owner: str, lease_expires_at: datetime) -> int:
+    count = db.query(models.Job).filter(models.Job.status == "running", models.Job.lease_owner == owner).update(
+        {"lease_expires_at": lease_expires_at}, synchronize_session=False
+    )
+    db.commit()
+    return count
+
+# Put running jobs whose lease expired back in the queue, e.g. after their process crashed
+def requeue_expired_jobs(db: Session, now: datetime) -> int:
+    count = db.query(models.Job).filter(
+        models.Job.status == "running",
+        or_(models.Job.lease_expires_at.is_(None), models.Job.lease_expires_at < now)
+    ).update({"status": "queued", "lease_owner": None, "lease_expires_at": None, "updated_at": now}, synchronize_session=False)
+    db.commit()
+    return count
+
+# Store an AIO payload in the outbox before it is sent
+def create_outbox_entry(db: Session, project_key: str, title: str, payload: str, created_at: datetime, claimed_until: Optional[datetime] = None):
+    entry = models.AIOOutboxEntry(
+        project_key=project_key,
+        title=title,
+        payload=payload,
+        status="sending",
+        attempts=1,
+        next_attempt_at=created_at,
+        claimed_until=claimed_until,
+        created_at=created_at,
+        updated_at=created_at
+    )
+    db.add(entry)
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+# Get an outbox entry by ID
+def get_outbox_entry(db: Session, entry_id: int):
+    return db.query(models.AIOOutboxEntry).filter(models.AIOOutboxEntry.id == entry_id).first()
+
+# Get the most recent outbox entries, optionally of one status
+def get_outbox_entries(db: Session, status: Optional[str] = None, limit: int = 50):
+    query = db.query(models.AIOOutboxEntry)
+    if status:
+        query = query.filter(models.AIOOutboxEntry.status == status)
+    return query.order_by(models.AIOOutboxEntry.id.desc()).limit(limit).all()
+
+# Number of outbox entries per status
+def count_outbox_entries(db: Session):
+    rows = db.query(models.AIOOutboxEntry.status, func.count(models.AIOOutboxEntry.id)).group_by(models.AIOOutboxEntry.status).all()
+    return {status: count for status, count in rows}
+
+# Update fields of an outbox entry and record the time of the change
+def update_outbox_entry(db: Session, entry: models.AIOOutboxEntry, updated_at: datetime, **values):
+    for field, value in values.items():
+        setattr(entry, field, value)
+    entry.updated_at = updated_at
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+# Atomically move pending entries due for a retry to sending under a lease, oldest first
+def claim_due_outbox_entries(db: Session, now: datetime, limit: int, claimed_until: Optional[datetime] = None):
+    due = db.query(models.AIOOutboxEntry).filter(
+        models.AIOOutboxEntry.status == "pending", models.AIOOutboxEntry.next_attempt_at <= now
+    ).order_by(models.AIOOutboxEntry.next_attempt_at).limit(limit).all()
+    claimed = []
+    for entry in due:
+        # The status condition makes the claim safe against another drainer picking the same entry
+        if db.query(models.AIOOutboxEntry).filter(models.AIOOutboxEntry.id == entry.id, models.AIOOutboxEntry.status == "pending").update(
+            {"status": "sending", "updated_at": now, "attempts": models.AIOOutboxEntry.attempts + 1, "claimed_until": claimed_until},
+            synchronize_session=False
+        ):
+            claimed.append(entry)
+    db.commit()
+    for entry in claimed:
+        db.refresh(entry)
+    return claimed
+
+# Put entries sending past their lease back in the outbox, e.g. after their process crashed
+def requeue_expired_outbox_entries(db: Session, now: datetime) -> int:
+    count = db.query(models.AIOOutboxEntry).filter(
+        models.AIOOutboxEntry.status == "sending",
+        or_(models.AIOOutboxEntry.claimed_until.is_(None), models.AIOOutboxEntry.claimed_until < now)
+    ).update({"status": "pending", "next_attempt_at": now, "claimed_until": None, "updated_at": now}, synchronize_session=False)
+    db.commit()
+    return count
+
+# Record the outcome of a multi-model race
+def create_model_race_result(db: Session, issue_key: str, winner_model: Optional[str], latency_ms: Optional[float], stagger: float, raced_models: List[str], outcomes: List[dict], created_at: datetime):
+    race = models.ModelRaceResult(
+        issue_key=issue_key,
+        winner_model=winner_model,
+        latency_ms=latency_ms,
+        stagger=stagger,
+        models=json.dumps(raced_models),
+        outcomes=json.dumps(outcomes),
+        created_at=created_at
+    )
+    db.add(race)
+    db.commit()
+    db.refresh(race)
+    return race
+
+# Wins and average winning latency per model
+def get_model_race_stats(db: Session):
+    return db.query(
+        models.ModelRaceResult.winner_model,
+        func.count(models.ModelRaceResult.id),
+        func.avg(models.ModelRaceResult.latency_ms)
+    ).group_by(models.ModelRaceResult.winner_model).all()
+
+
 # Note: The above code assumes that the database session is managed by FastAPI's dependency injection system.
 # The `db` parameter in the functions is expected to be a SQLAlchemy session object.
 # This code provides basic CRUD operations for managing test cases in a database.
@@ -0,0 +1,195 @@
+# app/generation_cache.py
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+from . import models
+from .config import settings
+from .database import SessionLocal, engine
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+def _utcnow() -> datetime:
+    # Naive UTC timestamps, as stored by SQLite DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class GenerationCache:
+    """
+    Content-addressed cache of LLM generation results.
+
+    Keys are a hash of (system message, prompt, model, temperature, max_tokens, structured
+    output), so any change in the instructions, story text or generation settings produces
+    a new key. A small in-memory LRU sits in front of a persistent SQLite table that
+    survives restarts and is shared by all uvicorn workers using the same database.
+    """
+
+    def __init__(
+        self,
+        memory_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        persistent: bool = True,
+        session_factory: Optional[sessionmaker] = None,
+    ):
+        """
+        :param memory_entries: Entries kept in the in-memory LRU tier
+        :param ttl: Seconds a cached generation stays valid
+        :param max_bytes: Size budget of the persistent tier; least recently used entries are evicted beyond it
+        :param persistent: Set to False to use the in-memory tier only
+        :param session_factory: Session factory of the persistent tier (the app database if omitted)
+        """
+        self.memory_entries = memory_entries or settings.GENERATION_CACHE_MEMORY_ENTRIES
+        self.ttl = ttl or settings.GENERATION_CACHE_TTL
+        self.max_bytes = max_bytes or settings.GENERATION_CACHE_MAX_BYTES
+        self.persistent = persistent
+        self.session_factory = session_factory or SessionLocal
+        self._memory: "OrderedDict[str, Tuple[str, datetime]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(prompt: str, model: str, temperature: float, max_tokens: int, structured: bool = False, system_prompt: str = "") -> str:
+        """
+        Hash of everything that determines the generation output.
+        :param structured: Whether the generation requested JSON-schema structured output
+        :param system_prompt: System message sent with the prompt
+        """
+        payload = json.dumps([system_prompt, prompt, model, float(temperature), int(max_tokens), bool(structured)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _session(self):
+        # Create the cache table on first use, so the cache also works outside app.main
+        if not self._table_ready:
+            models.GenerationCacheEntry.__table__.create(bind=self.session_factory.kw.get("bind", engine), checkfirst=True)
+            self._table_ready = True
+        return self.session_factory()
+
+    def _remember(self, key: str, content: str, created_at: datetime):
+        with self._lock:
+            self._memory[key] = (content, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached raw generation for a key, or None on a miss or expired entry.
+        """
+        now = _utcnow()
+        expires_before = now - timedelta(seconds=self.ttl)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] >= expires_before:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+        if self.persistent:
+            db = None
+            try:
+                db = self._session()
+                row = db.query(models.GenerationCacheEntry).filter(models.GenerationCacheEntry.cache_key == key).first()
+                if row is not None and row.created_at >= expires_before:
+                    row.last_used_at = now
+                    row.hits = (row.hits or 0) + 1
+                    db.commit()
+                    self._remember(key, row.content, row.created_at)
+                    with self._lock:
+                        self.persistent_hits += 1
+                    return row.content
+                if row is not None:
+                    db.delete(row)
+                    db.commit()
+            except Exception as e:
+                logging.error(f"Generation cache lookup failed: {e}")
+            finally:
+                if db is not None:
+                    db.close()
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, model: str, content: str):
+        """
+        Store a successful generation in both tiers and enforce the size budget.
+        """
+        now = _utcnow()
+        self._remember(key, content, now)
+        with self._lock:
+            self.stores += 1
+        if not self.persistent:
+            return
+
+        db = None
+        try:
+            db = self._session()
+            row = db.query(models.GenerationCacheEntry).filter(models.GenerationCacheEntry.cache_key == key).first()
+            if row is None:
+                row = models.GenerationCacheEntry(cache_key=key, hits=0)
+                db.add(row)
+            row.model = model
+            row.content = content
+            row.size = len(content.encode("utf-8"))
+            row.created_at = now
+            row.last_used_at = now
+            db.commit()
+            self._evict(db)
+        except Exception as e:
+            logging.error(f"Generation cache store failed: {e}")
+        finally:
+            if db is not None:
+                db.close()
+
+    def _evict(self, db):
+        # Drop least recently used entries until the persistent tier fits in max_bytes
+        total = db.query(func.coalesce(func.sum(models.GenerationCacheEntry.size), 0)).scalar()
+        if total <= self.max_bytes:
+            return
+        rows = db.query(models.GenerationCacheEntry.id, models.GenerationCacheEntry.size).order_by(models.GenerationCacheEntry.last_used_at).all()
+        to_delete = []
+        for row_id, size in rows:
+            if total <= self.max_bytes:
+                break
+            to_delete.append(row_id)
+            total -= size or 0
+        db.query(models.GenerationCacheEntry).filter(models.GenerationCacheEntry.id.in_(to_delete)).delete(synchronize_session=False)
+        db.commit()
+        with self._lock:
+            self.evictions += len(to_delete)
+
+    def stats(self) -> Dict:
+        """
+        Hit-rate metrics of both tiers.
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.persistent_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": round((self.memory_hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+                "ttl": self.ttl,
+                "max_bytes": self.max_bytes,
+                "persistent": self.persistent,
+            }
+
+# Shared cache used by every AIService unless one is injected explicitly
+generation_cache = GenerationCache()
@@ -0,0 +1,207 @@
+# app/generation_stats.py
+
+import logging
+import math
+import statistics
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+from sqlalchemy.orm import sessionmaker
+from . import models
+from .config import settings
+from .database import SessionLocal, engine
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Model name selecting the model and max_tokens from recorded generations
+AUTO_MODEL = "auto"
+
+# Fields of one recorded generation, as kept in memory and in the generation_stats table
+STAT_FIELDS = ("issue_key", "model", "description_chars", "max_tokens", "completion_tokens", "test_cases", "latency_ms", "truncated", "continuations")
+
+def _utcnow() -> datetime:
+    # Naive UTC timestamps, as stored by SQLite DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _similar_size(description_chars: int, sample_chars: int) -> bool:
+    # Stories within a factor of two of each other count as similar; very short stories form one group
+    low = max(description_chars, settings.AUTO_SIZE_FLOOR_CHARS)
+    return low / 2 <= max(sample_chars, settings.AUTO_SIZE_FLOOR_CHARS) <= low * 2
+
+class GenerationStats:
+    """
+    History of LLM generations (story size, output tokens, test case count, latency, truncation)
+    used to choose the model and max_tokens when a generation asks for model="auto".
+
+    Recent generations are kept in memory and every record is also written to the
+    `generation_stats` table, so the history survives restarts.
+    """
+
+    def __init__(
+        self,
+        persistent: bool = True,
+        session_factory: Optional[sessionmaker] = None,
+        history_size: Optional[int] = None,
+    ):
+        """
+        :param persistent: Set to False to keep the history in memory only
+        :param session_factory: Session factory of the stats table (the app database if omitted)
+        :param history_size: Recent generations kept in memory for selection
+        """
+        self.persistent = persistent
+        self.session_factory = session_factory or SessionLocal
+        self._history: Deque[Dict] = deque(maxlen=history_size or settings.AUTO_HISTORY_SIZE)
+        self._lock = threading.Lock()
+        self._loaded = not persistent
+        self._table_ready = False
+
+    def _session(self):
+        # Create the stats table on first use, so the history also works outside app.main
+        if not self._table_ready:
+            models.GenerationStat.__table__.create(bind=self.session_factory.kw.get("bind", engine), checkfirst=True)
+            self._table_ready = True
+        return self.session_factory()
+
+    def _load(self):
+        # Fill the in-memory window with the most recent stored generations, once
+        if self._loaded:
+            return
+        self._loaded = True
+        db = None
+        try:
+            db = self._session()
+            rows = db.query(models.GenerationStat).order_by(models.GenerationStat.id.desc()).limit(self._history.maxlen).all()
+            with self._lock:
+                for row in reversed(rows):
+                    self._history.append({field: getattr(row, field) for field in STAT_FIELDS})
+        except Exception as e:
+            logging.error(f"Loading generation stats failed: {e}")
+        finally:
+            if db is not None:
+                db.close()
+
+    def record(self, issue_key: str, model: str, description_chars: int, max_tokens: int, completion_tokens: int, test_cases: int, latency_ms: float, truncated: bool, continuations: int = 0):
+        """
+        Record one uncached generation.
+        :param completion_tokens: Output tokens of the first response and its continuations
+        :param truncated: Whether the first response was cut off by max_tokens
+        """
+        self._load()
+        sample = {
+            "issue_key": issue_key,
+            "model": model,
+            "description_chars": description_chars,
+            "max_tokens": max_tokens,
+            "completion_tokens": completion_tokens,
+            "test_cases": test_cases,
+            "latency_ms": latency_ms,
+            "truncated": bool(truncated),
+            "continuations": continuations,
+        }
+        with self._lock:
+            self._history.append(sample)
+        if not self.persistent:
+            return
+
+        db = None
+        try:
+            db = self._session()
+            db.add(models.GenerationStat(**sample, created_at=_utcnow()))
+            db.commit()
+        except Exception as e:
+            logging.error(f"Storing generation stats failed: {e}")
+        finally:
+            if db is not None:
+                db.close()
+
+    @staticmethod
+    def _needed_tokens(sample: Dict) -> int:
+        # Output tokens the story needed; a truncated first response needed more than its limit
+        needed = sample["completion_tokens"] or 0
+        if sample["truncated"]:
+            needed = max(needed, (sample["max_tokens"] or 0) + 1)
+        return needed
+
+    def _model_estimate(self, model: str, samples: List[Dict]) -> Optional[Dict]:
+        # Token limit meeting the truncation target and expected latency of one model, None if it is unsuitable
+        failures = sum(1 for sample in samples if not sample["test_cases"])
+        if failures / len(samples) > settings.AUTO_MAX_FAILURE_RATE:
+            return None
+        needed = sorted(self._needed_tokens(sample) for sample in samples if sample["test_cases"])
+        index = min(len(needed) - 1, math.ceil((1 - settings.AUTO_MAX_TRUNCATION_RATE) * len(needed)) - 1)
+        max_tokens = math.ceil(needed[max(index, 0)] * settings.AUTO_TOKEN_HEADROOM)
+        max_tokens = min(max(max_tokens, settings.AUTO_MIN_TOKENS), settings.AUTO_MAX_TOKENS)
+
+        # Latency without continuations, which the chosen limit avoids; all samples if every one was truncated
+        complete = [sample for sample in samples if sample["test_cases"] and not sample["truncated"]] or samples
+        return {
+            "model": model,
+            "max_tokens": max_tokens,
+            "expected_latency_ms": round(statistics.median(sample["latency_ms"] for sample in complete), 1),
+            "expected_truncation_rate": round(sum(1 for tokens in needed if tokens > max_tokens) / len(needed), 4),
+            "samples": len(samples),
+        }
+
+    def select(self, description_chars: int, default_model: Optional[str] = None, default_max_tokens: int = 666) -> Dict:
+        """
+        Choose the model and max_tokens for a story from generations of similar size.
+        Only models with at least AUTO_MIN_SAMPLES similar generations are considered.
+        For each, max_tokens is the (1 - AUTO_MAX_TRUNCATION_RATE) quantile of the
+        output tokens those stories needed, plus AUTO_TOKEN_HEADROOM. Among the models
+        meeting the truncation target, the one with the lowest median latency wins.
+        :param description_chars: Length of the story's flattened description
+        :param default_model: Model used without enough history (settings.AUTO_DEFAULT_MODEL if omitted)
+        :param default_max_tokens: max_tokens used without enough history
+        :return: {"model", "max_tokens", "reason", ...}
+        """
+        self._load()
+        with self._lock:
+            similar = [sample for sample in self._history if _similar_size(description_chars, sample["description_chars"] or 0)]
+
+        by_model: Dict[str, List[Dict]] = {}
+        for sample in similar:
+            by_model.setdefault(sample["model"], []).append(sample)
+        estimates = [
+            estimate
+            for model, samples in by_model.items()
+            if len(samples) >= settings.AUTO_MIN_SAMPLES
+            for estimate in [self._model_estimate(model, samples)]
+            if estimate is not None
+        ]
+        if not estimates:
+            return {"model": default_model or settings.AUTO_DEFAULT_MODEL, "max_tokens": default_max_tokens, "reason": "insufficient_history", "samples": len(similar)}
+        within_target = [estimate for estimate in estimates if estimate["expected_truncation_rate"] <= settings.AUTO_MAX_TRUNCATION_RATE]
+        if within_target:
+            best = min(within_target, key=lambda estimate: (estimate["expected_latency_ms"], estimate["max_tokens"]))
+        else:
+            # Even AUTO_MAX_TOKENS truncates too often: least truncation first
+            best = min(estimates, key=lambda estimate: (estimate["expected_truncation_rate"], estimate["expected_latency_ms"]))
+        return {**best, "reason": "history", "candidates": len(estimates)}
+
+    def summary(self) -> List[Dict]:
+        """
+        Recorded generations per model: counts, truncation rate and median latency and output tokens.
+        """
+        self._load()
+        with self._lock:
+            history = list(self._history)
+        by_model: Dict[str, List[Dict]] = {}
+        for sample in history:
+            by_model.setdefault(sample["model"], []).append(sample)
+        return [
+            {
+                "model": model,
+                "generations": len(samples),
+                "truncation_rate": round(sum(1 for sample in samples if sample["truncated"]) / len(samples), 4),
+                "failure_rate": round(sum(1 for sample in samples if not sample["test_cases"]) / len(samples), 4),
+                "median_latency_ms": round(statistics.median(sample["latency_ms"] for sample in samples), 1),
+                "median_completion_tokens": statistics.median(sample["completion_tokens"] or 0 for sample in samples),
+                "median_description_chars": statistics.median(sample["description_chars"] or 0 for sample in samples),
+            }
+            for model, samples in sorted(by_model.items())
+        ]
+
+# Shared history used by every AIService unless one is injected explicitly
+generation_stats = GenerationStats()
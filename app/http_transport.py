@@ -0,0 +1,317 @@
+# app/http_transport.py
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from .config import settings
+
+try:
+    import h2  # noqa: F401  Optional dependency required by httpx for HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+class HTTPTransport:
+    """
+    Shared HTTP transport for outbound calls to Jira, OpenRouter and AIO.
+
+    Keeps one pooled, keep-alive requests.Session per host so repeated calls
+    reuse open TCP/TLS connections instead of paying a new handshake each time.
+    The async services get the same pooling from one httpx.AsyncClient per host.
+    """
+
+    def __init__(
+        self,
+        pool_connections: Optional[int] = None,
+        pool_maxsize: Optional[int] = None,
+        timeout: Optional[float] = None,
+        http2: Optional[bool] = None,
+    ):
+        """
+        Initialize the transport with pool configuration from settings.
+        :param pool_connections: Number of connection pools cached per session
+        :param pool_maxsize: Maximum number of keep-alive connections kept per host
+        :param timeout: Default request timeout in seconds
+        :param http2: Enable HTTP/2 for the async clients (requests sessions speak HTTP/1.1)
+        """
+        self.pool_connections = pool_connections or settings.HTTP_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or settings.HTTP_POOL_MAXSIZE
+        self.timeout = timeout or settings.HTTP_TIMEOUT
+        self.http2 = settings.HTTP2_ENABLED if http2 is None else http2
+
+        self._sessions: Dict[str, requests.Session] = {}
+        self._adapters: Dict[str, HTTPAdapter] = {}
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._async_clients: Dict[str, Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+        self._retired_clients: List[httpx.AsyncClient] = []
+        self._lock = threading.Lock()
+
+        if self.http2 and not HTTP2_AVAILABLE:
+            logging.warning("HTTPTransport: HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1")
+            self.http2 = False
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        # Pools are shared per scheme + host (+ port)
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _host_counters(self, url: str) -> Dict[str, float]:
+        # Request counters shared by the sync session and async client of a host
+        with self._lock:
+            return self._counters.setdefault(self._host_key(url), {"requests": 0, "errors": 0, "total_time": 0.0})
+
+    def session_for(self, url: str) -> requests.Session:
+        """
+        Return the pooled session for the host of the given URL, creating it on first use.
+        """
+        host = self._host_key(url)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[host] = session
+                self._adapters[host] = adapter
+                logging.info(f"HTTPTransport: opened pooled session for {host} (pool_maxsize={self.pool_maxsize})")
+            return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request through the pooled session for the URL's host.
+        Accepts the same keyword arguments as requests.Session.request.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        session = self.session_for(url)
+        counters = self._host_counters(url)
+        started = time.perf_counter()
+        try:
+            return session.request(method, url, **kwargs)
+        except Exception:
+            with self._lock:
+                counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                counters["requests"] += 1
+                counters["total_time"] += time.perf_counter() - started
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def async_client_for(self, url: str) -> httpx.AsyncClient:
+        """
+        Return the pooled async client for the host of the given URL, creating it on first use.
+        Clients are bound to the running event loop and recreated if the loop changes;
+        the replaced client is closed on its own loop, or by aclose() if that loop has stopped.
+        """
+        host = self._host_key(url)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async_clients.get(host)
+            if entry is None or entry[0] is not loop:
+                if entry is not None:
+                    self._retire_async_client(*entry)
+                client = httpx.AsyncClient(
+                    http2=self.http2,
+                    timeout=self.timeout,
+                    limits=httpx.Limits(
+                        max_connections=self.pool_maxsize,
+                        max_keepalive_connections=self.pool_maxsize,
+                    ),
+                )
+                self._async_clients[host] = (loop, client)
+                logging.info(f"HTTPTransport: opened pooled async client for {host} (http2={self.http2})")
+                return client
+            return entry[1]
+
+    def _retire_async_client(self, loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient):
+        # Close a client of another event loop there, or keep it for aclose() if that loop no longer runs
+        if loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        else:
+            self._retired_clients.append(client)
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request through the pooled async client for the URL's host.
+        Accepts the same keyword arguments as httpx.AsyncClient.request.
+        """
+        client = self.async_client_for(url)
+        counters = self._host_counters(url)
+        started = time.perf_counter()
+        try:
+            return await client.request(method, url, **kwargs)
+        except Exception:
+            with self._lock:
+                counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                counters["requests"] += 1
+                counters["total_time"] += time.perf_counter() - started
+
+    @asynccontextmanager
+    async def astream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        Send a request through the pooled async client and expose the response body as a stream.
+        Usage: async with transport.astream("POST", url, json=...) as response: ...
+        """
+        client = self.async_client_for(url)
+        counters = self._host_counters(url)
+        started = time.perf_counter()
+        try:
+            async with client.stream(method, url, **kwargs) as response:
+                yield response
+        except Exception:
+            with self._lock:
+                counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                counters["requests"] += 1
+                counters["total_time"] += time.perf_counter() - started
+
+    async def aget(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest("POST", url, **kwargs)
+
+    def stats(self) -> Dict:
+        """
+        Pool statistics per host, useful for tuning pool sizes.
+        :return: Dictionary with transport configuration and per-host counters
+        """
+        hosts = {}
+        with self._lock:
+            for host in sorted(set(self._counters) | set(self._adapters) | set(self._async_clients)):
+                counters = self._counters.get(host, {"requests": 0, "errors": 0, "total_time": 0.0})
+                requests_sent = int(counters["requests"])
+                host_stats = {
+                    "requests": requests_sent,
+                    "errors": int(counters["errors"]),
+                    "avg_latency_ms": round(counters["total_time"] * 1000 / requests_sent, 2) if requests_sent else 0.0,
+                    "connections_opened": 0,
+                    "requests_on_pool": 0,
+                    "async_client": host in self._async_clients,
+                }
+                adapter = self._adapters.get(host)
+                if adapter is not None:
+                    pool_container = adapter.poolmanager.pools
+                    pools = [pool_container[key] for key in pool_container.keys()]
+                    host_stats["connections_opened"] = sum(pool.num_connections for pool in pools)
+                    host_stats["requests_on_pool"] = sum(pool.num_requests for pool in pools)
+                hosts[host] = host_stats
+        return {
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "timeout": self.timeout,
+            "http2": self.http2,
+            "hosts": hosts,
+        }
+
+    def close(self):
+        """
+        Close all pooled sessions and their connections.
+        """
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._adapters.clear()
+            self._counters.clear()
+        logging.info("HTTPTransport: all pooled sessions closed")
+
+    async def aclose(self):
+        """
+        Close the async clients owned by the running event loop and those retired from
+        stopped loops, then the pooled sessions.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = [client for client_loop, client in self._async_clients.values() if client_loop is loop]
+            for client_loop, client in self._async_clients.values():
+                if client_loop is not loop:
+                    self._retire_async_client(client_loop, client)
+            retired = self._retired_clients
+            self._async_clients.clear()
+            self._retired_clients = []
+        for client in clients:
+            await client.aclose()
+        for client in retired:
+            try:
+                await client.aclose()
+            except Exception as e:
+                # Connections of a closed loop cannot be shut down cleanly; drop them
+                logging.debug(f"HTTPTransport: closing a client of a stopped event loop failed: {e}")
+        self.close()
+
+class HostRateLimiter:
+    """
+    Per-host request rate limit (token bucket, as a generic cell rate algorithm).
+
+    Up to `burst` requests to a host start immediately; after that, requests are
+    spaced 1 / `rate` seconds apart. Each caller reserves its slot under the lock
+    and then sleeps outside it, so concurrent callers queue in arrival order.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        :param rate: Requests per second per host (0 disables the limit)
+        :param burst: Requests that may start at once before spacing applies
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _reserve(self, url: str) -> float:
+        # Seconds the caller must wait before sending its request to the URL's host
+        if self.rate <= 0:
+            return 0.0
+        interval = 1.0 / self.rate
+        now = time.monotonic()
+        host = HTTPTransport._host_key(url)
+        with self._lock:
+            slot = max(self._next_slot.get(host, now), now)
+            self._next_slot[host] = slot + interval
+        return max(0.0, slot - now - (self.burst - 1) * interval)
+
+    def acquire(self, url: str) -> float:
+        """
+        Block until a request to the URL's host may be sent.
+        :return: Seconds waited
+        """
+        wait = self._reserve(url)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, url: str) -> float:
+        """
+        Awaitable version of acquire.
+        """
+        wait = self._reserve(url)
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
@@ -0,0 +1,108 @@
+# app/jira_mirror.py
+
+import logging
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from . import crud, models, schemas
+from .ai_service import AIService
+from .config import settings
+from .jira_service import JiraService
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Issue fields stored in the local mirror
+MIRROR_FIELDS = "summary,description,status,updated,issuetype"
+
+def mirror_row_from_issue(issue: Dict, project_key: str) -> schemas.JiraStoryMirrorCreate:
+    """
+    Convert a Jira issue into a mirror row, flattening its ADF description.
+    """
+    fields = issue.get("fields", {})
+    return schemas.JiraStoryMirrorCreate(
+        story_key=issue["key"],
+        jira_id=str(issue.get("id", "")),
+        project_key=project_key,
+        issue_type=(fields.get("issuetype") or {}).get("name"),
+        summary=fields.get("summary") or "",
+        description=AIService.flatten_adf_description(fields.get("description") or {}),
+        status=(fields.get("status") or {}).get("name"),
+        updated=fields.get("updated")
+    )
+
+def sync_project(db: Session, jira_service: JiraService, project_key: str, full: bool = False) -> Dict:
+    """
+    Pull the project's issues into the local mirror.
+    After the first sync only issues updated since the last sync (plus a small
+    overlap) are requested, using a relative JQL duration so Jira user time zones
+    do not matter.
+    :param project_key: Jira project key, e.g. 'TG'
+    :param full: Ignore the last sync time and pull every issue of the project
+    :return: Sync summary with fetched and written row counts
+    """
+    started = datetime.now(timezone.utc).replace(tzinfo=None)
+    state = crud.get_jira_sync_state(db, project_key)
+
+    if state is not None and state.last_sync is not None and not full:
+        minutes = math.ceil((started - state.last_sync).total_seconds() / 60) + settings.JIRA_MIRROR_SYNC_OVERLAP_MINUTES
+        jql = f"project={project_key} AND updated >= -{minutes}m ORDER BY updated ASC"
+        incremental = True
+    else:
+        jql = f"project={project_key} ORDER BY updated ASC"
+        incremental = False
+    logging.info(f"Jira mirror: syncing {project_key} ({'incremental' if incremental else 'full'})")
+
+    fetched = 0
+    written = 0
+    batch: List[schemas.JiraStoryMirrorCreate] = []
+    for issue in jira_service.iter_issues(jql, MIRROR_FIELDS, strict=True):
+        batch.append(mirror_row_from_issue(issue, project_key))
+        fetched += 1
+        if len(batch) >= settings.JIRA_PAGE_SIZE:
+            written += crud.upsert_jira_stories(db, batch, started)
+            batch = []
+    if batch:
+        written += crud.upsert_jira_stories(db, batch, started)
+
+    # Only advance the watermark once every page was stored
+    crud.set_jira_sync_state(db, project_key, started)
+    logging.info(f"Jira mirror: {project_key} fetched {fetched} issues, wrote {written}")
+    return {
+        "project_key": project_key,
+        "incremental": incremental,
+        "fetched": fetched,
+        "written": written,
+        "last_sync": started.isoformat()
+    }
+
+def story_from_mirror(row: models.JiraStory) -> Dict:
+    """
+    Mirror row as a story dictionary, in the shape used by AIService prompts.
+    """
+    return {
+        "key": row.story_key,
+        "id": row.jira_id,
+        "summary": row.summary or "",
+        "description": row.description or "",
+        "updated": row.updated,
+    }
+
+def listed_story_from_mirror(row: models.JiraStory) -> Dict:
+    """
+    Mirror row in the shape returned by GET /jira/stories/ (description is already flattened).
+    """
+    return {
+        "key": row.story_key,
+        "summary": row.summary,
+        "description": row.description,
+        "status": row.status
+    }
+
+def get_mirrored_story(db: Session, issue_key: str) -> Optional[Dict]:
+    """
+    Look up a story in the mirror, None if it has not been synced.
+    """
+    row = crud.get_jira_story(db, issue_key)
+    return story_from_mirror(row) if row is not None else None
@@ -1,82 +1,398 @@
 # app/jira_service.py
 
-import requests
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
 from requests.auth import HTTPBasicAuth
-from typing import List, Dict
+from typing import AsyncIterator, Iterator, List, Dict, Optional, Tuple
+from .config import settings
+from .http_transport import HTTPTransport
+from .story_cache import StoryCache, story_cache as shared_story_cache
+
+# Issue fields fetched for a single story
+STORY_FIELDS = "summary,description,status,updated"
+
+# Jira issue key, e.g. TG-1; only keys of this shape are ever written into JQL
+ISSUE_KEY_PATTERN = re.compile(r"^[A-Z][A-Z0-9_]*-\d+$")
+
+def normalize_issue_key(issue_key: str) -> Optional[str]:
+    """
+    Stripped, upper-cased issue key, or None if it is not a valid Jira issue key.
+    """
+    normalized = (issue_key or "").strip().upper()
+    return normalized if ISSUE_KEY_PATTERN.match(normalized) else None
 
 class JiraService:
-    def __init__(self, domain: str, email: str, api_token: str):
+    def __init__(
+        self,
+        domain: str,
+        email: str,
+        api_token: str,
+        transport: Optional[HTTPTransport] = None,
+        story_cache: Optional[StoryCache] = None
+    ):
         """
         Initialize JiraService with connection configuration.
         :param domain: Jira domain, e.g. 'https://yourcompany.atlassian.net'
         :param email: Jira user email
         :param api_token: API token for authentication
+        :param transport: Shared pooled HTTP transport (a private one is created if omitted)
+        :param story_cache: Issue cache (the process-wide shared cache if omitted)
         """
         self.domain = domain
         self.email = email
         self.api_token = api_token
         self.auth = HTTPBasicAuth(email, api_token)
         self.headers = {"Accept": "application/json"}
+        self.transport = transport or HTTPTransport()
+        self.story_cache = story_cache or shared_story_cache
         print(f"JiraService initialized for {domain} with user {email}")
 
+    def _search_request(self, project_key: str, issue_type: str) -> Tuple[str, Dict]:
+        # URL and query parameters for a project/issue type search
+        jql = f"project={project_key} AND issuetype={issue_type}"
+        return self._jql_request(jql, "summary,description,status")
+
+    def _jql_request(self, jql: str, fields: str) -> Tuple[str, Dict]:
+        # URL and query parameters for an arbitrary JQL search
+        url = f"{self.domain}/rest/api/3/search"
+        params = {
+            "jql": jql,
+            "fields": fields
+        }
+        return url, params
+
+    def _keys_chunk_request(self, chunk: List[str]) -> Tuple[str, Dict]:
+        # `key in (...)` search for one chunk of validated issue keys; unknown keys only produce warnings
+        url, params = self._jql_request(f"key in ({','.join(chunk)})", STORY_FIELDS)
+        params["validateQuery"] = "warn"
+        return url, params
+
+    @staticmethod
+    def _bulk_chunks(issue_keys: List[str]) -> List[List[str]]:
+        # Unique, normalized valid keys split into chunks of the maximum search size; invalid keys are never sent
+        unique_keys = list(dict.fromkeys(key for key in map(normalize_issue_key, issue_keys) if key))
+        size = max(1, min(settings.JIRA_BULK_CHUNK_SIZE, settings.JIRA_PAGE_SIZE))
+        return [unique_keys[i:i + size] for i in range(0, len(unique_keys), size)]
+
+    def _bulk_result(self, issue_keys: List[str], chunks: List[List[str]], pages: List[Optional[Dict]]) -> Dict:
+        # Per-key results in input order, with invalid, not-found and failed-chunk reporting
+        found = {}
+        failed = set()
+        for chunk, page in zip(chunks, pages):
+            if page is None:
+                failed.update(chunk)
+                continue
+            for issue in page.get("issues", []):
+                found[issue["key"].upper()] = issue
+                self.story_cache.store(self._cache_key(issue["key"]), issue, self._issue_updated(issue))
+
+        results = []
+        not_found = []
+        failed_keys = []
+        invalid = []
+        for key in issue_keys:
+            normalized = normalize_issue_key(key)
+            if normalized is None:
+                results.append({"key": key, "found": False, "error": "Invalid issue key"})
+                invalid.append(key)
+            elif normalized in found:
+                results.append({"key": key, "found": True, "story": found[normalized]})
+            elif normalized in failed:
+                results.append({"key": key, "found": False, "error": "Jira search failed"})
+                failed_keys.append(key)
+            else:
+                results.append({"key": key, "found": False, "error": "Issue not found"})
+                not_found.append(key)
+        return {"results": results, "not_found": not_found, "failed": failed_keys, "invalid": invalid}
+
+    def _issue_request(self, issue_key: str, fields: str = STORY_FIELDS) -> Tuple[str, Dict]:
+        # URL and query parameters for a single issue fetch
+        url = f"{self.domain}/rest/api/3/issue/{issue_key}"
+        params = {
+            "fields": fields
+        }
+        return url, params
+
+    def _cache_key(self, issue_key: str) -> str:
+        # Cache entries are scoped to the Jira site
+        return f"{self.domain}|{issue_key}"
+
+    @staticmethod
+    def _issue_updated(issue: Dict) -> Optional[str]:
+        return (issue or {}).get("fields", {}).get("updated")
+
+    @staticmethod
+    def _page_params(params: Dict, start_at: int, page_size: int) -> Dict:
+        # Search parameters for one page of results
+        return {**params, "startAt": start_at, "maxResults": page_size}
+
+    @staticmethod
+    def _next_start_at(page: Optional[Dict], start_at: int) -> Optional[int]:
+        # Offset of the next page, or None when the last page has been reached
+        if not page:
+            return None
+        issues = page.get("issues", [])
+        next_start = start_at + len(issues)
+        total = page.get("total")
+        if not issues or (total is not None and next_start >= total):
+            return None
+        return next_start
+
+    @staticmethod
+    def _story_from_issue(issue: Dict) -> Dict:
+        # Reduce a Jira search result issue to the story fields used by TestGenie
+        return {
+            "key": issue["key"],
+            "summary": issue["fields"]["summary"],
+            "description": issue["fields"]["description"],
+            "status": issue["fields"]["status"]["name"]
+        }
+
+    def _fetch_search_page(self, url: str, params: Dict, start_at: int, page_size: int) -> Optional[Dict]:
+        # Fetch one page of search results, None on error
+        response = self.transport.get(url, headers=self.headers, auth=self.auth, params=self._page_params(params, start_at, page_size))
+        print(f"Search page startAt={start_at} response status: {response.status_code}")
+
+        if response.status_code == 200:
+            return response.json()
+        print(f"Error: {response.status_code} - {response.text}")
+        return None
+
+    def iter_issues(self, jql: str, fields: str, page_size: Optional[int] = None, strict: bool = True) -> Iterator[Dict]:
+        """
+        Lazily walk every page of a JQL search, yielding raw Jira issues.
+        The next page is fetched in the background while the current one is consumed.
+        :param jql: JQL query, e.g. 'project=TG ORDER BY updated ASC'
+        :param fields: Comma-separated issue fields to return
+        :param page_size: Issues requested per page (defaults to settings.JIRA_PAGE_SIZE)
+        :param strict: Raise RuntimeError when a page fails; set to False to stop quietly at the failed page
+        :return: Iterator of issue dictionaries as returned by Jira
+        :raises RuntimeError: When a page fails in strict mode, so callers never get a silently truncated project
+        """
+        page_size = page_size or settings.JIRA_PAGE_SIZE
+        url, params = self._jql_request(jql, fields)
+        print(f"Request URL: {url}")
+        print(f"Request Params: {params}")
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            start_at = 0
+            future = executor.submit(self._fetch_search_page, url, params, start_at, page_size)
+            while future is not None:
+                page = future.result()
+                if page is None and strict:
+                    raise RuntimeError(f"Jira search failed at startAt={start_at}")
+                next_start = self._next_start_at(page, start_at)
+                # Prefetch the next page before handing out the current one
+                future = executor.submit(self._fetch_search_page, url, params, next_start, page_size) if next_start is not None else None
+                yield from (page or {}).get("issues", [])
+                start_at = next_start
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_user_stories(self, project_key: str, issue_type: str, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Lazily walk every page of the project's issues of the specified type.
+        :param project_key: Jira project key, e.g. 'TG'
+        :param issue_type: Issue type, e.g. 'Story'
+        :param page_size: Issues requested per page (defaults to settings.JIRA_PAGE_SIZE)
+        :return: Iterator of dictionaries containing issue key, summary, description, and status
+        """
+        url, params = self._search_request(project_key, issue_type)
+        for issue in self.iter_issues(params["jql"], params["fields"], page_size):
+            yield self._story_from_issue(issue)
+
     def get_all_user_stories(self, project_key: str, issue_type: str) -> List[Dict]:
         """
-        Retrieve all issues of the specified type in the project.
+        Retrieve all issues of the specified type in the project, across all result pages.
         :param project_key: Jira project key, e.g. 'TG'
         :param issue_type: Issue type, e.g. 'Story'
         :return: List of dictionaries containing issue key, summary, description, and status
+        :raises RuntimeError: When a result page fails
         """
         print("get_all_user_stories method called")
-        url = f"{self.domain}/rest/api/3/search"
-        jql = f"project={project_key} AND issuetype={issue_type}"
-        params = {
-            "jql": jql,
-            "fields": "summary,description,status"
-        }
+        return list(self.iter_user_stories(project_key, issue_type))
+
+    def _fetch_keys_chunk(self, chunk: List[str]) -> Optional[Dict]:
+        url, params = self._keys_chunk_request(chunk)
+        return self._fetch_search_page(url, params, 0, len(chunk))
+
+    def get_user_stories_by_keys(self, issue_keys: List[str], concurrency: Optional[int] = None) -> Dict:
+        """
+        Retrieve many issues at once with `key in (...)` searches instead of one request per key.
+        Chunks of up to JIRA_BULK_CHUNK_SIZE keys are searched concurrently.
+        :param issue_keys: Jira issue keys, e.g. ['TG-1', 'TG-2']
+        :param concurrency: Chunks searched in parallel (settings.JIRA_BULK_CONCURRENCY if omitted)
+        :return: Dictionary with per-key results in input order, plus not-found, failed and invalid keys
+        """
+        print(f"get_user_stories_by_keys method called with {len(issue_keys)} keys")
+        chunks = self._bulk_chunks(issue_keys)
+        if not chunks:
+            return self._bulk_result(issue_keys, [], [])
+        with ThreadPoolExecutor(max_workers=min(len(chunks), concurrency or settings.JIRA_BULK_CONCURRENCY)) as executor:
+            pages = list(executor.map(self._fetch_keys_chunk, chunks))
+        return self._bulk_result(issue_keys, chunks, pages)
+
+    def _fetch_issue(self, issue_key: str, fields: str = STORY_FIELDS) -> Dict:
+        # Fetch the given fields of an issue, {} on error
+        url, params = self._issue_request(issue_key, fields)
 
         print(f"Request URL: {url}")
         print(f"Request Params: {params}")
 
-        response = requests.get(url, headers=self.headers, auth=self.auth, params=params)
+        response = self.transport.get(url, headers=self.headers, auth=self.auth, params=params)
         print(f"Response status: {response.status_code}")
         print(f"Response body: {response.text}")
 
         if response.status_code == 200:
-            issues = response.json()["issues"]
-            return [
-                {
-                    "key": issue["key"],
-                    "summary": issue["fields"]["summary"],
-                    "description": issue["fields"]["description"],
-                    "status": issue["fields"]["status"]["name"]
-                }
-                for issue in issues
-            ]
+            return response.json()  # Return the full issue object
         else:
             print(f"Error: {response.status_code} - {response.text}")
-            return []
+            return {}
 
-    def get_user_story_by_key(self, issue_key: str) -> Dict:
+    def get_user_story_by_key(self, issue_key: str, use_cache: bool = True) -> Dict:
         """
         Retrieve issue details by key.
+        Cached issues are reused while fresh, and revalidated by their `updated`
+        timestamp once stale, so unchanged stories skip the full fetch.
         :param issue_key: Jira issue key, e.g. 'TG-1'
+        :param use_cache: Set to False to always fetch the issue from Jira
         :return: Dictionary containing full issue data (as returned by Jira)
         """
         print(f"get_user_story_by_key method called with {issue_key}")
-        url = f"{self.domain}/rest/api/3/issue/{issue_key}"
-        params = {
-            "fields": "summary,description,status"
-        }
+        cache_key = self._cache_key(issue_key)
+        if use_cache:
+            cached, updated, fresh = self.story_cache.lookup(cache_key)
+            if cached is not None:
+                if fresh:
+                    return cached
+                # Cheap revalidation: fetch only the `updated` field
+                if updated and self._issue_updated(self._fetch_issue(issue_key, "updated")) == updated:
+                    self.story_cache.mark_revalidated(cache_key)
+                    return cached
 
-        print(f"Request URL: {url}")
-        print(f"Request Params: {params}")
+        issue = self._fetch_issue(issue_key)
+        if issue:
+            self.story_cache.store(cache_key, issue, self._issue_updated(issue))
+        else:
+            self.story_cache.invalidate(cache_key)
+        return issue
 
-        response = requests.get(url, headers=self.headers, auth=self.auth, params=params)
-        print(f"Response status: {response.status_code}")
-        print(f"Response body: {response.text}")
+
+class AsyncJiraService(JiraService):
+    """
+    Awaitable variant of JiraService using the pooled async HTTP client,
+    so Jira calls do not block the event loop.
+    """
+
+    async def _fetch_search_page(self, url: str, params: Dict, start_at: int, page_size: int) -> Optional[Dict]:
+        # Fetch one page of search results, None on error
+        response = await self.transport.aget(url, headers=self.headers, auth=(self.email, self.api_token), params=self._page_params(params, start_at, page_size))
+        print(f"Async search page startAt={start_at} response status: {response.status_code}")
+
+        if response.status_code == 200:
+            return response.json()
+        print(f"Error: {response.status_code} - {response.text}")
+        return None
+
+    async def iter_issues(self, jql: str, fields: str, page_size: Optional[int] = None, strict: bool = True) -> AsyncIterator[Dict]:
+        """
+        Asynchronously walk every page of a JQL search, prefetching the next page
+        while the current one is consumed.
+        :param strict: Raise RuntimeError when a page fails; set to False to stop quietly at the failed page
+        """
+        page_size = page_size or settings.JIRA_PAGE_SIZE
+        url, params = self._jql_request(jql, fields)
+
+        start_at = 0
+        task = asyncio.ensure_future(self._fetch_search_page(url, params, start_at, page_size))
+        try:
+            while task is not None:
+                page = await task
+                if page is None and strict:
+                    task = None
+                    raise RuntimeError(f"Jira search failed at startAt={start_at}")
+                next_start = self._next_start_at(page, start_at)
+                task = asyncio.ensure_future(self._fetch_search_page(url, params, next_start, page_size)) if next_start is not None else None
+                for issue in (page or {}).get("issues", []):
+                    yield issue
+                start_at = next_start
+        finally:
+            if task is not None:
+                task.cancel()
+
+    async def iter_user_stories(self, project_key: str, issue_type: str, page_size: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Asynchronously walk every page of the project's issues of the specified type.
+        """
+        url, params = self._search_request(project_key, issue_type)
+        async for issue in self.iter_issues(params["jql"], params["fields"], page_size):
+            yield self._story_from_issue(issue)
+
+    async def get_all_user_stories(self, project_key: str, issue_type: str) -> List[Dict]:
+        """
+        Retrieve all issues of the specified type in the project, across all result pages.
+        :param project_key: Jira project key, e.g. 'TG'
+        :param issue_type: Issue type, e.g. 'Story'
+        :return: List of dictionaries containing issue key, summary, description, and status
+        :raises RuntimeError: When a result page fails
+        """
+        return [story async for story in self.iter_user_stories(project_key, issue_type)]
+
+    async def _fetch_keys_chunk(self, chunk: List[str]) -> Optional[Dict]:
+        url, params = self._keys_chunk_request(chunk)
+        return await self._fetch_search_page(url, params, 0, len(chunk))
+
+    async def get_user_stories_by_keys(self, issue_keys: List[str], concurrency: Optional[int] = None) -> Dict:
+        """
+        Retrieve many issues at once with concurrent `key in (...)` searches.
+        :param issue_keys: Jira issue keys, e.g. ['TG-1', 'TG-2']
+        :param concurrency: Chunks searched in parallel (settings.JIRA_BULK_CONCURRENCY if omitted)
+        :return: Dictionary with per-key results in input order, plus not-found, failed and invalid keys
+        """
+        chunks = self._bulk_chunks(issue_keys)
+        semaphore = asyncio.Semaphore(concurrency or settings.JIRA_BULK_CONCURRENCY)
+
+        async def fetch(chunk):
+            async with semaphore:
+                return await self._fetch_keys_chunk(chunk)
+
+        pages = await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+        return self._bulk_result(issue_keys, chunks, list(pages))
+
+    async def _fetch_issue(self, issue_key: str, fields: str = STORY_FIELDS) -> Dict:
+        # Fetch the given fields of an issue, {} on error
+        url, params = self._issue_request(issue_key, fields)
+        response = await self.transport.aget(url, headers=self.headers, auth=(self.email, self.api_token), params=params)
+        print(f"Async Jira issue {issue_key} ({fields}) status: {response.status_code}")
 
         if response.status_code == 200:
             return response.json()  # Return the full issue object
         else:
             print(f"Error: {response.status_code} - {response.text}")
             return {}
+
+    async def get_user_story_by_key(self, issue_key: str, use_cache: bool = True) -> Dict:
+        """
+        Retrieve issue details by key, using the same version-aware cache as JiraService.
+        :param issue_key: Jira issue key, e.g. 'TG-1'
+        :param use_cache: Set to False to always fetch the issue from Jira
+        :return: Dictionary containing full issue data (as returned by Jira)
+        """
+        cache_key = self._cache_key(issue_key)
+        if use_cache:
+            cached, updated, fresh = self.story_cache.lookup(cache_key)
+            if cached is not None:
+                if fresh:
+                    return cached
+                if updated and self._issue_updated(await self._fetch_issue(issue_key, "updated")) == updated:
+                    self.story_cache.mark_revalidated(cache_key)
+                    return cached
+
+        issue = await self._fetch_issue(issue_key)
+        if issue:
+            self.story_cache.store(cache_key, issue, self._issue_updated(issue))
+        else:
+            self.story_cache.invalidate(cache_key)
+        return issue
@@ -0,0 +1,274 @@
+# app/job_queue.py
+
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session, sessionmaker
+from . import crud, jira_mirror, models, schemas
+from .config import settings
+from .database import SessionLocal
+from .pm_service import PMService
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+JOB_TYPES = ("generate", "generate_and_push")
+
+def _utcnow() -> datetime:
+    # Naive UTC timestamps, as stored by SQLite DateTime columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def job_summary(job: models.Job, include_test_cases: bool = False) -> Dict:
+    """
+    JSON-friendly view of a job with its progress.
+    :param include_test_cases: Add the generated test cases and push errors
+    """
+    summary = {
+        "job_id": job.id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "project_key": job.project_key,
+        "issue_key": job.issue_key,
+        "params": json.loads(job.params or "{}"),
+        "progress": {
+            "generated": job.generated or 0,
+            "pushed": job.pushed or 0,
+            "push_unchanged": job.push_unchanged or 0,
+            "push_failed": job.push_failed or 0,
+            "push_position": job.push_position or 0,
+        },
+        "error": job.error,
+        "attempts": job.attempts or 0,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if include_test_cases:
+        summary["test_cases"] = json.loads(job.test_cases) if job.test_cases else []
+        summary["push_errors"] = json.loads(job.push_errors) if job.push_errors else []
+    return summary
+
+class JobQueue:
+    """
+    Durable job queue backed by the `jobs` table and executed by a local thread pool.
+
+    Every step of a job is committed as it happens: the generated test cases are
+    stored before pushing starts, and the push position advances after each batch
+    of test cases, pushed concurrently like the push endpoints do. A job interrupted
+    by a restart is requeued and resumes from its stored state instead of generating
+    again. The batch that was in flight is pushed again; the sync ledger skips the
+    cases AIO already has.
+
+    A claimed job is leased to the queue that runs it, and a heartbeat thread renews
+    the leases while the process is alive. Only jobs whose lease expired are
+    requeued, so several processes can run workers on the same database without
+    taking over each other's running jobs.
+    """
+
+    def __init__(
+        self,
+        pm_service: PMService,
+        session_factory: Optional[sessionmaker] = None,
+        workers: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        lease_seconds: Optional[float] = None,
+        push_batch: Optional[int] = None,
+    ):
+        """
+        :param pm_service: Synchronous PMService used for generation and AIO pushes
+        :param session_factory: Session factory of the jobs table (the app database if omitted)
+        :param workers: Worker threads started by start() (settings.JOB_WORKERS if omitted)
+        :param poll_interval: Seconds an idle worker waits before checking the table again
+        :param lease_seconds: Lease of a running job (settings.JOB_LEASE_SECONDS if omitted)
+        :param push_batch: Test cases pushed concurrently per committed step (settings.JOB_PUSH_BATCH if omitted)
+        """
+        self.pm_service = pm_service
+        self.session_factory = session_factory or SessionLocal
+        self.workers = settings.JOB_WORKERS if workers is None else workers
+        self.poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+        self.lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+        self.push_batch = push_batch or settings.JOB_PUSH_BATCH
+        # Unique per queue instance, so a restarted process does not inherit the old leases
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def enqueue(self, db: Session, request: schemas.JobCreate) -> models.Job:
+        """
+        Store a new job and wake up an idle worker.
+        :raises ValueError: For an unknown job type or a push job without a project key
+        """
+        if request.job_type not in JOB_TYPES:
+            raise ValueError(f"job_type must be one of: {', '.join(JOB_TYPES)}")
+        if request.job_type == "generate_and_push" and not request.project_key:
+            raise ValueError("project_key is required for generate_and_push jobs")
+        params = request.model_dump(include={"model", "temperature", "max_tokens", "source", "use_cache"})
+        job = crud.create_job(db, request.job_type, request.project_key, request.issue_key, json.dumps(params), _utcnow())
+        self._wakeup.set()
+        return job
+
+    def retry(self, db: Session, job: models.Job) -> models.Job:
+        """
+        Requeue a failed job; it resumes from its stored test cases and push position.
+        """
+        job = crud.update_job(db, job, _utcnow(), status="queued", error=None, finished_at=None)
+        self._wakeup.set()
+        return job
+
+    def _lease_expiry(self) -> datetime:
+        return _utcnow() + timedelta(seconds=self.lease_seconds)
+
+    def resume_interrupted(self) -> int:
+        """
+        Requeue running jobs whose lease expired, e.g. after their process crashed or was stopped.
+        :return: Number of requeued jobs
+        """
+        db = self.session_factory()
+        try:
+            requeued = crud.requeue_expired_jobs(db, _utcnow())
+        finally:
+            db.close()
+        if requeued:
+            logging.info(f"Job queue: requeued {requeued} interrupted jobs")
+        return requeued
+
+    def renew_leases(self) -> int:
+        """
+        Extend the leases of the jobs this queue is running.
+        :return: Number of renewed jobs
+        """
+        db = self.session_factory()
+        try:
+            return crud.renew_job_leases(db, self.owner, self._lease_expiry())
+        finally:
+            db.close()
+
+    def start(self):
+        """
+        Requeue jobs whose lease expired and start the worker and heartbeat threads.
+        """
+        if self._threads or self.workers <= 0:
+            return
+        self.resume_interrupted()
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-lease-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        logging.info(f"Job queue: started {self.workers} workers as {self.owner}")
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop the workers. A job still running is requeued once its lease expires, right away
+        on the next start when every worker finished.
+        """
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        if self._threads and not any(thread.is_alive() for thread in self._threads):
+            self._release_leases()
+        self._threads = []
+
+    def _release_leases(self):
+        # Expire the leases of jobs interrupted by stop(), as no thread of this queue works on them anymore
+        db = self.session_factory()
+        try:
+            crud.renew_job_leases(db, self.owner, _utcnow())
+        finally:
+            db.close()
+
+    def _heartbeat(self):
+        # Renew our leases well before they expire and pick up jobs of processes that died
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self.renew_leases()
+                if self.resume_interrupted():
+                    self._wakeup.set()
+            except Exception as e:
+                logging.error(f"Job queue: heartbeat error: {e}")
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_next():
+                    continue
+            except Exception as e:
+                logging.error(f"Job queue: worker error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def run_next(self) -> bool:
+        """
+        Claim and execute the oldest queued job in the calling thread.
+        :return: False when there was nothing to do
+        """
+        db = self.session_factory()
+        try:
+            job = crud.claim_next_job(db, _utcnow(), self.owner, self._lease_expiry())
+            if job is None:
+                return False
+            logging.info(f"Job {job.id}: running {job.job_type} for {job.issue_key} (attempt {job.attempts})")
+            try:
+                self._execute(db, job)
+            except Exception as e:
+                logging.error(f"Job {job.id}: failed: {e}")
+                db.rollback()
+                crud.update_job(db, job, _utcnow(), status="failed", error=str(e), finished_at=_utcnow())
+            return True
+        finally:
+            db.close()
+
+    def _execute(self, db: Session, job: models.Job):
+        params = json.loads(job.params or "{}")
+
+        # Generation, skipped when a previous attempt already stored the test cases
+        if job.test_cases is None:
+            story = jira_mirror.get_mirrored_story(db, job.issue_key) if params.get("source") == "mirror" else None
+            test_cases = self.pm_service.ai_service.generate_and_normalize_test_cases(
+                job.issue_key,
+                params.get("model", "meta-llama/llama-3-8b-instruct"),
+                params.get("temperature", 0.7),
+                params.get("max_tokens", 666),
+                story,
+                params.get("use_cache", True)
+            )
+            if not test_cases:
+                crud.update_job(db, job, _utcnow(), status="failed", error="No valid test cases could be generated", finished_at=_utcnow())
+                return
+            job = crud.update_job(db, job, _utcnow(), test_cases=json.dumps(test_cases), generated=len(test_cases))
+        test_cases = json.loads(job.test_cases)
+
+        # AIO push, one committed step per batch of concurrently pushed test cases
+        if job.job_type == "generate_and_push":
+            errors = json.loads(job.push_errors or "[]")
+            for start in range(job.push_position or 0, len(test_cases), self.push_batch):
+                if self._stop.is_set():
+                    # Leave the job running; it is requeued and resumed on the next start
+                    return
+                batch = test_cases[start:start + self.push_batch]
+                push = self.pm_service.push_test_cases(job.project_key, batch, self.push_batch)
+                errors.extend(
+                    {"index": start + outcome["index"], "title": outcome["title"], "error": outcome["error"]}
+                    for outcome in push["results"] if outcome["status"] == "failed"
+                )
+                job = crud.update_job(
+                    db, job, _utcnow(),
+                    push_position=start + len(batch),
+                    pushed=(job.pushed or 0) + push["created"] + push["updated"],
+                    push_unchanged=(job.push_unchanged or 0) + push["unchanged"],
+                    push_failed=(job.push_failed or 0) + push["failed"],
+                    push_errors=json.dumps(errors)
+                )
+
+        crud.update_job(db, job, _utcnow(), status="succeeded", finished_at=_utcnow())
+        logging.info(f"Job {job.id}: succeeded with {job.generated} generated, {job.pushed} pushed and {job.push_unchanged or 0} unchanged test cases")
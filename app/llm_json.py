@@ -0,0 +1,276 @@
+# app/llm_json.py
+
+import json
+import logging
+import re
+from typing import Any, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+
+# Characters that matter while scanning: structure outside strings, terminators inside strings
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_ARRAY_ITEM = re.compile(r'[{\]]')
+_TRAILING_COMMA_CANDIDATE = re.compile(r'["\\,]')
+_ARRAY_START = re.compile(r'\[\s*\{')
+_SEPARATOR = re.compile(r'[\s,]*')
+
+_decoder = json.JSONDecoder()
+
+# Parser states
+_SEEK = 0      # Looking for the opening bracket of the array
+_OPENED = 1    # Saw '[', waiting for the first object
+_ARRAY = 2     # Inside the array
+_DONE = 3      # Array closed
+
+def strip_trailing_commas(text: str) -> str:
+    """
+    Remove commas directly followed (after whitespace) by } or ], leaving string contents untouched.
+    Single linear pass.
+    """
+    out = []
+    n = len(text)
+    i = 0
+    last = 0
+    in_string = False
+    while i < n:
+        if in_string:
+            match = _STRING_SPECIAL.search(text, i)
+            if match is None:
+                break
+            i = match.start()
+            if text[i] == "\\":
+                i += 2
+            else:
+                in_string = False
+                i += 1
+            continue
+        match = _TRAILING_COMMA_CANDIDATE.search(text, i)
+        if match is None:
+            break
+        i = match.start()
+        if text[i] == '"':
+            in_string = True
+            i += 1
+            continue
+        j = i + 1
+        while j < n and text[j] in " \t\r\n":
+            j += 1
+        if j < n and text[j] in "}]":
+            out.append(text[last:i])
+            last = i + 1
+        i = j
+    out.append(text[last:])
+    return "".join(out)
+
+def _object_end(text: str, start: int) -> int:
+    # Index just past the brace closing the object that opens at start, or -1 if it never closes
+    n = len(text)
+    depth = 0
+    i = start
+    while i < n:
+        match = _STRUCTURE.search(text, i)
+        if match is None:
+            return -1
+        i = match.start()
+        ch = text[i]
+        i += 1
+        if ch == '"':
+            while True:
+                special = _STRING_SPECIAL.search(text, i)
+                if special is None:
+                    return -1
+                i = special.start() + 1
+                if text[i - 1] == '"':
+                    break
+                i += 1
+        elif ch in "{[":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+class JSONArrayStreamParser:
+    """
+    Incrementally extracts the objects of the first top-level JSON array of objects
+    in LLM output. Text can be fed in arbitrary chunks (e.g. streamed tokens); each
+    object is returned as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self._state = _SEEK
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._parts: List[str] = []
+        self.objects = 0
+        self.errors = 0
+
+    @property
+    def started(self) -> bool:
+        return self._state >= _ARRAY
+
+    @property
+    def complete(self) -> bool:
+        # True once the closing bracket of the array was seen
+        return self._state == _DONE
+
+    @property
+    def truncated(self) -> bool:
+        # True when the array was opened but never closed
+        return self._state == _ARRAY
+
+    def _parse_object(self, text: str) -> Optional[Any]:
+        try:
+            return json.loads(text)
+        except ValueError:
+            pass
+        # Retry without trailing commas before } or ]
+        try:
+            return json.loads(strip_trailing_commas(text))
+        except ValueError as e:
+            self.errors += 1
+            logging.error(f"JSON parse error in streamed object: {e}")
+            return None
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Consume the next chunk of text.
+        :param text: Next piece of LLM output
+        :return: Objects completed within this chunk, in order
+        """
+        results = []
+        n = len(text)
+        i = 0
+        obj_start = 0 if self._depth > 0 else None
+
+        while i < n and self._state != _DONE:
+            if self._state == _SEEK:
+                j = text.find("[", i)
+                if j < 0:
+                    break
+                self._state = _OPENED
+                i = j + 1
+                continue
+
+            if self._state == _OPENED:
+                ch = text[i]
+                if ch.isspace():
+                    i += 1
+                elif ch == "{":
+                    self._state = _ARRAY
+                else:
+                    # Not an array of objects (e.g. "[Note]" in prose), keep looking from here
+                    self._state = _SEEK
+                continue
+
+            if self._depth == 0:
+                # Between objects: skip commas and whitespace up to the next object or the closing bracket
+                match = _ARRAY_ITEM.search(text, i)
+                if match is None:
+                    break
+                i = match.start()
+                if text[i] == "]":
+                    self._state = _DONE
+                    break
+                self._depth = 1
+                obj_start = i
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    # Escaped character carried over from the previous chunk
+                    self._escape = False
+                    i += 1
+                    continue
+                match = _STRING_SPECIAL.search(text, i)
+                if match is None:
+                    break
+                i = match.start()
+                if text[i] == "\\":
+                    if i + 1 >= n:
+                        self._escape = True
+                    i += 2
+                else:
+                    self._in_string = False
+                    i += 1
+                continue
+
+            match = _STRUCTURE.search(text, i)
+            if match is None:
+                break
+            i = match.start()
+            ch = text[i]
+            i += 1
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(text[obj_start:i])
+                    parsed = self._parse_object("".join(self._parts))
+                    self._parts = []
+                    obj_start = None
+                    if parsed is not None:
+                        self.objects += 1
+                        results.append(parsed)
+
+        if self._depth > 0 and obj_start is not None:
+            self._parts.append(text[obj_start:])
+        return results
+
+def extract_json_array(text: str) -> Tuple[List[Any], bool]:
+    """
+    Extract the objects of the first top-level JSON array of objects in LLM output.
+    Runs in linear time, tolerates prose around the array and trailing commas,
+    and salvages every complete object when the array is cut off (e.g. by max_tokens).
+    :param text: Raw LLM message content
+    :return: Tuple of (parsed objects, whether the array was closed)
+    """
+    match = _ARRAY_START.search(text)
+    if match is None:
+        return [], False
+    # Decode object by object with the C decoder
+    objects = []
+    text = text[match.start():]
+    n = len(text)
+    i = 1
+    repaired = False
+    while True:
+        i = _SEPARATOR.match(text, i).end()
+        if i >= n:
+            return objects, False
+        if text[i] == "]":
+            return objects, True
+        if text[i] != "{":
+            # Stray value inside the array, skip to the next object or the closing bracket
+            item = _ARRAY_ITEM.search(text, i)
+            if item is None:
+                return objects, False
+            i = item.start()
+            continue
+        try:
+            obj, i = _decoder.raw_decode(text, i)
+            objects.append(obj)
+            continue
+        except ValueError:
+            pass
+        if not repaired:
+            # Strip trailing commas from the rest of the output once, then retry this object
+            text = strip_trailing_commas(text[i:])
+            n = len(text)
+            i = 0
+            repaired = True
+            continue
+        end = _object_end(text, i)
+        if end < 0:
+            # Truncated object at the end of the output
+            return objects, False
+        logging.error(f"Skipping malformed JSON object in array: {text[i:i + 100]}...")
+        i = end
@@ -1,25 +1,53 @@
 # app/main.py
 
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from fastapi import FastAPI, Depends, HTTPException, Path, Query, Body
-from typing import List, Dict
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
 from app import models, schemas, crud
 from app.database import engine, get_db
-from app.jira_service import JiraService
-from app.ai_service import AIService
-from app.pm_service import PMService
+from app.jira_service import JiraService, AsyncJiraService
+from app.ai_service import AIService, AsyncAIService
+from app.pm_service import PMService, AsyncPMService
+from app.http_transport import HTTPTransport
+from app.story_cache import story_cache
+from app import jira_mirror
+from app import batch_generation
+from app.job_queue import JobQueue, job_summary
+from app.aio_outbox import OutboxDrainer, outbox_summary
+from app.generation_cache import generation_cache
+from app.generation_stats import generation_stats
 from app.config import settings
-from app.schemas import JiraTestCaseCreate
+from app.schemas import JiraTestCaseCreate, JiraTestCycleCreate, JiraTestSetCreate
+import json
 import logging
 
 
 # Create all database tables
 models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+# Shared pooled HTTP transport, reused by every service for the lifetime of the app
+http_transport = HTTPTransport()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resume interrupted jobs and start the background workers
+    job_queue.start()
+    # Retry failed AIO pushes stored in the outbox
+    if pm_service.outbox is not None and settings.AIO_OUTBOX_DRAIN:
+        outbox_drainer.start()
+    yield
+    outbox_drainer.stop()
+    job_queue.stop()
+    # Close pooled keep-alive connections on shutdown
+    await http_transport.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Initialize JiraService instance with configuration from config.py
-jira_service = JiraService(settings.JIRA_DOMAIN, settings.JIRA_EMAIL, settings.JIRA_API_TOKEN)
+jira_service = JiraService(settings.JIRA_DOMAIN, settings.JIRA_EMAIL, settings.JIRA_API_TOKEN, transport=http_transport)
 
 # Initialize the AIService
 ai_service = AIService(
@@ -27,7 +55,8 @@ ai_service = AIService(
     jira_email=settings.JIRA_EMAIL,
     jira_api_token=settings.JIRA_API_TOKEN,
     openrouter_url=settings.OPENROUTER_URL,
-    openrouter_api_key=settings.OPENROUTER_API_KEY
+    openrouter_api_key=settings.OPENROUTER_API_KEY,
+    transport=http_transport
 )
 # Initialize the PMService
 pm_service = PMService(
@@ -37,9 +66,37 @@ pm_service = PMService(
     openrouter_url=settings.OPENROUTER_URL,
     openrouter_api_key=settings.OPENROUTER_API_KEY,
     aio_api_url=settings.AIO_API_URL,           # <-- add this
-    aio_api_token=settings.AIO_API_TOKEN        # <-- add this
+    aio_api_token=settings.AIO_API_TOKEN,       # <-- add this
+    transport=http_transport
+)
+
+# Async variants used by the streaming and generation endpoints so they never block the event loop
+async_jira_service = AsyncJiraService(settings.JIRA_DOMAIN, settings.JIRA_EMAIL, settings.JIRA_API_TOKEN, transport=http_transport)
+async_ai_service = AsyncAIService(
+    jira_domain=settings.JIRA_DOMAIN,
+    jira_email=settings.JIRA_EMAIL,
+    jira_api_token=settings.JIRA_API_TOKEN,
+    openrouter_url=settings.OPENROUTER_URL,
+    openrouter_api_key=settings.OPENROUTER_API_KEY,
+    transport=http_transport
+)
+async_pm_service = AsyncPMService(
+    jira_domain=settings.JIRA_DOMAIN,
+    jira_email=settings.JIRA_EMAIL,
+    jira_api_token=settings.JIRA_API_TOKEN,
+    openrouter_url=settings.OPENROUTER_URL,
+    openrouter_api_key=settings.OPENROUTER_API_KEY,
+    aio_api_url=settings.AIO_API_URL,
+    aio_api_token=settings.AIO_API_TOKEN,
+    transport=http_transport
 )
 
+# Durable background jobs, executed by worker threads with the synchronous services
+job_queue = JobQueue(pm_service)
+
+# Background retries of AIO pushes that failed on connection errors, throttling or 5xx answers
+outbox_drainer = OutboxDrainer(pm_service)
+
 # Create a new test case
 @app.post("/cases/", response_model=schemas.CaseRead)
 def create_case(case: schemas.CaseCreate, db: Session = Depends(get_db)):
@@ -74,22 +131,73 @@ def delete_case(case_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Case not found")
     return db_case
 
+# Pool statistics of the shared HTTP transport, for tuning pool sizes
+@app.get("/transport/stats")
+def get_transport_stats() -> Dict:
+    return http_transport.stats()
+
 ### JIRA INTEGRATION ENDPOINTS ###
 
 # Jira stories endpoint
 @app.get("/jira/stories/")
 def get_jira_stories(
     project_key: str = Query(..., description="Jira project key, e.g. 'TG'"),
-    issue_type: str = Query(..., description="Jira issue type, e.g. 'Story'")
+    issue_type: str = Query(..., description="Jira issue type, e.g. 'Story'"),
+    stream: bool = Query(False, description="Stream stories as NDJSON while Jira result pages are fetched"),
+    source: schemas.StorySource = Query("jira", description="Read stories live from 'jira' or from the local 'mirror'"),
+    db: Session = Depends(get_db)
 ) -> List[Dict]:
     # Fetch all user stories from Jira for the specified project and issue type
     print("Endpoint /jira/stories/ called")
+    if source == "mirror":
+        if crud.get_jira_sync_state(db, project_key) is None:
+            raise HTTPException(status_code=409, detail=f"Project {project_key} has not been synced to the mirror, run POST /jira/project/{project_key}/sync first")
+        rows = crud.get_jira_stories(db, project_key, issue_type)
+        return [jira_mirror.listed_story_from_mirror(row) for row in rows]
+    if stream:
+        return StreamingResponse(stream_jira_stories(project_key, issue_type), media_type="application/x-ndjson")
     try:
         stories = jira_service.get_all_user_stories(project_key, issue_type)
         return stories
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch stories: {str(e)}")
 
+async def stream_jira_stories(project_key: str, issue_type: str):
+    # Emit one JSON line per story; errors after the response started are sent as a final line
+    try:
+        async for story in async_jira_service.iter_user_stories(project_key, issue_type):
+            yield json.dumps(story) + "\n"
+    except Exception as e:
+        logging.error(f"Failed to stream stories: {e}")
+        yield json.dumps({"error": f"Failed to fetch stories: {str(e)}"}) + "\n"
+
+# Hit/miss counters of the Jira story cache
+@app.get("/jira/cache/stats")
+def get_jira_cache_stats() -> Dict:
+    return story_cache.stats()
+
+# Incremental sync of a Jira project into the local mirror
+@app.post("/jira/project/{project_key}/sync")
+def sync_jira_project(
+    project_key: str = Path(..., description="Jira project key, e.g. 'TG'"),
+    full: bool = Query(False, description="Pull every issue instead of only those updated since the last sync"),
+    db: Session = Depends(get_db)
+) -> Dict:
+    try:
+        return jira_mirror.sync_project(db, jira_service, project_key, full=full)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to sync project: {str(e)}")
+
+# Bulk Jira stories endpoint by issue keys
+@app.post("/jira/stories/bulk")
+async def get_jira_stories_bulk(request: schemas.JiraBulkStoriesRequest) -> Dict:
+    # Fetch many stories with chunked `key in (...)` searches, results keep the input order
+    print(f"Endpoint /jira/stories/bulk called with {len(request.issue_keys)} keys")
+    try:
+        return await async_jira_service.get_user_stories_by_keys(request.issue_keys)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch stories: {str(e)}")
+
 # Jira single story endpoint by issue key
 @app.get("/jira/story/{issue_key}")
 def get_jira_story_by_key(
@@ -103,26 +211,149 @@ def get_jira_story_by_key(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch story: {str(e)}")
 
+# Hit-rate metrics of the LLM generation cache
+@app.get("/ai/cache/stats")
+def get_generation_cache_stats() -> Dict:
+    return generation_cache.stats()
+
+# Requests served by joining an identical generation already in flight
+@app.get("/ai/coalescing/stats")
+def get_coalescing_stats() -> Dict:
+    return async_ai_service.coalescing_stats()
+
+# Parse-failure rate of generated output per model and mode (structured or prompt)
+@app.get("/ai/parse/stats")
+def get_parse_stats() -> List[Dict]:
+    return async_ai_service.parse_stats()
+
+# Estimated prompt tokens per story before and after moving the instructions into a cacheable prefix
+@app.post("/ai/prompt/token-report")
+async def get_prompt_token_report(
+    request: schemas.JiraBulkStoriesRequest,
+    source: schemas.StorySource = Query("jira", description="Read the stories live from 'jira' or from the local 'mirror'"),
+    db: Session = Depends(get_db)
+) -> Dict:
+    stories = {key: load_story_source(db, key, source) for key in request.issue_keys}
+    missing = [key for key, story in stories.items() if story is None]
+    not_found = []
+    if missing:
+        try:
+            bulk = await async_jira_service.get_user_stories_by_keys(missing)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to fetch stories: {str(e)}")
+        for entry in bulk["results"]:
+            if entry["found"]:
+                stories[entry["key"]] = async_ai_service.story_from_jira_issue(entry["story"])
+            else:
+                not_found.append(entry["key"])
+    reports = [async_ai_service.prompt_token_report(story) for story in stories.values() if story is not None]
+    before = sum(report["before_tokens"] for report in reports)
+    uncached = sum(report["story_tokens"] for report in reports)
+    return {
+        "static_prefix_enabled": settings.PROMPT_STATIC_PREFIX,
+        "total_before_tokens": before,
+        "total_after_tokens": sum(report["after_tokens"] for report in reports),
+        "total_after_uncached_tokens": uncached,
+        "saved_percent_uncached": round(100 * (before - uncached) / before, 1) if before else 0.0,
+        "stories": reports,
+        "not_found": not_found,
+    }
+
+# Recorded generations per model, the history behind model="auto"
+@app.get("/ai/generation/stats")
+def get_generation_stats() -> List[Dict]:
+    return generation_stats.summary()
+
+# Model and max_tokens model="auto" would choose for a story description of the given length
+@app.get("/ai/auto/select")
+def get_auto_selection(
+    description_chars: int = Query(..., ge=0, description="Length of the flattened story description"),
+    max_tokens: int = Query(666, description="max_tokens used while there is not enough history")
+) -> Dict:
+    return generation_stats.select(description_chars, default_max_tokens=max_tokens)
+
+def load_story_source(db: Session, issue_key: str, source: schemas.StorySource):
+    # Mirrored story when requested and available, otherwise None so the service fetches it from Jira
+    if source != "mirror":
+        return None
+    story = jira_mirror.get_mirrored_story(db, issue_key)
+    if story is None:
+        logging.info(f"Story {issue_key} is not in the mirror, falling back to Jira")
+    return story
+
+# Media types of the streaming generation formats
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+async def format_stream_events(events, stream_format: str):
+    # Serialize generation events as NDJSON lines or server-sent events
+    try:
+        async for event in events:
+            if stream_format == "sse":
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps(event) + "\n"
+    except Exception as e:
+        logging.error(f"Unexpected error while streaming test cases: {e}")
+        error = {"event": "error", "error": f"Internal server error: {str(e)}"}
+        yield f"event: error\ndata: {json.dumps(error)}\n\n" if stream_format == "sse" else json.dumps(error) + "\n"
+
 # Endpoint to generate test cases with AI for a Jira story
 @app.post("/jira/story/{issue_key}/generate-test-cases")
 async def generate_test_cases(
     issue_key: str = Path(..., description="Jira issue key, e.g., TG-1"),
-    model: str = Query("meta-llama/llama-3-8b-instruct", description="OpenRouter model to use. Available options: " + ", ".join(settings.AVAILABLE_MODELS)),
+    model: str = Query("meta-llama/llama-3-8b-instruct", description="OpenRouter model to use, or 'auto' to choose model and max_tokens from recorded generations. Available options: " + ", ".join(settings.AVAILABLE_MODELS)),
     temperature: float = Query(0.7, description="Temperature setting for OpenRouter"),
     max_tokens: int = Query(666, description="Maximum token limit for OpenRouter"),
+    source: schemas.StorySource = Query("jira", description="Read the story live from 'jira' or from the local 'mirror'"),
+    use_cache: bool = Query(True, description="Reuse a cached generation for an identical prompt; set to false to force a new LLM call"),
+    stream: Optional[str] = Query(None, description="Emit each test case as soon as it is generated: 'ndjson' or 'sse'"),
+    chunked: bool = Query(False, description="Generate long stories section by section in parallel and merge the results"),
+    race: bool = Query(False, description="Send the prompt to every model in AVAILABLE_MODELS and keep the first usable answer"),
+    race_stagger: Optional[float] = Query(None, description="Seconds before the next raced model is started (0 starts all at once)"),
+    structured: bool = Query(False, description="Request JSON-schema structured output and validate it instead of repairing free text"),
     db: Session = Depends(get_db)
 ):
     """
     Generate structured test cases for a Jira story using OpenRouter AI.
     """
-    try:
-        # Use the new method from AIService that handles normalization
-        test_cases = ai_service.generate_and_normalize_test_cases(
+    if stream is not None:
+        if stream not in STREAM_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail="stream must be 'ndjson' or 'sse'")
+        events = async_ai_service.stream_test_cases(
             issue_key=issue_key,
             model=model,
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            story=load_story_source(db, issue_key, source),
+            use_cache=use_cache
         )
+        return StreamingResponse(format_stream_events(events, stream), media_type=STREAM_MEDIA_TYPES[stream])
+
+    if race:
+        return await race_test_cases(db, issue_key, temperature, max_tokens, source, use_cache, race_stagger)
+
+    try:
+        # Use the new method from AIService that handles normalization
+        story = load_story_source(db, issue_key, source)
+        if chunked:
+            test_cases = await async_ai_service.generate_chunked_test_cases(
+                issue_key=issue_key,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                story=story,
+                use_cache=use_cache
+            )
+        else:
+            test_cases = await async_ai_service.generate_and_normalize_test_cases(
+                issue_key=issue_key,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                story=story,
+                use_cache=use_cache,
+                structured=structured
+            )
 
         if not test_cases:
             raise HTTPException(status_code=500, detail="No valid test cases could be generated")
@@ -141,44 +372,274 @@ async def generate_test_cases(
         logging.error(f"Unexpected error in generate_test_cases: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+async def race_test_cases(db: Session, issue_key: str, temperature: float, max_tokens: int, source: schemas.StorySource, use_cache: bool, stagger: Optional[float]) -> Dict:
+    # Hedged generation across AVAILABLE_MODELS; the outcome is recorded for tuning
+    stagger = settings.GENERATION_RACE_STAGGER if stagger is None else stagger
+    result = await async_ai_service.race_models(
+        issue_key,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        story=load_story_source(db, issue_key, source),
+        stagger=stagger,
+        use_cache=use_cache
+    )
+    if result["race"]:
+        crud.create_model_race_result(
+            db,
+            issue_key,
+            result.get("model"),
+            result.get("latency_ms"),
+            stagger,
+            settings.AVAILABLE_MODELS,
+            result["race"],
+            datetime.now(timezone.utc).replace(tzinfo=None)
+        )
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return {
+        "message": f"Successfully generated and saved {len(result['test_cases'])} test cases",
+        "total_generated": len(result["test_cases"]),
+        "model": result["model"],
+        "latency_ms": result["latency_ms"],
+        "race": result["race"],
+        "test_cases": result["test_cases"]
+    }
+
+# Wins and average winning latency per model of hedged generations
+@app.get("/ai/race/stats")
+def get_race_stats(db: Session = Depends(get_db)) -> List[Dict]:
+    return [
+        {"model": model, "wins": wins, "avg_latency_ms": round(avg_latency or 0.0, 1)}
+        for model, wins, avg_latency in crud.get_model_race_stats(db)
+    ]
+
+# Batch generation endpoint for many stories of a project
+@app.post("/jira/project/{project_key}/generate-test-cases/batch")
+async def generate_test_cases_batch(
+    request: schemas.BatchGenerationRequest,
+    project_key: str = Path(..., description="Jira project key, e.g. 'TG'")
+) -> Dict:
+    """
+    Generate test cases for the project's stories selected by issue keys or a JQL filter.
+    Per-story failures are reported in the results instead of failing the whole batch.
+    """
+    print(f"Endpoint /jira/project/{project_key}/generate-test-cases/batch called")
+    try:
+        return await batch_generation.generate_batch(
+            async_ai_service,
+            project_key,
+            jql=request.jql,
+            issue_keys=request.issue_keys,
+            model=request.model,
+            temperature=request.temperature,
+            max_tokens=request.max_tokens,
+            use_cache=request.use_cache,
+            jira_concurrency=request.jira_concurrency,
+            openrouter_concurrency=request.openrouter_concurrency,
+            pack=request.pack
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch generation failed: {str(e)}")
+
 # Endpoint to create in Jira generated test cases with AI for a Jira story    
 @app.post("/jira/project/{project_key}/story/{issue_key}/create-generated-test-cases")
 async def create_generate_test_cases(
     project_key: str = Path(..., description="Jira project key, e.g. 'TG'"),   
     issue_key: str = Path(..., description="Jira issue key, e.g., TG-1"),
-    model: str = Query("meta-llama/llama-3-8b-instruct", description="OpenRouter model to use. Available options: " + ", ".join(settings.AVAILABLE_MODELS)),
+    model: str = Query("meta-llama/llama-3-8b-instruct", description="OpenRouter model to use, or 'auto' to choose model and max_tokens from recorded generations. Available options: " + ", ".join(settings.AVAILABLE_MODELS)),
     temperature: float = Query(0.7, description="Temperature setting for OpenRouter"),
     max_tokens: int = Query(666, description="Maximum token limit for OpenRouter"),
+    source: schemas.StorySource = Query("jira", description="Read the story live from 'jira' or from the local 'mirror'"),
+    use_cache: bool = Query(True, description="Reuse a cached generation for an identical prompt; set to false to force a new LLM call"),
+    push_concurrency: Optional[int] = Query(None, ge=1, description="Parallel AIO requests (AIO_PUSH_CONCURRENCY if omitted)"),
+    pipelined: bool = Query(False, description="Stream the LLM output and push each test case to AIO as soon as it is parsed"),
     db: Session = Depends(get_db)
 ):
     """
-    Generate structured test cases for a Jira story using OpenRouter AI.
+    Generate structured test cases for a Jira story using OpenRouter AI and create them in AIO.
+    The response lists the outcome of every AIO create (key, status, latency, error).
+    With pipelined=true, AIO pushes overlap generation and the response adds the generation summary.
     """
     try:
         # Use the new method from AIService that handles normalization
-        test_cases = pm_service.add_generated_test_cases_to_jira(
+        generate_and_push = async_pm_service.pipeline_generated_test_cases if pipelined else async_pm_service.add_generated_test_cases_to_jira
+        result = await generate_and_push(
             project_key, 
             issue_key, 
             model,
             temperature,
-            max_tokens
+            max_tokens,
+            load_story_source(db, issue_key, source),
+            use_cache,
+            push_concurrency
             )
+        test_cases = result["test_cases"]
 
         if not test_cases:
-            raise HTTPException(status_code=500, detail="No valid test cases could be generated")
-
-       
+            raise HTTPException(status_code=500, detail=(result.get("generation") or {}).get("error") or "No valid test cases could be generated")
 
         # Return the results
-        return {
-            "message": f"Successfully generated and saved {len(test_cases)} test cases",
+        response = {
+            "message": f"Successfully generated {len(test_cases)} test cases, created {result['push']['created']} in AIO",
             "total_generated": len(test_cases),
-            "test_cases": test_cases
+            "test_cases": test_cases,
+            "push": result["push"]
         }
+        if pipelined:
+            response["generation"] = result["generation"]
+        return response
 
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
         logging.error(f"Unexpected error in generate_test_cases: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+# AIO test sets and test cycles, with their members added in parallel batches
+@app.post("/aio/project/{project_key}/testset")
+async def create_aio_test_set(
+    test_set: JiraTestSetCreate,
+    project_key: str = Path(..., description="AIO / Jira project key, e.g. 'TG'"),
+    concurrency: Optional[int] = Query(None, ge=1, description="Parallel AIO requests (AIO_PUSH_CONCURRENCY if omitted)")
+) -> Dict:
+    result = await async_pm_service.create_aio_test_set(project_key, test_set, concurrency)
+    if result["status"] != "created":
+        raise HTTPException(status_code=502, detail=f"AIO test set was not created: {result['error']}")
+    return result
+
+@app.post("/aio/project/{project_key}/testcycle")
+async def create_aio_test_cycle(
+    test_cycle: JiraTestCycleCreate,
+    project_key: str = Path(..., description="AIO / Jira project key, e.g. 'TG'"),
+    concurrency: Optional[int] = Query(None, ge=1, description="Parallel AIO requests (AIO_PUSH_CONCURRENCY if omitted)")
+) -> Dict:
+    result = await async_pm_service.create_aio_test_cycle(project_key, test_cycle, concurrency)
+    if result["status"] != "created":
+        raise HTTPException(status_code=502, detail=f"AIO test cycle was not created: {result['error']}")
+    return result
+
+@app.post("/jira/project/{project_key}/story/{issue_key}/create-test-set-and-cycle")
+async def create_story_test_set_and_cycle(
+    project_key: str = Path(..., description="Jira project key, e.g. 'TG'"),
+    issue_key: str = Path(..., description="Jira issue key, e.g., TG-1"),
+    model: str = Query("meta-llama/llama-3-8b-instruct", description="OpenRouter model to use, or 'auto' to choose model and max_tokens from recorded generations"),
+    temperature: float = Query(0.7, description="Temperature setting for OpenRouter"),
+    max_tokens: int = Query(666, description="Maximum token limit for OpenRouter"),
+    source: schemas.StorySource = Query("jira", description="Read the story live from 'jira' or from the local 'mirror'"),
+    use_cache: bool = Query(True, description="Reuse a cached generation for an identical prompt; set to false to force a new LLM call"),
+    push_concurrency: Optional[int] = Query(None, ge=1, description="Parallel AIO requests (AIO_PUSH_CONCURRENCY if omitted)"),
+    pipelined: bool = Query(False, description="Stream the LLM output and push each test case to AIO as soon as it is parsed"),
+    db: Session = Depends(get_db)
+) -> Dict:
+    """
+    Generate a story's test cases, push them to AIO and group them in a new test set inside a new test cycle.
+    """
+    result = await async_pm_service.create_story_test_set_and_cycle(
+        project_key,
+        issue_key,
+        model,
+        temperature,
+        max_tokens,
+        load_story_source(db, issue_key, source),
+        use_cache,
+        push_concurrency,
+        pipelined
+    )
+    if not result["test_cases"]:
+        raise HTTPException(status_code=500, detail="No valid test cases could be generated")
+    # Nothing could be grouped: report the AIO error as the standalone set and cycle endpoints do
+    if result["test_set"] is None:
+        errors = [outcome.get("error") for outcome in result["push"]["results"] if outcome["status"] == "failed"]
+        raise HTTPException(status_code=502, detail=f"No test case could be pushed to AIO: {errors[0] if errors else 'no keys returned'}")
+    if result["test_set"]["status"] != "created":
+        raise HTTPException(status_code=502, detail=f"AIO test set was not created: {result['test_set']['error']}")
+    if result["test_cycle"]["status"] != "created":
+        raise HTTPException(status_code=502, detail=f"AIO test cycle was not created: {result['test_cycle']['error']}")
+    return {
+        "message": f"Generated {len(result['test_cases'])} test cases, test set {result['test_set']['key']}, test cycle {result['test_cycle']['key']}",
+        "total_generated": len(result["test_cases"]),
+        "push": result["push"],
+        "test_set": result["test_set"],
+        "test_cycle": result["test_cycle"],
+    }
+
+# Background jobs: enqueue generation (and AIO push) and poll for progress
+@app.post("/jobs", status_code=202)
+def create_job(request: schemas.JobCreate, db: Session = Depends(get_db)) -> Dict:
+    """
+    Queue a generation or generate-and-push job and return its id immediately.
+    """
+    try:
+        job = job_queue.enqueue(db, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job_summary(job)
+
+@app.get("/jobs")
+def list_jobs(
+    status: Optional[str] = Query(None, description="Only jobs with this status: queued, running, succeeded or failed"),
+    limit: int = Query(50, description="Maximum number of jobs returned, most recent first"),
+    db: Session = Depends(get_db)
+) -> List[Dict]:
+    return [job_summary(job) for job in crud.get_jobs(db, status, limit)]
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db)) -> Dict:
+    # Status, progress and results of a job
+    job = crud.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_summary(job, include_test_cases=True)
+
+@app.post("/jobs/{job_id}/retry")
+def retry_job(job_id: int, db: Session = Depends(get_db)) -> Dict:
+    # Requeue a failed job; it resumes from its stored test cases and push position
+    job = crud.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "failed":
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be retried, job is {job.status}")
+    return job_summary(job_queue.retry(db, job))
+
+# AIO outbox: inspect stored pushes and replay dead-lettered ones
+@app.get("/aio/outbox")
+def list_outbox(
+    status: Optional[str] = Query(None, description="Only entries with this status: sending, pending, sent or dead"),
+    limit: int = Query(50, description="Maximum number of entries returned, most recent first"),
+    db: Session = Depends(get_db)
+) -> Dict:
+    return {
+        "counts": crud.count_outbox_entries(db),
+        "entries": [outbox_summary(entry) for entry in crud.get_outbox_entries(db, status, limit)],
+    }
+
+@app.get("/aio/outbox/{outbox_id}")
+def get_outbox_entry(outbox_id: int, db: Session = Depends(get_db)) -> Dict:
+    # Status, last error and payload of an outbox entry
+    entry = crud.get_outbox_entry(db, outbox_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Outbox entry not found")
+    return outbox_summary(entry, include_payload=True)
+
+@app.post("/aio/outbox/{outbox_id}/replay")
+def replay_outbox_entry(outbox_id: int, db: Session = Depends(get_db)) -> Dict:
+    # Retry a dead or pending entry now, with a fresh set of attempts
+    entry = crud.get_outbox_entry(db, outbox_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Outbox entry not found")
+    try:
+        return outbox_summary(outbox_drainer.replay(db, entry))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/aio/outbox/replay")
+def replay_dead_outbox_entries(
+    limit: int = Query(100, description="Maximum number of dead entries replayed, most recent first"),
+    db: Session = Depends(get_db)
+) -> Dict:
+    """
+    Replay dead-lettered entries, e.g. after an AIO outage or a fixed configuration.
+    """
+    entries = [outbox_drainer.replay(db, entry) for entry in crud.get_outbox_entries(db, "dead", limit)]
+    return {"replayed": len(entries), "entries": [outbox_summary(entry) for entry in entries]}
@@ -1,6 +1,6 @@
 # app/models.py
 
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Float
 from .database import Base
 
 """
@@ -31,4 +31,129 @@ class GeneratedTestCase(Base):
     steps = Column(String)                      # Steps to execute the test case
     expected_results = Column(String)           # Expected results after execution
     postconditions = Column(String)             # Postconditions after the test case
-    tags = Column(String)                       # Tags for categorization, e.g., "TG-1-TC-1"
\ No newline at end of file
+    tags = Column(String)                       # Tags for categorization, e.g., "TG-1-TC-1"
+
+# Local mirror of a Jira issue, kept up to date by incremental sync
+class JiraStory(Base):
+    __tablename__ = "jira_stories"
+
+    id = Column(Integer, primary_key=True, index=True)
+    story_key = Column(String(50), unique=True, index=True)  # Jira issue key, e.g. "TG-1"
+    jira_id = Column(String(50))                              # Jira issue id, used as requirement ID
+    project_key = Column(String(50), index=True)              # Jira project key, e.g. "TG"
+    issue_type = Column(String(50), index=True)               # Jira issue type, e.g. "Story"
+    summary = Column(String(255))                             # Issue summary
+    description = Column(String)                              # Flattened plain-text description
+    status = Column(String(50), index=True)                   # Workflow status name
+    updated = Column(String(40))                              # Jira `updated` timestamp as returned by Jira
+    synced_at = Column(DateTime)                              # When the row was last written by a sync
+
+# Incremental sync bookkeeping for the Jira mirror, one row per project
+class JiraSyncState(Base):
+    __tablename__ = "jira_sync_state"
+
+    project_key = Column(String(50), primary_key=True)
+    last_sync = Column(DateTime)  # Start time (UTC) of the last successful sync
+
+# Persistent tier of the LLM generation cache, keyed by a hash of prompt and generation settings
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True)  # sha256 of (prompt, model, temperature, max_tokens)
+    model = Column(String(255))                              # Model that produced the content
+    content = Column(String)                                 # Raw LLM message content
+    size = Column(Integer)                                   # Content size in bytes, for size-based eviction
+    hits = Column(Integer, default=0)                        # Times the entry was served
+    created_at = Column(DateTime)                            # When the content was generated (TTL start)
+    last_used_at = Column(DateTime, index=True)              # Last store or hit, for LRU eviction
+
+# Background job (generation, optionally followed by an AIO push), executed by the local worker pool
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(30))                 # "generate" or "generate_and_push"
+    status = Column(String(20), index=True)       # queued, running, succeeded or failed
+    project_key = Column(String(50))              # AIO/Jira project key, required for pushes
+    issue_key = Column(String(50), index=True)    # Jira issue key of the story
+    params = Column(String)                       # JSON generation parameters (model, temperature, ...)
+    test_cases = Column(String)                   # JSON generated test cases, stored before pushing starts
+    generated = Column(Integer, default=0)        # Number of generated test cases
+    pushed = Column(Integer, default=0)           # Test cases created or updated in AIO
+    push_unchanged = Column(Integer, default=0)   # Test cases skipped because AIO already had their content
+    push_failed = Column(Integer, default=0)      # Test cases AIO rejected
+    push_position = Column(Integer, default=0)    # Index of the next test case to push, for resuming
+    push_errors = Column(String)                  # JSON list of failed pushes
+    error = Column(String)                        # Failure reason of a failed job
+    attempts = Column(Integer, default=0)         # Times a worker picked the job up
+    lease_owner = Column(String(100))             # Job queue (process) running the job
+    lease_expires_at = Column(DateTime)           # Running jobs are requeued once their lease expires
+    created_at = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+# AIO test case payload, stored before it is sent and retried by the outbox drainer until AIO accepts it
+class AIOOutboxEntry(Base):
+    __tablename__ = "aio_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), index=True)         # sending, pending (waiting for a retry), sent or dead
+    project_key = Column(String(50))                # AIO project the test case is pushed to
+    title = Column(String(255))                     # Test case title, for inspection
+    payload = Column(String)                        # JSON test case sent to AIO
+    attempts = Column(Integer, default=0)           # Send attempts so far
+    next_attempt_at = Column(DateTime, index=True)  # Earliest time of the next retry
+    claimed_until = Column(DateTime)                # Entries still sending after this are retried (their sender died)
+    last_status_code = Column(Integer)              # HTTP status of the last attempt, empty for connection errors
+    last_error = Column(String)                     # Error of the last failed attempt
+    aio_key = Column(String(50))                    # AIO test case key once sent
+    created_at = Column(DateTime)
+    sent_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+# Outcome of a hedged multi-model generation, kept for tuning the model list and stagger delay
+class ModelRaceResult(Base):
+    __tablename__ = "model_race_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    issue_key = Column(String(50), index=True)    # Jira issue key of the story
+    winner_model = Column(String(255), index=True)  # First model with usable test cases, None if all failed
+    latency_ms = Column(Float)                    # Time until the winner answered
+    stagger = Column(Float)                       # Seconds between model starts used for the race
+    models = Column(String)                       # JSON list of raced models, in start order
+    outcomes = Column(String)                     # JSON per-model outcomes (won, failed, cancelled, ...)
+    created_at = Column(DateTime)
+
+# One uncached LLM generation, the history behind model="auto" (see generation_stats)
+class GenerationStat(Base):
+    __tablename__ = "generation_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    issue_key = Column(String(50), index=True)      # Jira issue key of the story
+    model = Column(String(255), index=True)         # Model that generated the test cases
+    description_chars = Column(Integer)             # Length of the flattened story description
+    max_tokens = Column(Integer)                    # Token limit of each request
+    completion_tokens = Column(Integer)             # Output tokens of the first response and its continuations
+    test_cases = Column(Integer)                    # Number of test cases generated
+    latency_ms = Column(Float)                      # Time from the first request to the last response
+    truncated = Column(Boolean)                     # First response was cut off by max_tokens
+    continuations = Column(Integer, default=0)      # Follow-up requests for the remaining test cases
+    created_at = Column(DateTime)
+
+# Test case pushed to AIO, so regenerated cases are skipped or updated instead of duplicated (see aio_ledger)
+class AIOSyncEntry(Base):
+    __tablename__ = "aio_sync_ledger"
+
+    id = Column(Integer, primary_key=True, index=True)
+    identity_hash = Column(String(64), unique=True, index=True)   # Hash of project, requirement IDs and title
+    content_hash = Column(String(64))                             # Hash of the content last pushed to AIO
+    project_key = Column(String(50), index=True)                  # AIO / Jira project of the test case
+    title = Column(String(255))                                   # Test case title, for inspection
+    aio_key = Column(String(50))                                  # AIO test case key, e.g. TG-TC-12
+    aio_id = Column(String(50))                                   # AIO test case ID
+    claim_token = Column(String(32))                              # Push currently creating or updating the test case
+    claimed_until = Column(DateTime)                              # Claims expire, so a crashed push does not block the case
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
@@ -1,17 +1,27 @@
 # app/pm_service.py
 
-import requests
+import asyncio
 import json
 import logging
 import re
-from typing import List, Dict
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from .config import settings
-from .jira_service import JiraService
-from .ai_service import AIService
+from .jira_service import JiraService, AsyncJiraService
+from .ai_service import AIService, AsyncAIService
+from .http_transport import HostRateLimiter, HTTPTransport
+from .schemas import JiraTestCycleCreate, JiraTestSetCreate
+from .aio_ledger import CLAIM_POLL_INTERVAL, AIOSyncLedger, aio_ledger
+from .aio_outbox import AIOOutbox, aio_outbox
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
 class PMService:
+    # Jira and AI client classes (overridden by the async variant)
+    jira_service_class = JiraService
+    ai_service_class = AIService
+
     def __init__(
         self,
         aio_api_url: str,
@@ -20,26 +30,40 @@ class PMService:
         jira_email: str,
         jira_api_token: str,
         openrouter_url: str,
-        openrouter_api_key: str
+        openrouter_api_key: str,
+        transport: Optional[HTTPTransport] = None,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        ledger: Optional[AIOSyncLedger] = None,
+        outbox: Optional[AIOOutbox] = None
 
     ):
         """
         Initialize PMService with configuration from settings.
+        :param transport: Shared pooled HTTP transport (a private one is created if omitted)
+        :param rate_limiter: Per-host limit for AIO requests (AIO_RATE_LIMIT / AIO_RATE_BURST if omitted)
+        :param ledger: Record of the test cases already pushed to AIO (the shared ledger if omitted, none if AIO_SYNC_LEDGER is off)
+        :param outbox: Store of AIO payloads retried after failed pushes (the shared outbox if omitted, none if AIO_OUTBOX is off)
         """
         self.aio_api_url = aio_api_url or settings.AIO_API_URL
         self.aio_api_token = aio_api_token or settings.AIO_API_TOKEN
-        self.jira_service = JiraService(
+        self.transport = transport or HTTPTransport()
+        self.rate_limiter = rate_limiter or HostRateLimiter(settings.AIO_RATE_LIMIT, settings.AIO_RATE_BURST)
+        self.ledger = ledger or (aio_ledger if settings.AIO_SYNC_LEDGER else None)
+        self.outbox = outbox or (aio_outbox if settings.AIO_OUTBOX else None)
+        self.jira_service = self.jira_service_class(
             domain=jira_domain or settings.JIRA_DOMAIN,
             email=jira_email or settings.JIRA_EMAIL,
-            api_token=jira_api_token or settings.JIRA_API_TOKEN
+            api_token=jira_api_token or settings.JIRA_API_TOKEN,
+            transport=self.transport
         )
 
-        self.ai_service = AIService(
+        self.ai_service = self.ai_service_class(
             jira_domain=jira_domain or settings.JIRA_DOMAIN,
             jira_email=jira_email or settings.JIRA_EMAIL,
             jira_api_token=jira_api_token or settings.JIRA_API_TOKEN,
             openrouter_url=openrouter_url or settings.OPENROUTER_URL,
-            openrouter_api_key=openrouter_api_key or settings.OPENROUTER_API_KEY
+            openrouter_api_key=openrouter_api_key or settings.OPENROUTER_API_KEY,
+            transport=self.transport
         )
         # Set authorization headers
         self.headers = {
@@ -61,7 +85,7 @@ class PMService:
         }
 
         try:
-            response = requests.get(url, headers=headers)
+            response = self.transport.get(url, headers=headers)
             logging.info(f"AIO connection test status: {response.status_code}")
             return response.status_code == 200
         except Exception as e:
@@ -104,30 +128,230 @@ class PMService:
 # Add generated test cases to Jira story
 #------------------------------------------------------------------------------------------------------
     def send_to_aio(self, project_key: str, test_case: dict):
+        outcome = self.sync_aio_test_case(project_key, test_case)
+        return self._aio_send_result(outcome)
 
-        aio_url = f"{self.aio_api_url}/project/{project_key}/testcase" 
-        headers = {
-            "Authorization": f"AioAuth {self.aio_api_token}",  # Use the instance's token
-            "Content-Type": "application/json"
-        }
+    def sync_aio_test_case(self, project_key: str, test_case: dict) -> Dict:
+        """
+        Push one test case to AIO through the sync ledger: a case never pushed is created,
+        a case whose content changed since its last push updates its AIO test case, and
+        an unchanged case is skipped without a request.
+        A concurrent push of the same case, e.g. a duplicate in the batch, waits for this one.
+        The payload is stored in the outbox first; if the push fails on a connection error,
+        throttling or a 5xx answer, the outbox drainer retries it later.
+        :return: Outcome with status "created", "updated", "unchanged" or "failed",
+                 and the outbox entry's status ("sent", "pending" or "dead") as "outbox"
+        """
+        entry, token, settled = self._ledger_plan(project_key, test_case)
+        if settled:
+            return settled
+        outbox_id = self._outbox_add(project_key, test_case)
+        outcome = self._deliver(project_key, test_case, entry, token)
+        self._outbox_settle(outbox_id, outcome)
+        return outcome
+
+    def deliver_aio_test_case(self, project_key: str, test_case: dict) -> Dict:
+        """
+        Create or update one test case in AIO through the sync ledger, without the outbox.
+        Used by the outbox drainer for retries.
+        """
+        entry, token, settled = self._ledger_plan(project_key, test_case)
+        if settled:
+            return settled
+        return self._deliver(project_key, test_case, entry, token)
+
+    def _deliver(self, project_key: str, test_case: dict, entry: Optional[Dict], token: Optional[str] = None) -> Dict:
+        # Update the AIO test case of a changed case, or create it; record the result in the ledger
+        if entry and entry["aio_key"]:
+            outcome = self.update_aio_test_case(project_key, entry["aio_key"], test_case)
+            # A test case deleted in AIO is created again
+            if outcome["status_code"] != 404:
+                self._ledger_record(project_key, test_case, outcome, token, entry)
+                return outcome
+        outcome = self.create_aio_test_case(project_key, test_case)
+        self._ledger_record(project_key, test_case, outcome, token)
+        return outcome
+
+    def create_aio_test_case(self, project_key: str, test_case: dict) -> Dict:
+        """
+        Create one test case in AIO, waiting for the per-host rate limit first.
+        :return: Outcome {"title", "status", "key", "id", "status_code", "latency_ms", "error"}
+        """
+        aio_url = f"{self.aio_api_url}/project/{project_key}/testcase"
+        self.rate_limiter.acquire(aio_url)
+        started = time.perf_counter()
+        try:
+            response = self.transport.post(aio_url, json=test_case, headers=self.headers)
+        except Exception as e:
+            logging.error(f"AIO: ConnectionError {test_case['title']}: {e}")
+            return self._aio_outcome(None, test_case, started, str(e))
+        return self._aio_outcome(response, test_case, started)
 
-        response = None
+    def update_aio_test_case(self, project_key: str, aio_key: str, test_case: dict) -> Dict:
+        """
+        Replace the content of an existing AIO test case, waiting for the per-host rate limit first.
+        :param aio_key: AIO test case key, e.g. 'TG-TC-12'
+        :return: Outcome {"title", "status", "key", "id", "status_code", "latency_ms", "error"}
+        """
+        aio_url = f"{self.aio_api_url}/project/{project_key}/testcase/{aio_key}"
+        self.rate_limiter.acquire(aio_url)
+        started = time.perf_counter()
         try:
-            response = requests.post(aio_url, json=test_case, headers=headers)
-            if response.status_code == 200:
-                logging.info(f"AIO: Test case created successfully: {test_case['title']}")
-            else:
-                logging.error(f"AIO: Test case failed {test_case['title']} | Status: {response.status_code} | Response: {response.text}")
+            response = self.transport.request("PUT", aio_url, json=test_case, headers=self.headers)
         except Exception as e:
             logging.error(f"AIO: ConnectionError {test_case['title']}: {e}")
-            return {"error": str(e)}
-        
-        if response and response.status_code == 200:
-            return "Test case created successfully"
-        elif response:
-            return {"error": response.text}
-        else:
-            return {"error": "No response from AIO API"}
+            return self._aio_outcome(None, test_case, started, str(e), "updated")
+        return self._aio_outcome(response, test_case, started, action="updated")
+
+    def _ledger_plan(self, project_key: str, test_case: dict) -> Tuple[Optional[Dict], Optional[str], Optional[Dict]]:
+        # Claimed ledger entry and claim token of a case to push, or its outcome when there is nothing to send;
+        # waits while a concurrent push of the same case holds the claim
+        deadline = time.monotonic() + settings.AIO_SYNC_CLAIM_SECONDS
+        while True:
+            status, entry, token = self._ledger_claim(project_key, test_case)
+            settled = self._claim_outcome(test_case, status, entry, deadline)
+            if status != "busy" or settled:
+                return entry, token, settled
+            time.sleep(CLAIM_POLL_INTERVAL)
+
+    def _ledger_claim(self, project_key: str, test_case: dict) -> Tuple[str, Optional[Dict], Optional[str]]:
+        # One claim attempt; a ledger failure pushes the case as if it were new
+        if self.ledger is None:
+            return "claimed", None, None
+        try:
+            return self.ledger.claim(project_key, test_case, settings.AIO_SYNC_CLAIM_SECONDS)
+        except Exception as e:
+            logging.error(f"AIO ledger claim failed for {test_case.get('title', '')}: {e}")
+            return "claimed", None, None
+
+    def _claim_outcome(self, test_case: dict, status: str, entry: Optional[Dict], deadline: float) -> Optional[Dict]:
+        # Outcome of a case that is not pushed: unchanged, or still claimed by another push after the wait
+        if status == "unchanged":
+            return self._unchanged_outcome(test_case, entry)
+        if status == "busy" and time.monotonic() >= deadline:
+            logging.error(f"AIO: {test_case.get('title', '')} is still being pushed by another request")
+            return self._aio_outcome(None, test_case, time.perf_counter(), "Another push of this test case is still in progress")
+        return None
+
+    def _outbox_add(self, project_key: str, test_case: dict) -> Optional[int]:
+        # Store the payload before sending; an outbox failure only loses the retry
+        if self.outbox is None:
+            return None
+        try:
+            return self.outbox.add(project_key, test_case)
+        except Exception as e:
+            logging.error(f"AIO outbox: could not store {test_case.get('title', '')}: {e}")
+            return None
+
+    def _outbox_settle(self, outbox_id: Optional[int], outcome: Dict):
+        # Mark the stored payload sent, due for a retry or dead, and report it in the outcome
+        if outbox_id is None:
+            return
+        try:
+            outcome["outbox"] = self.outbox.settle(outbox_id, outcome)
+            outcome["outbox_id"] = outbox_id
+        except Exception as e:
+            logging.error(f"AIO outbox: could not settle entry {outbox_id}: {e}")
+
+    def _ledger_record(self, project_key: str, test_case: dict, outcome: Dict, token: Optional[str] = None, entry: Optional[Dict] = None):
+        # Remember the AIO key and content of a created or updated case; otherwise only release the claim
+        if self.ledger is None:
+            return
+        if entry and outcome["status"] == "updated":
+            outcome["key"] = outcome["key"] or entry["aio_key"]
+            outcome["id"] = outcome["id"] or entry["aio_id"]
+        try:
+            if outcome["status"] in ("created", "updated") and outcome["key"]:
+                self.ledger.record(project_key, test_case, outcome["key"], outcome["id"])
+            elif token:
+                self.ledger.release(project_key, test_case, token)
+        except Exception as e:
+            logging.error(f"AIO ledger record failed for {outcome['title']}: {e}")
+
+    @staticmethod
+    def _unchanged_outcome(test_case: dict, entry: Dict) -> Dict:
+        # Outcome of a case skipped because AIO already has its current content
+        return {
+            "title": test_case.get("title", ""),
+            "status": "unchanged",
+            "key": entry["aio_key"],
+            "id": entry["aio_id"],
+            "status_code": None,
+            "latency_ms": 0.0,
+            "error": None,
+        }
+
+    @staticmethod
+    def _aio_outcome(response, test_case: dict, started: float, error: Optional[str] = None, action: str = "created") -> Dict:
+        # Log and translate an AIO create or update response into a per-case outcome with the test case key
+        outcome = {
+            "title": test_case.get("title", ""),
+            "status": "failed",
+            "key": None,
+            "id": None,
+            "status_code": response.status_code if response is not None else None,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "error": error,
+        }
+        if response is None:
+            outcome["error"] = error or "No response from AIO API"
+            return outcome
+        if response.status_code == 200:
+            logging.info(f"AIO: Test case {action} successfully: {outcome['title']}")
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if isinstance(body, dict):
+                outcome["key"] = body.get("key")
+                outcome["id"] = body.get("ID", body.get("id"))
+            outcome["status"] = action
+            return outcome
+        logging.error(f"AIO: Test case failed {outcome['title']} | Status: {response.status_code} | Response: {response.text}")
+        outcome["error"] = response.text
+        return outcome
+
+    @staticmethod
+    def _aio_send_result(outcome: Dict):
+        # send_to_aio return value of a push outcome
+        if outcome["status"] == "failed":
+            return {"error": outcome["error"]}
+        if outcome["status"] == "unchanged":
+            return "Test case unchanged, skipped"
+        return f"Test case {outcome['status']} successfully"
+
+    @staticmethod
+    def _push_summary(outcomes: List[Dict], started: float) -> Dict:
+        # Totals of a push with the per-case outcomes in input order
+        for index, outcome in enumerate(outcomes):
+            outcome["index"] = index
+        counts = {status: 0 for status in ("created", "updated", "unchanged", "failed")}
+        for outcome in outcomes:
+            counts[outcome["status"]] += 1
+        return {
+            "total": len(outcomes),
+            **counts,
+            "retrying": sum(1 for outcome in outcomes if outcome.get("outbox") == "pending"),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "results": outcomes,
+        }
+
+    def push_test_cases(self, project_key: str, test_cases: List[Dict], concurrency: Optional[int] = None) -> Dict:
+        """
+        Push test cases to AIO in parallel, at most `concurrency` requests at a time
+        and within the per-host rate limit. Cases already pushed are skipped or updated
+        through the sync ledger. A failing case does not stop the others; failures that
+        may succeed later are retried by the outbox drainer.
+        :param concurrency: Parallel AIO requests (settings.AIO_PUSH_CONCURRENCY if omitted)
+        :return: {"total", "created", "updated", "unchanged", "failed", "retrying", "elapsed_ms", "results"} with one outcome per case
+        """
+        started = time.perf_counter()
+        if not test_cases:
+            return self._push_summary([], started)
+        workers = min(concurrency or settings.AIO_PUSH_CONCURRENCY, len(test_cases))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(lambda case: self.sync_aio_test_case(project_key, case), test_cases))
+        return self._push_summary(outcomes, started)
             
     def add_generated_test_cases_to_jira(
             self, 
@@ -135,32 +359,486 @@ class PMService:
             issue_key: str, 
             model: str="meta-llama/llama-3-8b-instruct",
             temperature: float=0.7,
-            max_tokens: int=666
-            ) -> List[Dict]:
+            max_tokens: int=666,
+            story: Optional[Dict]=None,
+            use_cache: bool=True,
+            push_concurrency: Optional[int]=None
+            ) -> Dict:
         """
         Add generated test cases to a Jira story.
         :param issue_key: Jira issue key, e.g. 'TG-1'
-        :param test_cases: List of test case dictionaries to add
-        :return: True if successful, False otherwise
+        :param story: Optional pre-loaded story (e.g. from the local mirror) to skip the Jira fetch
+        :param use_cache: Set to False to bypass the generation cache
+        :param push_concurrency: Parallel AIO requests (settings.AIO_PUSH_CONCURRENCY if omitted)
+        :return: {"test_cases": generated test cases, "push": push summary with per-case outcomes}
         """
         test_cases = self.ai_service.generate_and_normalize_test_cases(
             issue_key,
             model,
             temperature,
-            max_tokens
+            max_tokens,
+            story,
+            use_cache
         )
+        push = self.push_test_cases(project_key, test_cases, push_concurrency)
+        logging.info(f"Added {push['created']} and updated {push['updated']} of {len(test_cases)} test cases of Jira story {issue_key} ({push['unchanged']} unchanged).")
+        return {"test_cases": test_cases, "push": push}
+
+#------------------------------------------------------------------------------------------------------
+# AIO test sets and test cycles
+#------------------------------------------------------------------------------------------------------
+    def create_aio_test_set(self, project_key: str, test_set: JiraTestSetCreate, concurrency: Optional[int] = None) -> Dict:
+        """
+        Create a test set in AIO and add its test cases in batches of AIO_LINK_BATCH_SIZE keys,
+        with the batches sent in parallel.
+        :param concurrency: Parallel AIO requests (settings.AIO_PUSH_CONCURRENCY if omitted)
+        :return: {"name", "status", "key", "id", "status_code", "error", "linked", "link_failed", "batches"}
+        """
+        container = self._create_aio_container(project_key, "testset", test_set.name, test_set.description)
+        return self._link_to_container(project_key, container, "testset", "testcases", "testCaseKeys", test_set.test_case_keys, concurrency)
+
+    def create_aio_test_cycle(self, project_key: str, test_cycle: JiraTestCycleCreate, concurrency: Optional[int] = None) -> Dict:
+        """
+        Create a test cycle in AIO and add its test sets in batches of AIO_LINK_BATCH_SIZE keys,
+        with the batches sent in parallel.
+        :param concurrency: Parallel AIO requests (settings.AIO_PUSH_CONCURRENCY if omitted)
+        :return: {"name", "status", "key", "id", "status_code", "error", "linked", "link_failed", "batches"}
+        """
+        container = self._create_aio_container(project_key, "testcycle", test_cycle.name, test_cycle.description)
+        return self._link_to_container(project_key, container, "testcycle", "testsets", "testSetKeys", test_cycle.test_set_keys, concurrency)
+
+    def _create_aio_container(self, project_key: str, kind: str, name: str, description: Optional[str]) -> Dict:
+        # Create an empty test set or test cycle
+        aio_url = f"{self.aio_api_url}/project/{project_key}/{kind}"
+        self.rate_limiter.acquire(aio_url)
+        started = time.perf_counter()
         try:
-            for case in test_cases:
-                # Assuming the AI service returns a dictionary with 'summary' and 'description'
-                send_to_aio_response = self.send_to_aio(project_key, case)
-                
-            logging.info(f"Added {len(test_cases)} test cases to Jira story {issue_key}.")
-            return test_cases
+            response = self.transport.post(aio_url, json={"name": name, "description": description or ""}, headers=self.headers)
         except Exception as e:
-            logging.error(f"Failed to add test cases to Jira: {e}")
-            return []
-            
-                
+            logging.error(f"AIO: ConnectionError creating {kind} {name}: {e}")
+            return self._container_outcome(None, kind, name, started, str(e))
+        return self._container_outcome(response, kind, name, started)
+
+    def _link_to_container(self, project_key: str, container: Dict, kind: str, member_path: str, field: str, keys: List[str], concurrency: Optional[int]) -> Dict:
+        # Add member keys to a created container, one request per batch, batches in parallel
+        batches = self._link_batches(keys)
+        if container["status"] != "created" or not batches:
+            return self._link_summary(container, [])
+        aio_url = f"{self.aio_api_url}/project/{project_key}/{kind}/{container['key']}/{member_path}"
+        workers = min(concurrency or settings.AIO_PUSH_CONCURRENCY, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(lambda batch: self._send_link_batch(aio_url, field, batch), batches))
+        return self._link_summary(container, outcomes)
+
+    def _send_link_batch(self, aio_url: str, field: str, batch: List[str]) -> Dict:
+        self.rate_limiter.acquire(aio_url)
+        try:
+            response = self.transport.post(aio_url, json={field: batch}, headers=self.headers)
+        except Exception as e:
+            logging.error(f"AIO: ConnectionError linking {len(batch)} keys to {aio_url}: {e}")
+            return self._link_outcome(None, batch, str(e))
+        return self._link_outcome(response, batch)
+
+    @staticmethod
+    def _link_batches(keys: List[str]) -> List[List[str]]:
+        # Unique keys in their original order, split into AIO_LINK_BATCH_SIZE chunks
+        unique = list(dict.fromkeys(key for key in keys if key))
+        size = max(settings.AIO_LINK_BATCH_SIZE, 1)
+        return [unique[start:start + size] for start in range(0, len(unique), size)]
+
+    @staticmethod
+    def _container_outcome(response, kind: str, name: str, started: float, error: Optional[str] = None) -> Dict:
+        # Log and translate an AIO test set / test cycle create response into an outcome with its key
+        outcome = {
+            "name": name,
+            "status": "failed",
+            "key": None,
+            "id": None,
+            "status_code": response.status_code if response is not None else None,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "error": error,
+        }
+        if response is None:
+            outcome["error"] = error or "No response from AIO API"
+            return outcome
+        if response.status_code in (200, 201):
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if isinstance(body, dict) and body.get("key"):
+                logging.info(f"AIO: {kind} created successfully: {name} ({body['key']})")
+                outcome.update(status="created", key=body["key"], id=body.get("ID", body.get("id")))
+                return outcome
+            outcome["error"] = f"AIO did not return the key of the {kind}"
+            return outcome
+        logging.error(f"AIO: {kind} failed {name} | Status: {response.status_code} | Response: {response.text}")
+        outcome["error"] = response.text
+        return outcome
+
+    @staticmethod
+    def _link_outcome(response, batch: List[str], error: Optional[str] = None) -> Dict:
+        # Outcome of one batch of added keys
+        linked = response is not None and response.status_code in (200, 201, 204)
+        if response is not None and not linked:
+            error = response.text
+            logging.error(f"AIO: linking {len(batch)} keys failed | Status: {response.status_code} | Response: {response.text}")
+        return {
+            "keys": batch,
+            "status": "linked" if linked else "failed",
+            "status_code": response.status_code if response is not None else None,
+            "error": None if linked else error or "No response from AIO API",
+        }
+
+    @staticmethod
+    def _link_summary(container: Dict, outcomes: List[Dict]) -> Dict:
+        # Container outcome with the linked and failed key counts of its batches
+        return {
+            **container,
+            "linked": sum(len(outcome["keys"]) for outcome in outcomes if outcome["status"] == "linked"),
+            "link_failed": sum(len(outcome["keys"]) for outcome in outcomes if outcome["status"] == "failed"),
+            "batches": outcomes,
+        }
+
+    @staticmethod
+    def _pushed_keys(push: Dict) -> List[str]:
+        # AIO keys of the pushed test cases, created, updated or unchanged
+        return [outcome["key"] for outcome in push["results"] if outcome["status"] != "failed" and outcome["key"]]
+
+    @staticmethod
+    def _story_test_set(issue_key: str, test_case_keys: List[str]) -> JiraTestSetCreate:
+        # Test set holding a story's generated test cases
+        return JiraTestSetCreate(name=f"{issue_key} generated test cases", description=f"Test cases generated for {issue_key}", test_case_keys=test_case_keys)
+
+    @staticmethod
+    def _story_test_cycle(issue_key: str, test_set_key: str) -> JiraTestCycleCreate:
+        # Test cycle running a story's test set
+        return JiraTestCycleCreate(name=f"{issue_key} test cycle", description=f"Test cycle of {issue_key}", test_set_keys=[test_set_key])
+
+    def create_story_test_set_and_cycle(
+            self,
+            project_key: str,
+            issue_key: str,
+            model: str="meta-llama/llama-3-8b-instruct",
+            temperature: float=0.7,
+            max_tokens: int=666,
+            story: Optional[Dict]=None,
+            use_cache: bool=True,
+            push_concurrency: Optional[int]=None
+            ) -> Dict:
+        """
+        Generate a story's test cases, push them to AIO, and group them in a new test set
+        inside a new test cycle.
+        :return: {"test_cases", "push", "test_set", "test_cycle"}; test_set / test_cycle are None when there was nothing to add
+        """
+        result = self.add_generated_test_cases_to_jira(project_key, issue_key, model, temperature, max_tokens, story, use_cache, push_concurrency)
+        result.update(test_set=None, test_cycle=None)
+        keys = self._pushed_keys(result["push"])
+        if not keys:
+            return result
+        result["test_set"] = self.create_aio_test_set(project_key, self._story_test_set(issue_key, keys), push_concurrency)
+        if result["test_set"]["status"] == "created":
+            result["test_cycle"] = self.create_aio_test_cycle(project_key, self._story_test_cycle(issue_key, result["test_set"]["key"]), push_concurrency)
+        return result
+
+
+class AsyncPMService(PMService):
+    """
+    Awaitable variant of PMService. Generation and AIO pushes go through the pooled
+    async HTTP client, so the endpoint does not block the event loop.
+    """
+    jira_service_class = AsyncJiraService
+    ai_service_class = AsyncAIService
+
+    async def test_aio_connection(self) -> bool:
+        """
+        Test connection to AIO API by making a simple GET request to a known endpoint.
+        """
+        url = f"{self.aio_api_url}/project/TG/testcase"
+        try:
+            response = await self.transport.aget(url, headers=self.headers)
+            logging.info(f"AIO connection test status: {response.status_code}")
+            return response.status_code == 200
+        except Exception as e:
+            logging.error(f"Failed to connect to AIO API: {e}")
+            return False
+
+    async def test_jira_connection(self) -> bool:
+        """
+        Awaitable version of PMService.test_jira_connection.
+        """
+        try:
+            issue = await self.jira_service.get_all_user_stories("TG", "Story")
+            logging.info(f"Connected to Jira. Found {len(issue)} issues.")
+            return True
+        except Exception as e:
+            logging.error(f"Failed to connect to Jira: {e}")
+            return False
+
+    async def test_ai_connection(self) -> bool:
+        """
+        Awaitable version of PMService.test_ai_connection.
+        """
+        try:
+            response = await self.ai_service.process_jira_story_and_send_to_openrouter(
+                issue_key="TG-1",
+                model="meta-llama/llama-3-8b-instruct",
+                temperature=0.7,
+                max_tokens=1000
+            )
+            if "error" in response:
+                logging.error(f"AI connection test failed: {response['error']}")
+                return False
+            logging.info("AI connection test succeeded.")
+            return True
+        except Exception as e:
+            logging.error(f"Failed to connect to AI service: {e}")
+            return False
+
+    async def send_to_aio(self, project_key: str, test_case: dict):
+        outcome = await self.sync_aio_test_case(project_key, test_case)
+        return self._aio_send_result(outcome)
+
+    async def sync_aio_test_case(self, project_key: str, test_case: dict) -> Dict:
+        """
+        Awaitable version of PMService.sync_aio_test_case.
+        Ledger and outbox writes run in worker threads, so concurrent pushes and a
+        streamed generation are not held up by database commits.
+        """
+        entry, token, settled = await self._ledger_plan(project_key, test_case)
+        if settled:
+            return settled
+        outbox_id = await asyncio.to_thread(self._outbox_add, project_key, test_case)
+        outcome = await self._deliver(project_key, test_case, entry, token)
+        await asyncio.to_thread(self._outbox_settle, outbox_id, outcome)
+        return outcome
+
+    async def deliver_aio_test_case(self, project_key: str, test_case: dict) -> Dict:
+        """
+        Awaitable version of PMService.deliver_aio_test_case.
+        """
+        entry, token, settled = await self._ledger_plan(project_key, test_case)
+        if settled:
+            return settled
+        return await self._deliver(project_key, test_case, entry, token)
+
+    async def _ledger_plan(self, project_key: str, test_case: dict) -> Tuple[Optional[Dict], Optional[str], Optional[Dict]]:
+        deadline = time.monotonic() + settings.AIO_SYNC_CLAIM_SECONDS
+        while True:
+            status, entry, token = await asyncio.to_thread(self._ledger_claim, project_key, test_case)
+            settled = self._claim_outcome(test_case, status, entry, deadline)
+            if status != "busy" or settled:
+                return entry, token, settled
+            await asyncio.sleep(CLAIM_POLL_INTERVAL)
+
+    async def _deliver(self, project_key: str, test_case: dict, entry: Optional[Dict], token: Optional[str] = None) -> Dict:
+        if entry and entry["aio_key"]:
+            outcome = await self.update_aio_test_case(project_key, entry["aio_key"], test_case)
+            if outcome["status_code"] != 404:
+                await asyncio.to_thread(self._ledger_record, project_key, test_case, outcome, token, entry)
+                return outcome
+        outcome = await self.create_aio_test_case(project_key, test_case)
+        await asyncio.to_thread(self._ledger_record, project_key, test_case, outcome, token)
+        return outcome
+
+    async def create_aio_test_case(self, project_key: str, test_case: dict) -> Dict:
+        """
+        Awaitable version of PMService.create_aio_test_case.
+        """
+        aio_url = f"{self.aio_api_url}/project/{project_key}/testcase"
+        await self.rate_limiter.aacquire(aio_url)
+        started = time.perf_counter()
+        try:
+            response = await self.transport.apost(aio_url, json=test_case, headers=self.headers)
+        except Exception as e:
+            logging.error(f"AIO: ConnectionError {test_case['title']}: {e}")
+            return self._aio_outcome(None, test_case, started, str(e))
+        return self._aio_outcome(response, test_case, started)
+
+    async def update_aio_test_case(self, project_key: str, aio_key: str, test_case: dict) -> Dict:
+        """
+        Awaitable version of PMService.update_aio_test_case.
+        """
+        aio_url = f"{self.aio_api_url}/project/{project_key}/testcase/{aio_key}"
+        await self.rate_limiter.aacquire(aio_url)
+        started = time.perf_counter()
+        try:
+            response = await self.transport.arequest("PUT", aio_url, json=test_case, headers=self.headers)
+        except Exception as e:
+            logging.error(f"AIO: ConnectionError {test_case['title']}: {e}")
+            return self._aio_outcome(None, test_case, started, str(e), "updated")
+        return self._aio_outcome(response, test_case, started, action="updated")
+
+    async def push_test_cases(self, project_key: str, test_cases: List[Dict], concurrency: Optional[int] = None) -> Dict:
+        """
+        Awaitable version of PMService.push_test_cases.
+        """
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(concurrency or settings.AIO_PUSH_CONCURRENCY)
+
+        async def push(case: Dict) -> Dict:
+            async with semaphore:
+                return await self.sync_aio_test_case(project_key, case)
+
+        outcomes = await asyncio.gather(*(push(case) for case in test_cases))
+        return self._push_summary(list(outcomes), started)
+
+    async def add_generated_test_cases_to_jira(
+            self,
+            project_key: str,
+            issue_key: str,
+            model: str="meta-llama/llama-3-8b-instruct",
+            temperature: float=0.7,
+            max_tokens: int=666,
+            story: Optional[Dict]=None,
+            use_cache: bool=True,
+            push_concurrency: Optional[int]=None
+            ) -> Dict:
+        """
+        Awaitable version of PMService.add_generated_test_cases_to_jira.
+        """
+        test_cases = await self.ai_service.generate_and_normalize_test_cases(
+            issue_key,
+            model,
+            temperature,
+            max_tokens,
+            story,
+            use_cache
+        )
+        push = await self.push_test_cases(project_key, test_cases, push_concurrency)
+        logging.info(f"Added {push['created']} and updated {push['updated']} of {len(test_cases)} test cases of Jira story {issue_key} ({push['unchanged']} unchanged).")
+        return {"test_cases": test_cases, "push": push}
+
+    async def pipeline_generated_test_cases(
+            self,
+            project_key: str,
+            issue_key: str,
+            model: str="meta-llama/llama-3-8b-instruct",
+            temperature: float=0.7,
+            max_tokens: int=666,
+            story: Optional[Dict]=None,
+            use_cache: bool=True,
+            push_concurrency: Optional[int]=None
+            ) -> Dict:
+        """
+        Pipelined variant of add_generated_test_cases_to_jira: test cases are generated with a
+        streamed completion and each one is pushed to AIO as soon as it is parsed, so the AIO
+        writes overlap generation and the total time is about max(generation, push) instead
+        of their sum. A truncated completion pushes the test cases parsed before the cut.
+        :param push_concurrency: Parallel AIO requests (settings.AIO_PUSH_CONCURRENCY if omitted)
+        :return: {"test_cases", "push", "generation": final stream event with "generation_ms"}
+        """
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(push_concurrency or settings.AIO_PUSH_CONCURRENCY)
+        test_cases: List[Dict] = []
+        pushes: List[asyncio.Task] = []
+        generation: Dict = {}
+
+        async def push(case: Dict) -> Dict:
+            async with semaphore:
+                return await self.sync_aio_test_case(project_key, case)
+
+        try:
+            try:
+                async for event in self.ai_service.stream_test_cases(issue_key, model, temperature, max_tokens, story, use_cache):
+                    if event["event"] == "test_case":
+                        test_cases.append(event["test_case"])
+                        pushes.append(asyncio.create_task(push(event["test_case"])))
+                    else:
+                        generation = event
+            except Exception as e:
+                # Test cases already handed to the push stage are still pushed and reported
+                logging.error(f"Streamed generation failed for {issue_key}: {e}")
+                generation = {"event": "error", "error": str(e)}
+            generation["generation_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            results = list(await asyncio.gather(*pushes))
+        finally:
+            # When the request is cancelled (client disconnect, timeout), pushes still running are
+            # cancelled instead of left orphaned; their outbox entries are retried once their lease expires
+            for task in pushes:
+                task.cancel()
+            await asyncio.gather(*pushes, return_exceptions=True)
+
+        push = self._push_summary(results, started)
+        logging.info(f"Pipelined {issue_key}: added {push['created']} and updated {push['updated']} of {len(test_cases)} test cases in {push['elapsed_ms']} ms (generation {generation['generation_ms']} ms).")
+        return {"test_cases": test_cases, "push": push, "generation": generation}
+
+    async def create_aio_test_set(self, project_key: str, test_set: JiraTestSetCreate, concurrency: Optional[int] = None) -> Dict:
+        """
+        Awaitable version of PMService.create_aio_test_set.
+        """
+        container = await self._create_aio_container(project_key, "testset", test_set.name, test_set.description)
+        return await self._link_to_container(project_key, container, "testset", "testcases", "testCaseKeys", test_set.test_case_keys, concurrency)
+
+    async def create_aio_test_cycle(self, project_key: str, test_cycle: JiraTestCycleCreate, concurrency: Optional[int] = None) -> Dict:
+        """
+        Awaitable version of PMService.create_aio_test_cycle.
+        """
+        container = await self._create_aio_container(project_key, "testcycle", test_cycle.name, test_cycle.description)
+        return await self._link_to_container(project_key, container, "testcycle", "testsets", "testSetKeys", test_cycle.test_set_keys, concurrency)
+
+    async def _create_aio_container(self, project_key: str, kind: str, name: str, description: Optional[str]) -> Dict:
+        aio_url = f"{self.aio_api_url}/project/{project_key}/{kind}"
+        await self.rate_limiter.aacquire(aio_url)
+        started = time.perf_counter()
+        try:
+            response = await self.transport.apost(aio_url, json={"name": name, "description": description or ""}, headers=self.headers)
+        except Exception as e:
+            logging.error(f"AIO: ConnectionError creating {kind} {name}: {e}")
+            return self._container_outcome(None, kind, name, started, str(e))
+        return self._container_outcome(response, kind, name, started)
+
+    async def _link_to_container(self, project_key: str, container: Dict, kind: str, member_path: str, field: str, keys: List[str], concurrency: Optional[int]) -> Dict:
+        batches = self._link_batches(keys)
+        if container["status"] != "created" or not batches:
+            return self._link_summary(container, [])
+        aio_url = f"{self.aio_api_url}/project/{project_key}/{kind}/{container['key']}/{member_path}"
+        semaphore = asyncio.Semaphore(concurrency or settings.AIO_PUSH_CONCURRENCY)
+
+        async def link(batch: List[str]) -> Dict:
+            async with semaphore:
+                return await self._send_link_batch(aio_url, field, batch)
+
+        outcomes = await asyncio.gather(*(link(batch) for batch in batches))
+        return self._link_summary(container, list(outcomes))
+
+    async def _send_link_batch(self, aio_url: str, field: str, batch: List[str]) -> Dict:
+        await self.rate_limiter.aacquire(aio_url)
+        try:
+            response = await self.transport.apost(aio_url, json={field: batch}, headers=self.headers)
+        except Exception as e:
+            logging.error(f"AIO: ConnectionError linking {len(batch)} keys to {aio_url}: {e}")
+            return self._link_outcome(None, batch, str(e))
+        return self._link_outcome(response, batch)
+
+    async def create_story_test_set_and_cycle(
+            self,
+            project_key: str,
+            issue_key: str,
+            model: str="meta-llama/llama-3-8b-instruct",
+            temperature: float=0.7,
+            max_tokens: int=666,
+            story: Optional[Dict]=None,
+            use_cache: bool=True,
+            push_concurrency: Optional[int]=None,
+            pipelined: bool=False
+            ) -> Dict:
+        """
+        Awaitable version of PMService.create_story_test_set_and_cycle.
+        :param pipelined: Push each test case as soon as it is parsed from the streamed LLM output
+        """
+        generate_and_push = self.pipeline_generated_test_cases if pipelined else self.add_generated_test_cases_to_jira
+        result = await generate_and_push(project_key, issue_key, model, temperature, max_tokens, story, use_cache, push_concurrency)
+        result.update(test_set=None, test_cycle=None)
+        keys = self._pushed_keys(result["push"])
+        if not keys:
+            return result
+        result["test_set"] = await self.create_aio_test_set(project_key, self._story_test_set(issue_key, keys), push_concurrency)
+        if result["test_set"]["status"] == "created":
+            result["test_cycle"] = await self.create_aio_test_cycle(project_key, self._story_test_cycle(issue_key, result["test_set"]["key"]), push_concurrency)
+        return result
+
+
 if __name__ == "__main__":
     service = PMService(
         aio_api_url=settings.AIO_API_URL,
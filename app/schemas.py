@@ -1,7 +1,10 @@
 # app/schemas.py
 
 from pydantic import BaseModel, ConfigDict
-from typing import Optional, List, Dict
+from typing import Literal, Optional, List, Dict
+
+# Where stories are read from: live from "jira" or from the local "mirror"
+StorySource = Literal["jira", "mirror"]
 
 # ---------------------------
 # Base models for FastAPI
@@ -44,6 +47,54 @@ class GeneratedTestCaseResponse(GeneratedTestCaseBase):
 
     model_config = ConfigDict(from_attributes=True)  # Updated to use ConfigDict
 
+# --- Batch generation ---
+class BatchGenerationRequest(BaseModel):
+    jql: Optional[str] = None  # Extra JQL filter within the project, e.g. "sprint in openSprints()"
+    issue_keys: Optional[List[str]] = None  # Explicit issue keys; takes precedence over jql
+    model: str = "meta-llama/llama-3-8b-instruct"  # "auto" chooses model and max_tokens per story
+    temperature: float = 0.7
+    max_tokens: int = 666
+    use_cache: bool = True
+    jira_concurrency: Optional[int] = None  # Parallel Jira searches (JIRA_BULK_CONCURRENCY if omitted)
+    openrouter_concurrency: Optional[int] = None  # Parallel generations (BATCH_OPENROUTER_CONCURRENCY if omitted)
+    pack: bool = False  # Combine small stories into shared prompts
+
+# --- Background jobs ---
+class JobCreate(BaseModel):
+    job_type: str = "generate_and_push"  # "generate" or "generate_and_push"
+    issue_key: str
+    project_key: Optional[str] = None  # Required for "generate_and_push"
+    model: str = "meta-llama/llama-3-8b-instruct"
+    temperature: float = 0.7
+    max_tokens: int = 666
+    source: StorySource = "jira"  # Read the story live from "jira" or from the local "mirror"
+    use_cache: bool = True
+
+# ---------------------------
+# Models for Jira story retrieval
+# ---------------------------
+class JiraBulkStoriesRequest(BaseModel):
+    issue_keys: List[str]  # Jira issue keys to fetch, e.g. ["TG-1", "TG-2"]
+
+# --- Local Jira mirror ---
+class JiraStoryMirrorBase(BaseModel):
+    story_key: str
+    jira_id: str
+    project_key: str
+    issue_type: Optional[str] = None
+    summary: Optional[str] = None
+    description: Optional[str] = None  # Flattened plain-text description
+    status: Optional[str] = None
+    updated: Optional[str] = None  # Jira `updated` timestamp
+
+class JiraStoryMirrorCreate(JiraStoryMirrorBase):
+    pass
+
+class JiraStoryMirrorRead(JiraStoryMirrorBase):
+    id: int
+
+    model_config = ConfigDict(from_attributes=True)
+
 # ---------------------------
 # Models for creating AIO Test via Jira API
 # ---------------------------
@@ -59,6 +110,23 @@ class JiraTestCaseCreate(BaseModel):
     pre_condition: Optional[str] = None  # Pre-condition for the test case
     tags: Optional[List[str]] = None  # Tags or labels for the test case
 
+# --- AIO test case as generated by the LLM (see AIService.create_test_case_prompt) ---
+class AIOTestStep(BaseModel):
+    step: str
+    data: str = ""
+    expectedResult: str
+    stepType: str = "TEXT"
+
+class GeneratedAIOTestCase(BaseModel):
+    title: str
+    description: str = ""
+    precondition: str = ""
+    steps: List[AIOTestStep]
+    jiraRequirementIDs: List[str]  # Always contains the story ID
+
+class GeneratedAIOTestCases(BaseModel):
+    test_cases: List[GeneratedAIOTestCase]  # Structured outputs need an object at the root
+
 # --- Test Set ---
 class JiraTestSetCreate(BaseModel):
     name: str  # Name of the test set
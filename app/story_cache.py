@@ -0,0 +1,100 @@
+# app/story_cache.py
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from .config import settings
+
+class StoryCache:
+    """
+    Bounded LRU + TTL cache of Jira issues keyed by issue key.
+
+    Entries younger than the TTL are served directly. Older entries are kept and
+    revalidated by comparing the issue's `updated` timestamp, so an unchanged
+    story costs one tiny request instead of a full fetch.
+    Issues are copied in and out, so callers may modify what they get without
+    affecting other readers of the cache.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        :param max_entries: Maximum number of issues kept before the least recently used is evicted
+        :param ttl: Seconds an entry is served without revalidation
+        """
+        self.max_entries = max_entries or settings.STORY_CACHE_MAX_ENTRIES
+        self.ttl = settings.STORY_CACHE_TTL if ttl is None else ttl
+        self._entries: "OrderedDict[str, Tuple[Dict, str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key: str) -> Tuple[Optional[Dict], Optional[str], bool]:
+        """
+        Look up an issue.
+        :param key: Cache key (domain + issue key)
+        :return: Tuple of (issue copy, updated timestamp, fresh); issue is None when not cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None, False
+            self._entries.move_to_end(key)
+            issue, updated, stored_at = entry
+            fresh = time.monotonic() - stored_at < self.ttl
+            if fresh:
+                self.hits += 1
+        return copy.deepcopy(issue), updated, fresh
+
+    def store(self, key: str, issue: Dict, updated: Optional[str]):
+        """
+        Store a freshly fetched issue, evicting the least recently used entries if full.
+        """
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (copy.deepcopy(issue), updated, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def mark_revalidated(self, key: str):
+        """
+        Restart the TTL of an entry whose `updated` timestamp has not changed.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], entry[1], time.monotonic())
+                self.revalidated += 1
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """
+        Hit/miss counters; `revalidated` counts stale entries reused after an `updated` check.
+        """
+        with self._lock:
+            lookups = self.hits + self.revalidated + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.revalidated) / lookups, 4) if lookups else 0.0,
+            }
+
+# Shared cache used by every JiraService unless one is injected explicitly
+story_cache = StoryCache()
@@ -0,0 +1,92 @@
+# benchmarks/bench_flatten_adf.py
+#
+# Compares the old recursive ADF flattener with the explicit-stack flattener and
+# the memoized story conversion on large synthetic ADF documents. Run from the
+# repository root:
+#
+#     python -m benchmarks.bench_flatten_adf
+
+import logging
+import time
+from app.adf_text import FlattenMemo, flatten_adf
+from app.ai_service import AIService
+
+def legacy_flatten(adf: dict) -> str:
+    # Previous implementation: recursive closure joining all text nodes with spaces
+    plain_text = []
+
+    def extract_text(nodes):
+        for node in nodes:
+            if node.get("type") == "text":
+                plain_text.append(node.get("text", ""))
+            elif "content" in node:
+                extract_text(node["content"])
+
+    if adf and isinstance(adf, dict):
+        extract_text(adf.get("content", []))
+    return " ".join(plain_text)
+
+def text(value):
+    return {"type": "text", "text": value}
+
+def paragraph(value):
+    return {"type": "paragraph", "content": [text("The user "), {"type": "text", "text": value, "marks": [{"type": "strong"}]}, text(" is shown.")]}
+
+def make_wide(sections: int) -> dict:
+    # Headings with acceptance-criteria lists and a table per section
+    content = []
+    for s in range(sections):
+        content.append({"type": "heading", "attrs": {"level": 2}, "content": [text(f"Section {s}")]})
+        content.append({"type": "bulletList", "content": [{"type": "listItem", "content": [paragraph(f"criterion {s}.{i}")]} for i in range(8)]})
+        content.append({"type": "table", "content": [
+            {"type": "tableRow", "content": [{"type": "tableCell", "content": [paragraph(f"cell {r}.{c}")]} for c in range(4)]}
+            for r in range(5)
+        ]})
+    return {"type": "doc", "version": 1, "content": content}
+
+def make_deep(depth: int) -> dict:
+    # Nested lists, each level with its own criterion
+    node = {"type": "bulletList", "content": [{"type": "listItem", "content": [paragraph("leaf")]}]}
+    for level in range(depth):
+        node = {"type": "bulletList", "content": [{"type": "listItem", "content": [paragraph(f"level {level}"), node]}]}
+    return {"type": "doc", "version": 1, "content": [node]}
+
+def timed(func, adf: dict, repeat: int = 5):
+    best = None
+    result = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            result = func(adf)
+        except RecursionError:
+            return None, 0
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(result)
+
+def main():
+    logging.disable(logging.CRITICAL)
+    scenarios = [(f"{n} sections", make_wide(n)) for n in (10, 100, 1000)]
+    scenarios += [(f"depth {d}", make_deep(d)) for d in (100, 900, 5000)]
+
+    print(f"{'scenario':<16}{'legacy ms':>12}{'chars':>9}{'new ms':>10}{'chars':>9}")
+    for name, adf in scenarios:
+        legacy_time, legacy_chars = timed(legacy_flatten, adf)
+        new_time, new_chars = timed(flatten_adf, adf)
+        legacy = f"{legacy_time * 1000:>12.2f}" if legacy_time is not None else f"{'RecursionError':>12}"
+        print(f"{name:<16}{legacy}{legacy_chars:>9}{new_time * 1000:>10.2f}{new_chars:>9}")
+
+    # Memoized conversion of an unchanged issue, as in repeated generations and batch runs
+    service = AIService("https://example.atlassian.net", "qa@example.com", "token", "https://openrouter.ai", "key", flatten_memo=FlattenMemo())
+    issue = {"key": "TG-1", "id": "1", "fields": {"summary": "Large", "updated": "2024-01-01T00:00:00.000+0000", "description": make_wide(100)}}
+    start = time.perf_counter()
+    service.story_from_jira_issue(issue)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(100):
+        service.story_from_jira_issue(issue)
+    memoized = (time.perf_counter() - start) / 100
+    print(f"\nstory_from_jira_issue, 100 sections: first {first * 1000:.2f} ms, memoized {memoized * 1000:.4f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_parse_test_cases.py
+#
+# Compares the old regex-based test case extraction with the single-pass parser
+# on large synthetic LLM outputs. Run from the repository root:
+#
+#     python -m benchmarks.bench_parse_test_cases
+
+import json
+import logging
+import re
+import time
+from app.ai_service import AIService
+
+def legacy_parse(ai_content: str):
+    # Previous implementation: greedy DOTALL regex plus a trailing-comma fix-up, then normalization
+    match = re.search(r'\[\s*{.*}\s*\]', ai_content, re.DOTALL)
+    if not match:
+        return []
+    json_str = match.group(0)
+    try:
+        test_cases = json.loads(json_str)
+    except ValueError:
+        try:
+            test_cases = json.loads(re.sub(r',(\s*[}\]])', r'\1', json_str))
+        except ValueError:
+            return []
+    return [tc for tc in (AIService.normalize_test_case(tc, i) for i, tc in enumerate(test_cases)) if tc is not None]
+
+def make_output(cases: int) -> str:
+    test_cases = [
+        {
+            "title": f"Test case {i}",
+            "description": "Verify the story behaves as described, including edge cases [a, b].",
+            "preconditions": "User is logged in",
+            "steps": [{"step": f"Step {s}", "expectedResult": f"Result {s}"} for s in range(5)],
+            "priority": "High",
+            "type": "Functional",
+        }
+        for i in range(cases)
+    ]
+    return "Here are the test cases:\n" + json.dumps(test_cases, indent=2) + "\nLet me know if you need more."
+
+def timed(func, text: str, repeat: int = 3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(result)
+
+def main():
+    logging.disable(logging.CRITICAL)
+    scenarios = []
+    for cases in (100, 1000, 5000):
+        full = make_output(cases)
+        scenarios.append((f"{cases} cases, complete", full))
+        # Cut off mid-object, as with finish_reason == "length"
+        scenarios.append((f"{cases} cases, truncated", full[: int(len(full) * 0.9)]))
+        # Trailing commas force the tolerant path for every object
+        scenarios.append((f"{cases} cases, trailing ,", full.replace('"Functional"\n', '"Functional",\n')))
+
+    # Many array openings and no closing "}]": every start position makes the greedy regex backtrack to the end
+    for repeats in (2000, 8000):
+        scenarios.append((f"{repeats} unclosed [{{", '[{"step": "x"} ' * repeats))
+
+    print(f"{'scenario':<28}{'bytes':>10}{'legacy ms':>12}{'cases':>7}{'new ms':>10}{'cases':>7}")
+    for name, text in scenarios:
+        legacy_time, legacy_cases = timed(legacy_parse, text)
+        new_time, new_cases = timed(AIService.safe_parse_test_cases, text)
+        print(f"{name:<28}{len(text):>10}{legacy_time * 1000:>12.1f}{legacy_cases:>7}{new_time * 1000:>10.1f}{new_cases:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,15 @@ TEST_ALIASES = {
     "tmo": "tests/test_models.py",
     "tcr": "tests/test_crud.py",
     "tma": "tests/test_main.py",
-    "tsc": "tests/test_schemas.py"
+    "tsc": "tests/test_schemas.py",
+    "tht": "tests/test_http_transport.py",
+    "tai": "tests/test_ai_service.py",
+    "tjs": "tests/test_jira_service.py",
+    "tlj": "tests/test_llm_json.py",
+    "tjq": "tests/test_job_queue.py",
+    "tgs": "tests/test_generation_stats.py",
+    "tad": "tests/test_adf_text.py",
+    "tpm": "tests/test_pm_service.py"
 }
 
 os.makedirs(LOGS_DIR, exist_ok=True)
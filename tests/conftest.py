@@ -6,11 +6,27 @@ from sqlalchemy.orm import sessionmaker
 #from app.config import TEST_DB_URL
 from app.config import settings
 from app.database import Base
+from app.aio_ledger import aio_ledger
+from app.aio_outbox import aio_outbox
+from app.generation_cache import generation_cache
+from app.generation_stats import generation_stats
 
 # Create a test engine using the test database URL
 test_engine = create_engine(settings.TEST_DB_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
 
+@pytest.fixture(autouse=True)
+def shared_stores_on_test_db(monkeypatch):
+    """
+    Fixture pointing the shared generation cache, generation stats, AIO ledger and outbox
+    at the test database, so tests never create tables in or write to the app database.
+    """
+    for shared in (generation_cache, generation_stats, aio_ledger, aio_outbox):
+        monkeypatch.setattr(shared, "session_factory", TestingSessionLocal)
+        # Tables are dropped between test modules, so they are created again on first use
+        monkeypatch.setattr(shared, "_table_ready", False)
+    yield
+
 @pytest.fixture(scope="module")
 def test_db():
     """
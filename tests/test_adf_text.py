@@ -0,0 +1,94 @@
+# tests/test_adf_text.py
+
+from app.adf_text import FlattenMemo, flatten_adf
+from app.ai_service import AIService
+
+def text(value):
+    return {"type": "text", "text": value}
+
+def paragraph(value):
+    return {"type": "paragraph", "content": [text(value)]}
+
+def item(*content):
+    return {"type": "listItem", "content": list(content)}
+
+def test_flatten_adf_keeps_lists_tables_and_headings():
+    """
+    Test that headings, nested lists and table rows keep their boundaries.
+    """
+    adf = {"type": "doc", "content": [
+        {"type": "heading", "attrs": {"level": 2}, "content": [text("Acceptance criteria")]},
+        {"type": "bulletList", "content": [
+            item(paragraph("Valid email"), {"type": "orderedList", "content": [item(paragraph("Lower case")), item(paragraph("Trimmed"))]}),
+            item(paragraph("Valid password")),
+        ]},
+        {"type": "table", "content": [
+            {"type": "tableRow", "content": [{"type": "tableHeader", "content": [paragraph("Field")]}, {"type": "tableHeader", "content": [paragraph("Rule")]}]},
+            {"type": "tableRow", "content": [{"type": "tableCell", "content": [paragraph("Email")]}, {"type": "tableCell", "content": [{"type": "paragraph", "content": [text("must be "), text("unique")]}]}]},
+        ]},
+    ]}
+
+    assert flatten_adf(adf).splitlines() == [
+        "## Acceptance criteria",
+        "- Valid email",
+        "  1. Lower case",
+        "  2. Trimmed",
+        "- Valid password",
+        "| Field | Rule |",
+        "| Email | must be unique |",
+    ]
+
+def test_flatten_adf_handles_nesting_beyond_recursion_limit():
+    """
+    Test that deeply nested documents are flattened without hitting the recursion limit.
+    """
+    node = paragraph("leaf")
+    for _ in range(5000):
+        node = {"type": "bulletList", "content": [item(node)]}
+
+    assert flatten_adf({"type": "doc", "content": [node]}).endswith("- leaf")
+
+def test_malformed_heading_level_and_list_order_use_defaults():
+    """
+    Test that non-numeric heading levels and list start numbers do not break flattening.
+    """
+    adf = {"type": "doc", "content": [
+        {"type": "heading", "attrs": {"level": "x"}, "content": [text("Scope")]},
+        {"type": "heading", "attrs": {"level": 99}, "content": [text("Deep")]},
+        {"type": "orderedList", "attrs": {"order": None}, "content": [item(paragraph("First")), item(paragraph("Second"))]},
+    ]}
+
+    assert flatten_adf(adf).splitlines() == ["# Scope", "###### Deep", "1. First", "2. Second"]
+
+def test_story_descriptions_are_memoized_per_updated_timestamp():
+    """
+    Test that an issue is flattened once per `updated` timestamp.
+    """
+    memo = FlattenMemo()
+    service = AIService("https://example.atlassian.net", "qa@example.com", "token", "https://openrouter.ai", "key", flatten_memo=memo)
+    issue = {"key": "TG-1", "id": "1", "fields": {"summary": "Login", "updated": "2024-01-01T00:00:00.000+0000", "description": {"type": "doc", "content": [paragraph("Old")]}}}
+
+    assert service.story_from_jira_issue(issue)["description"] == "Old"
+    assert service.story_from_jira_issue(issue)["description"] == "Old"
+    assert memo.stats()["hits"] == 1
+
+    edited = {**issue, "fields": {**issue["fields"], "updated": "2024-01-02T00:00:00.000+0000", "description": {"type": "doc", "content": [paragraph("New")]}}}
+    assert service.story_from_jira_issue(edited)["description"] == "New"
+
+def test_story_sections_are_only_split_for_chunking(monkeypatch):
+    """
+    Test that building a story dictionary does not split the description into sections; chunking does, once per `updated` timestamp.
+    """
+    service = AIService("https://example.atlassian.net", "qa@example.com", "token", "https://openrouter.ai", "key", flatten_memo=FlattenMemo())
+    issue = {"key": "TG-1", "id": "1", "fields": {"summary": "Login", "updated": "2024-01-01T00:00:00.000+0000", "description": {"type": "doc", "content": [paragraph("One."), paragraph("Two.")]}}}
+    splits = []
+    split_adf_sections = AIService.split_adf_sections
+    monkeypatch.setattr(AIService, "split_adf_sections", staticmethod(lambda adf, max_chars=None: splits.append(adf) or split_adf_sections(adf, 4)))
+
+    story = service.story_from_jira_issue(issue)
+    assert "sections" not in story
+    assert splits == []
+
+    assert len(service._chunk_stories(story)) == 2
+    assert len(service._chunk_stories(service.story_from_jira_issue(issue))) == 2
+    assert len(splits) == 1
@@ -0,0 +1,713 @@
+# tests/test_ai_service.py
+
+import asyncio
+import json
+import threading
+import time
+from contextlib import asynccontextmanager
+import httpx
+from app import batch_generation
+from app.ai_service import AIService, AsyncAIService
+from app.http_transport import HTTPTransport
+from app.story_cache import story_cache
+from app.generation_cache import GenerationCache
+from app.generation_stats import GenerationStats
+from .conftest import TestingSessionLocal
+
+STORY = {
+    "key": "TG-1",
+    "id": "10001",
+    "fields": {
+        "summary": "User login",
+        "description": {"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "Users log in with email."}]}]},
+        "status": {"name": "To Do"}
+    }
+}
+
+AI_CONTENT = json.dumps([
+    {"title": "Login with valid credentials", "description": "Valid login", "steps": [{"step": "Enter email", "expectedResult": "Entered"}], "jiraRequirementIDs": ["10001"]}
+])
+
+class FakeTransport(HTTPTransport):
+    """
+    Transport returning canned Jira/OpenRouter responses after a short delay, without network access.
+    """
+    def __init__(self, delay: float = 0.0):
+        super().__init__()
+        self.delay = delay
+        self.calls = []
+
+    async def arequest(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        await asyncio.sleep(self.delay)
+        if "/rest/api/3/issue/" in url:
+            return httpx.Response(200, json=STORY)
+        return httpx.Response(200, json={"choices": [{"message": {"content": AI_CONTENT}, "finish_reason": "stop"}]})
+
+def make_async_service(transport, generation_cache=None, generation_stats=None):
+    story_cache.clear()
+    return AsyncAIService(
+        jira_domain="https://example.atlassian.net",
+        jira_email="qa@example.com",
+        jira_api_token="token",
+        openrouter_url="https://openrouter.ai/api/v1/chat/completions",
+        openrouter_api_key="key",
+        transport=transport,
+        generation_cache=generation_cache or GenerationCache(persistent=False),
+        generation_stats=generation_stats or GenerationStats(persistent=False)
+    )
+
+def test_async_generate_and_normalize_test_cases():
+    """
+    Test that the async service fetches the story, calls OpenRouter and normalizes the result.
+    """
+    transport = FakeTransport()
+    service = make_async_service(transport)
+
+    test_cases = asyncio.run(service.generate_and_normalize_test_cases("TG-1"))
+
+    assert len(test_cases) == 1
+    assert test_cases[0]["title"] == "Login with valid credentials"
+    assert test_cases[0]["steps"][0]["stepType"] == "TEXT"
+    assert [method for method, _ in transport.calls] == ["GET", "POST"]
+
+def test_async_generations_run_concurrently():
+    """
+    Test that concurrent generations overlap instead of running one after another.
+    """
+    transport = FakeTransport(delay=0.2)
+    service = make_async_service(transport)
+
+    async def run_many():
+        return await asyncio.gather(*(service.generate_and_normalize_test_cases(f"TG-{i}") for i in range(10)))
+
+    started = time.perf_counter()
+    results = asyncio.run(run_many())
+    elapsed = time.perf_counter() - started
+
+    assert all(len(cases) == 1 for cases in results)
+    # 10 generations x 2 calls x 0.2 s would take 4 s serially
+    assert elapsed < 1.5
+
+def test_generation_cache_skips_repeated_llm_calls():
+    """
+    Test that regenerating an unchanged story is served from the cache, and that the bypass flag forces a new call.
+    """
+    transport = FakeTransport()
+    cache = GenerationCache(persistent=False)
+    service = make_async_service(transport, cache)
+
+    first = asyncio.run(service.generate_and_normalize_test_cases("TG-1"))
+    second = asyncio.run(service.generate_and_normalize_test_cases("TG-1"))
+    assert second == first
+    assert [method for method, _ in transport.calls].count("POST") == 1
+
+    asyncio.run(service.generate_and_normalize_test_cases("TG-1", use_cache=False))
+    assert [method for method, _ in transport.calls].count("POST") == 2
+
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+
+def test_generation_cache_persistent_tier_and_eviction(test_db):
+    """
+    Test that the SQLite tier serves entries to a fresh cache instance and evicts beyond its size budget.
+    """
+    writer = GenerationCache(persistent=True, session_factory=TestingSessionLocal, max_bytes=100)
+    first_key = GenerationCache.make_key("prompt 1", "model", 0.7, 666)
+    second_key = GenerationCache.make_key("prompt 2", "model", 0.7, 666)
+    writer.put(first_key, "model", "a" * 60)
+
+    reader = GenerationCache(persistent=True, session_factory=TestingSessionLocal, max_bytes=100)
+    assert reader.get(first_key) == "a" * 60
+    assert reader.stats()["persistent_hits"] == 1
+
+    writer.put(second_key, "model", "b" * 60)
+    assert writer.stats()["evictions"] == 1
+    assert GenerationCache(persistent=True, session_factory=TestingSessionLocal).get(first_key) is None
+
+class ThreadRecordingCache(GenerationCache):
+    """
+    Persistent-tier stand-in recording the thread of every lookup and store.
+    """
+    def __init__(self):
+        super().__init__(persistent=False)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return super().get(key)
+
+    def put(self, key, model, content):
+        self.threads.append(threading.get_ident())
+        super().put(key, model, content)
+
+def test_async_generation_cache_io_runs_off_the_event_loop():
+    """
+    Test that the async service does its cache lookups and stores outside the event loop thread.
+    """
+    cache = ThreadRecordingCache()
+    service = make_async_service(FakeTransport(), cache)
+
+    asyncio.run(service.generate_and_normalize_test_cases("TG-1"))
+    asyncio.run(service.generate_and_normalize_test_cases("TG-1"))
+
+    assert len(cache.threads) == 3
+    assert threading.get_ident() not in cache.threads
+
+class FakeStreamResponse:
+    status_code = 200
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    async def aiter_lines(self):
+        for line in self.lines:
+            await asyncio.sleep(0)
+            yield line
+
+class StreamingTransport(FakeTransport):
+    """
+    Transport streaming AI_CONTENT as OpenRouter server-sent events, a few characters per event.
+    """
+    finish_reason = "stop"
+
+    @asynccontextmanager
+    async def astream(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        assert kwargs["json"]["stream"] is True
+        lines = [": OPENROUTER PROCESSING"]
+        for start in range(0, len(AI_CONTENT), 4):
+            lines.append("data: " + json.dumps({"choices": [{"delta": {"content": AI_CONTENT[start:start + 4]}, "finish_reason": None}]}))
+        lines.append("data: " + json.dumps({"choices": [{"delta": {}, "finish_reason": self.finish_reason}]}))
+        lines.append("data: [DONE]")
+        yield FakeStreamResponse(lines)
+
+def test_stream_test_cases_emits_cases_incrementally():
+    """
+    Test that the streaming generation emits normalized test cases followed by a done event.
+    """
+    service = make_async_service(StreamingTransport())
+
+    async def collect():
+        return [event async for event in service.stream_test_cases("TG-1")]
+
+    events = asyncio.run(collect())
+
+    assert [event["event"] for event in events] == ["test_case", "done"]
+    assert events[0]["test_case"]["title"] == "Login with valid credentials"
+    assert events[0]["test_case"]["status"]["name"] == "Published"
+    assert events[1]["total"] == 1
+    assert events[1]["finish_reason"] == "stop"
+    assert events[1]["truncated"] is False
+
+def test_truncated_stream_is_not_cached():
+    """
+    Test that a stream cut off by max_tokens is not cached, so a later regular generation is continued instead of served the cut-off set.
+    """
+    cache = GenerationCache(persistent=False)
+    transport = StreamingTransport()
+    transport.finish_reason = "length"
+    service = make_async_service(transport, generation_cache=cache)
+
+    async def collect():
+        return [event async for event in service.stream_test_cases("TG-1")]
+
+    events = asyncio.run(collect())
+
+    assert events[-1]["truncated"] is True
+    assert cache.stats()["stores"] == 0
+
+class ThreadRecordingStats(GenerationStats):
+    """
+    In-memory generation history recording the thread of every sample.
+    """
+    def __init__(self):
+        super().__init__(persistent=False)
+        self.threads = []
+
+    def record(self, *args, **kwargs):
+        self.threads.append(threading.get_ident())
+        super().record(*args, **kwargs)
+
+def test_streamed_generations_are_recorded_off_the_event_loop():
+    """
+    Test that streamed and regular generations both feed the auto-mode history, outside the event loop thread.
+    """
+    stats = ThreadRecordingStats()
+    service = make_async_service(StreamingTransport(), generation_stats=stats)
+
+    async def collect():
+        return [event async for event in service.stream_test_cases("TG-1", use_cache=False)]
+
+    asyncio.run(collect())
+    asyncio.run(make_async_service(FakeTransport(), generation_stats=stats).generate_and_normalize_test_cases("TG-1", use_cache=False))
+
+    assert stats.summary()[0]["generations"] == 2
+    assert stats.summary()[0]["failure_rate"] == 0.0
+    assert len(stats.threads) == 2 and threading.get_ident() not in stats.threads
+
+def test_safe_parse_test_cases_keeps_complete_cases_of_truncated_response():
+    """
+    Test that a response cut off by max_tokens still yields its complete test cases.
+    """
+    content = 'Here you go:\n[{"title": "First", "steps": [{"step": "Open", "expectedResult": "Opened"}]},\n {"title": "Second", "steps": [{"step": "Cli'
+    test_cases = AIService.safe_parse_test_cases(content)
+    assert [tc["title"] for tc in test_cases] == ["First"]
+
+class TruncatingTransport(FakeTransport):
+    """
+    Transport whose first completion is cut off by max_tokens and whose continuation returns the rest.
+    """
+    def __init__(self, first_content: str = '[{"title": "First", "steps": []}, {"title": "Sec'):
+        super().__init__()
+        self.first_content = first_content
+        self.prompts = []
+
+    async def arequest(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        if "/rest/api/3/issue/" in url:
+            return httpx.Response(200, json=STORY)
+        self.prompts.append(kwargs["json"]["messages"][-1]["content"])
+        if len(self.prompts) == 1:
+            content = self.first_content
+            return httpx.Response(200, json={"choices": [{"message": {"content": content}, "finish_reason": "length"}], "usage": {"completion_tokens": 666}})
+        content = json.dumps([{"title": "first", "steps": []}, {"title": "Second", "steps": []}])
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}, "finish_reason": "stop"}], "usage": {"completion_tokens": 120}})
+
+def test_truncated_generation_is_continued(monkeypatch):
+    """
+    Test that a response cut off by max_tokens is continued, deduplicated by title and cached merged.
+    """
+    transport = TruncatingTransport()
+    service = make_async_service(transport)
+
+    test_cases = asyncio.run(service.generate_and_normalize_test_cases("TG-1"))
+    assert [tc["title"] for tc in test_cases] == ["First", "Second"]
+    assert len(transport.prompts) == 2
+    assert "- First" in transport.prompts[1]
+
+    # The cached result contains the continuation as well
+    assert asyncio.run(service.generate_and_normalize_test_cases("TG-1")) == test_cases
+    assert len(transport.prompts) == 2
+
+    # No continuation when the token budget does not allow another request
+    monkeypatch.setattr("app.ai_service.settings.GENERATION_TOKEN_BUDGET", 1000)
+    transport = TruncatingTransport()
+    service = make_async_service(transport)
+    test_cases = asyncio.run(service.generate_and_normalize_test_cases("TG-1"))
+    assert [tc["title"] for tc in test_cases] == ["First"]
+    assert len(transport.prompts) == 1
+
+LONG_DESCRIPTION = {"type": "doc", "content": [
+    {"type": "paragraph", "content": [{"type": "text", "text": "Users manage their profile."}]},
+    {"type": "heading", "attrs": {"level": 2}, "content": [{"type": "text", "text": "Acceptance criteria"}]},
+    {"type": "bulletList", "content": [
+        {"type": "listItem", "content": [{"type": "paragraph", "content": [{"type": "text", "text": f"Criterion {i} " + "x" * 40}]}]}
+        for i in range(6)
+    ]},
+]}
+
+def test_truncated_generation_without_complete_cases_is_continued():
+    """
+    Test that a response cut off before its first complete test case is continued instead of failing.
+    """
+    transport = TruncatingTransport(first_content='[{"title": "First", "steps": [{"step": "Op')
+    service = make_async_service(transport)
+
+    result = asyncio.run(service.process_jira_story_and_send_to_openrouter("TG-1"))
+
+    assert "error" not in result
+    assert [tc["title"] for tc in result["test_cases"]] == ["first", "Second"]
+    assert result["continuations"] == 1
+    assert "before the first test case was complete" in transport.prompts[1]
+
+class ChunkTransport(FakeTransport):
+    """
+    Transport answering each chunk prompt with a test case named after its part, plus one shared duplicate.
+    """
+    async def arequest(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        await asyncio.sleep(self.delay)
+        prompt = kwargs["json"]["messages"][-1]["content"]
+        part = prompt.split("(Part ", 1)[1].split(" ", 1)[0]
+        content = json.dumps([{"title": f"Part {part}", "steps": []}, {"title": "Shared", "steps": []}])
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}, "finish_reason": "stop"}]})
+
+def test_split_adf_sections_keeps_criteria_whole():
+    """
+    Test that headings start sections and list items are packed without being split.
+    """
+    chunks = AIService.split_adf_sections(LONG_DESCRIPTION, max_chars=120)
+    assert chunks[0] == "Users manage their profile."
+    assert all(chunk.startswith("Acceptance criteria\n") for chunk in chunks[1:])
+    assert sum(chunk.count("Criterion") for chunk in chunks) == 6
+    assert len(chunks) == 4
+
+def test_chunked_generation_runs_chunks_concurrently(monkeypatch):
+    """
+    Test that chunks are generated in parallel and merged without duplicate titles.
+    """
+    monkeypatch.setattr("app.ai_service.settings.GENERATION_CHUNK_MAX_CHARS", 120)
+    transport = ChunkTransport(delay=0.2)
+    service = make_async_service(transport)
+    story = service.story_from_jira_issue({**STORY, "fields": {**STORY["fields"], "description": LONG_DESCRIPTION}})
+
+    started = time.perf_counter()
+    test_cases = asyncio.run(service.generate_chunked_test_cases("TG-1", story=story))
+    elapsed = time.perf_counter() - started
+
+    assert [tc["title"] for tc in test_cases] == ["Part 1", "Shared", "Part 2", "Part 3", "Part 4"]
+    assert len(transport.calls) == 4
+    assert elapsed < 0.6
+
+class BatchTransport(FakeTransport):
+    """
+    Transport serving a JQL search of five stories and failing the generation of TG-2.
+    """
+    def __init__(self, delay: float = 0.0):
+        super().__init__(delay)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.jqls = []
+
+    async def arequest(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        if "/rest/api/3/search" in url:
+            self.jqls.append(kwargs["params"]["jql"])
+            issues = [{**STORY, "key": f"TG-{i}", "id": str(10000 + i)} for i in range(1, 6)]
+            return httpx.Response(200, json={"startAt": 0, "maxResults": 100, "total": len(issues), "issues": issues})
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        if "Jira Key: TG-2\n" in kwargs["json"]["messages"][-1]["content"]:
+            return httpx.Response(500, text="upstream error")
+        return httpx.Response(200, json={"choices": [{"message": {"content": AI_CONTENT}, "finish_reason": "stop"}]})
+
+def test_batch_generation_reports_failures_and_limits_concurrency():
+    """
+    Test that a batch generates every story with bounded concurrency and reports a failing story without aborting.
+    """
+    transport = BatchTransport(delay=0.05)
+    service = make_async_service(transport)
+
+    summary = asyncio.run(batch_generation.generate_batch(service, "TG", jql="sprint in openSprints()", openrouter_concurrency=2))
+
+    assert [result["key"] for result in summary["results"]] == [f"TG-{i}" for i in range(1, 6)]
+    assert summary["succeeded"] == 4
+    assert summary["failed"] == ["TG-2"]
+    assert summary["results"][1]["error"] == "upstream error"
+    assert summary["total_generated"] == 4
+    assert transport.max_in_flight == 2
+
+def test_batch_generation_with_explicit_keys_keeps_input_order():
+    """
+    Test that explicit keys are reported in input order, with keys of other projects rejected before the Jira search.
+    """
+    transport = BatchTransport()
+    service = make_async_service(transport)
+
+    summary = asyncio.run(batch_generation.generate_batch(service, "TG", issue_keys=["TG-2", "TG-9", "OTHER-1", "TG-1"]))
+
+    assert [result["key"] for result in summary["results"]] == ["TG-2", "TG-9", "OTHER-1", "TG-1"]
+    assert [result["status"] for result in summary["results"]] == ["failed", "failed", "failed", "ok"]
+    assert [result.get("error") for result in summary["results"]] == ["upstream error", "Issue not found", "Issue is not in project TG", None]
+    assert len(transport.jqls) == 1
+    assert "OTHER-1" not in transport.jqls[0]
+
+def test_identical_concurrent_generations_are_coalesced():
+    """
+    Test that concurrent requests for the same story and settings share one Jira fetch and LLM call.
+    """
+    transport = FakeTransport(delay=0.1)
+    service = make_async_service(transport)
+
+    async def run_many():
+        same = [service.process_jira_story_and_send_to_openrouter("TG-1", use_cache=False) for _ in range(5)]
+        other = [service.process_jira_story_and_send_to_openrouter("TG-1", max_tokens=1000, use_cache=False)]
+        return await asyncio.gather(*same, *other)
+
+    results = asyncio.run(run_many())
+
+    assert all(result["test_cases"] == results[0]["test_cases"] for result in results)
+    assert sum(1 for result in results if result.get("coalesced")) == 4
+    assert [method for method, _ in transport.calls].count("POST") == 2
+    stats = service.coalescing_stats()
+    assert stats["flights"] == 2
+    assert stats["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+def test_cache_bypass_does_not_join_a_cached_generation():
+    """
+    Test that a request bypassing the cache never receives the result of a request that may be served from it.
+    """
+    transport = FakeTransport(delay=0.1)
+    service = make_async_service(transport)
+
+    async def run_both():
+        return await asyncio.gather(
+            service.process_jira_story_and_send_to_openrouter("TG-1"),
+            service.process_jira_story_and_send_to_openrouter("TG-1", use_cache=False),
+        )
+
+    results = asyncio.run(run_both())
+
+    assert not any(result.get("coalesced") for result in results)
+    assert [method for method, _ in transport.calls].count("POST") == 2
+
+class SlowResultService(AIService):
+    """
+    AIService whose generation takes a moment, so concurrent requests overlap.
+    """
+    def _generate_story_result(self, *args, **kwargs):
+        time.sleep(0.1)
+        return {"test_cases": [{"title": "Shared"}], "raw_response": "[]"}
+
+def test_sync_leader_and_followers_get_private_copies():
+    """
+    Test that the request leading a coalesced generation cannot modify the result handed to the others.
+    """
+    service = SlowResultService("https://example.atlassian.net", "qa@example.com", "token", "https://openrouter.ai", "key", generation_cache=GenerationCache(persistent=False))
+    results = []
+
+    def generate():
+        result = service.process_jira_story_and_send_to_openrouter("TG-1")
+        if not result.get("coalesced"):
+            result["test_cases"][0]["title"] = "Changed by the leader"
+        results.append(result)
+
+    threads = [threading.Thread(target=generate) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert service.coalescing_stats()["coalesced"] == 2
+    assert sorted(result["test_cases"][0]["title"] for result in results) == ["Changed by the leader", "Shared", "Shared"]
+
+class RaceTransport(FakeTransport):
+    """
+    Transport with per-model latency; the "broken" model answers fast with unusable output.
+    """
+    LATENCY = {"slow": 2.0, "fast": 0.05, "broken": 0.01}
+
+    def __init__(self):
+        super().__init__()
+        self.started = []
+        self.cancelled = []
+
+    async def arequest(self, method, url, **kwargs):
+        model = kwargs["json"]["model"]
+        self.started.append(model)
+        try:
+            await asyncio.sleep(self.LATENCY[model])
+        except asyncio.CancelledError:
+            self.cancelled.append(model)
+            raise
+        content = "Sorry, I cannot help with that." if model == "broken" else AI_CONTENT
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}, "finish_reason": "stop"}]})
+
+def test_race_models_first_usable_answer_wins():
+    """
+    Test that the first parseable answer wins, unusable answers are skipped and slower requests are cancelled.
+    """
+    transport = RaceTransport()
+    service = make_async_service(transport)
+    story = service.story_from_jira_issue(STORY)
+
+    started = time.perf_counter()
+    result = asyncio.run(service.race_models("TG-1", models=["broken", "slow", "fast"], story=story, stagger=0))
+    elapsed = time.perf_counter() - started
+
+    assert result["model"] == "fast"
+    assert len(result["test_cases"]) == 1
+    assert {outcome["model"]: outcome["status"] for outcome in result["race"]} == {"broken": "failed", "fast": "won", "slow": "cancelled"}
+    assert transport.cancelled == ["slow"]
+    assert elapsed < 1.0
+
+def test_race_models_staggers_hedged_requests():
+    """
+    Test that with a stagger delay the next model only starts when the previous one has not answered in time.
+    """
+    transport = RaceTransport()
+    service = make_async_service(transport)
+    story = service.story_from_jira_issue(STORY)
+
+    result = asyncio.run(service.race_models("TG-1", models=["fast", "slow"], story=story, stagger=0.5))
+    assert result["model"] == "fast"
+    assert transport.started == ["fast"]
+    assert result["race"][-1] == {"model": "slow", "status": "not_started"}
+
+    result = asyncio.run(service.race_models("TG-1", models=["slow", "fast"], story=story, stagger=0.1, use_cache=False))
+    assert result["model"] == "fast"
+    assert transport.started == ["fast", "slow", "fast"]
+    assert 100 <= result["latency_ms"] < 1000
+
+class PackTransport(FakeTransport):
+    """
+    Transport answering packed prompts for every story but the last one, and single-story prompts normally.
+    """
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    async def arequest(self, method, url, **kwargs):
+        prompt = kwargs["json"]["messages"][-1]["content"]
+        self.prompts.append(prompt)
+        if "storyKey" in prompt:
+            keys = [line.split(": ", 1)[1] for line in prompt.splitlines() if line.startswith("Jira Key: ")]
+            content = json.dumps([{"storyKey": key, "title": f"{key} case", "steps": []} for key in keys[:-1]])
+        else:
+            content = AI_CONTENT
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}, "finish_reason": "stop"}]})
+
+def test_packed_generation_splits_by_story_and_falls_back():
+    """
+    Test that small stories share one prompt, results are split per story and missing stories are generated alone.
+    """
+    transport = PackTransport()
+    service = make_async_service(transport)
+    stories = [{"key": f"TG-{i}", "id": str(10000 + i), "summary": f"Story {i}", "description": "Short."} for i in range(1, 4)]
+    stories.append({"key": "TG-9", "id": "10009", "summary": "Large", "description": "x" * 2000})
+
+    results = asyncio.run(service.generate_packed_test_cases(stories))
+
+    assert [tc["title"] for tc in results["TG-1"]["test_cases"]] == ["TG-1 case"]
+    assert results["TG-2"]["packed"] is True
+    assert results["TG-3"]["packed"] is False
+    assert results["TG-3"]["test_cases"][0]["title"] == "Login with valid credentials"
+    assert results["TG-9"]["packed"] is False
+    assert sum("storyKey" in prompt for prompt in transport.prompts) == 1
+    assert len(transport.prompts) == 3
+
+def test_truncated_pack_regenerates_the_cut_off_story():
+    """
+    Test that the story whose test cases a truncated pack response cut off is generated on its own,
+    and that matched cases reference only their story's requirement ID.
+    """
+    service = make_async_service(FakeTransport())
+    stories = [{"key": f"TG-{i}", "id": str(10000 + i), "summary": f"Story {i}", "description": "Short."} for i in range(1, 4)]
+    content = (
+        '[{"storyKey": "TG-1", "title": "One", "steps": [], "jiraRequirementIDs": ["10001", "10002"]},'
+        ' {"storyKey": "TG-2", "title": "Two", "steps": []},'
+        ' {"storyKey": "TG-2", "title": "Two again", "st'
+    )
+
+    results, missing = service._packed_results(stories, content, "key", "model", True, 1.0)
+
+    assert list(results) == ["TG-1"]
+    assert results["TG-1"]["test_cases"][0]["jiraRequirementIDs"] == ["10001"]
+    assert [story["key"] for story in missing] == ["TG-2", "TG-3"]
+
+class StructuredTransport(FakeTransport):
+    """
+    Transport answering OpenRouter calls with queued message contents and recording the request bodies.
+    """
+    def __init__(self, contents):
+        super().__init__()
+        self.contents = list(contents)
+        self.bodies = []
+
+    async def arequest(self, method, url, **kwargs):
+        if "/rest/api/3/issue/" in url:
+            return await super().arequest(method, url, **kwargs)
+        self.bodies.append(kwargs["json"])
+        return httpx.Response(200, json={"choices": [{"message": {"content": self.contents.pop(0)}, "finish_reason": "stop"}]})
+
+def test_structured_output_is_validated_and_parse_failures_tracked():
+    """
+    Test that structured mode sends the test case schema, validates the answer and tracks parse failures per model.
+    """
+    valid = json.dumps({"test_cases": [{"title": "Valid login", "description": "", "precondition": "", "steps": [{"step": "Log in", "data": "", "expectedResult": "Logged in", "stepType": "TEXT"}], "jiraRequirementIDs": ["10001"]}]})
+    transport = StructuredTransport([valid, AI_CONTENT, "Sorry, I cannot help with that."])
+    service = make_async_service(transport)
+
+    async def generate():
+        return [await service.generate_and_normalize_test_cases("TG-1", "m", use_cache=False, structured=True) for _ in range(3)]
+
+    validated, repaired, failed = asyncio.run(generate())
+
+    response_format = transport.bodies[0]["response_format"]
+    assert response_format["json_schema"]["strict"] is True
+    schema = response_format["json_schema"]["schema"]
+    assert schema["$defs"]["GeneratedAIOTestCase"]["additionalProperties"] is False
+    assert "title" in schema["$defs"]["GeneratedAIOTestCase"]["required"]
+    assert validated[0]["title"] == "Valid login"
+    assert repaired[0]["title"] == "Login with valid credentials"
+    assert failed == []
+    assert service.parse_stats() == [{"model": "m", "mode": "structured", "responses": 3, "failures": 1, "repaired": 1, "failure_rate": 0.3333}]
+
+def test_structured_and_free_text_generations_are_cached_apart():
+    """
+    Test that a structured request neither reuses a cached free-text generation nor joins one in flight.
+    """
+    valid = json.dumps({"test_cases": [{"title": "Valid login", "description": "", "precondition": "", "steps": [], "jiraRequirementIDs": ["10001"]}]})
+    transport = StructuredTransport([AI_CONTENT, valid])
+    service = make_async_service(transport)
+
+    async def generate_both():
+        return await asyncio.gather(
+            service.process_jira_story_and_send_to_openrouter("TG-1", "m"),
+            service.process_jira_story_and_send_to_openrouter("TG-1", "m", structured=True),
+        )
+
+    free_text, structured = asyncio.run(generate_both())
+
+    assert len(transport.bodies) == 2
+    assert "coalesced" not in structured and "cached" not in structured
+    assert "response_format" in transport.bodies[1]
+    assert GenerationCache.make_key("p", "m", 0.7, 666) != GenerationCache.make_key("p", "m", 0.7, 666, structured=True)
+
+def test_static_prefix_is_sent_as_cacheable_system_message():
+    """
+    Test that the fixed instructions are sent as a system prefix, with a cache breakpoint for providers that need one.
+    """
+    transport = StructuredTransport([AI_CONTENT, AI_CONTENT])
+    service = make_async_service(transport)
+
+    async def generate():
+        await service.generate_and_normalize_test_cases("TG-1", "anthropic/claude-3-haiku", use_cache=False)
+        await service.generate_and_normalize_test_cases("TG-1", "openai/gpt-4o-mini", use_cache=False)
+
+    asyncio.run(generate())
+
+    anthropic_system, anthropic_user = transport.bodies[0]["messages"]
+    assert anthropic_system["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert anthropic_system["content"][0]["text"] == transport.bodies[1]["messages"][0]["content"]
+    assert anthropic_user["content"].startswith("Jira Key: TG-1")
+    assert "Example" not in anthropic_user["content"]
+
+def test_changed_system_prompt_misses_the_generation_cache(monkeypatch):
+    """
+    Test that editing the system instructions invalidates cached generations of unchanged stories.
+    """
+    transport = FakeTransport()
+    service = make_async_service(transport)
+
+    asyncio.run(service.generate_and_normalize_test_cases("TG-1"))
+    asyncio.run(service.generate_and_normalize_test_cases("TG-1"))
+    assert [method for method, _ in transport.calls].count("POST") == 1
+
+    monkeypatch.setattr("app.ai_service.TEST_CASE_SYSTEM_PROMPT", "You write terse test cases.")
+    asyncio.run(service.generate_and_normalize_test_cases("TG-1"))
+    assert [method for method, _ in transport.calls].count("POST") == 2
+
+def test_auto_mode_picks_fastest_model_and_learned_max_tokens():
+    """
+    Test that model="auto" uses the recorded history and that each generation is recorded.
+    """
+    stats = GenerationStats(persistent=False)
+    for _ in range(5):
+        stats.record("TG-9", "slow", 30, 666, 300, 3, 900.0, False)
+        stats.record("TG-9", "fast", 30, 666, 300, 3, 200.0, False)
+    transport = StructuredTransport([AI_CONTENT])
+    service = make_async_service(transport, generation_stats=stats)
+
+    test_cases = asyncio.run(service.generate_and_normalize_test_cases("TG-1", "auto", use_cache=False))
+
+    assert len(test_cases) == 1
+    assert transport.bodies[0]["model"] == "fast"
+    assert transport.bodies[0]["max_tokens"] == 345
+    recorded = [row for row in stats.summary() if row["model"] == "fast"][0]
+    assert recorded["generations"] == 6
@@ -1,6 +1,7 @@
 # tests/test_crud.py
 
 import pytest
+from datetime import datetime
 from app import crud, schemas
 from sqlalchemy import inspect
 from app.models import Case
@@ -109,4 +110,31 @@ def test_delete_case(db_session):
 
     # Verify the case is no longer in the database
     retrieved_case = crud.get_case_by_id(db_session, created_case.id)
-    assert retrieved_case is None, "Case should no longer exist in the database"
\ No newline at end of file
+    assert retrieved_case is None, "Case should no longer exist in the database"
+
+def test_upsert_jira_stories(test_db, db_session):
+    """
+    Test that mirrored stories are inserted, skipped when unchanged and updated when changed.
+    """
+    synced_at = datetime(2025, 1, 1, 12, 0, 0)
+    story = schemas.JiraStoryMirrorCreate(
+        story_key="TG-1",
+        jira_id="10001",
+        project_key="TG",
+        issue_type="Story",
+        summary="Login",
+        description="Users log in",
+        status="To Do",
+        updated="2025-01-01T10:00:00.000+0000"
+    )
+
+    assert crud.upsert_jira_stories(db_session, [story], synced_at) == 1
+    assert crud.upsert_jira_stories(db_session, [story], synced_at) == 0
+
+    changed = story.model_copy(update={"summary": "Login v2", "updated": "2025-01-02T10:00:00.000+0000"})
+    assert crud.upsert_jira_stories(db_session, [changed], synced_at) == 1
+
+    stories = crud.get_jira_stories(db_session, "TG", "Story")
+    assert len(stories) == 1
+    assert stories[0].summary == "Login v2"
+    assert crud.get_jira_story(db_session, "TG-1").jira_id == "10001"
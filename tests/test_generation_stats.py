@@ -0,0 +1,33 @@
+# tests/test_generation_stats.py
+
+from app.generation_stats import GenerationStats
+from .conftest import TestingSessionLocal
+
+def test_select_meets_truncation_target_before_latency():
+    """
+    Test that a fast model truncating even at the largest limit loses against a slower model that fits.
+    """
+    stats = GenerationStats(persistent=False)
+    for _ in range(10):
+        stats.record("TG-1", "fast", 1000, 4000, 4000, 2, 100.0, True)
+        stats.record("TG-1", "steady", 1000, 1000, 800, 6, 400.0, False)
+
+    choice = stats.select(1200)
+    assert choice["model"] == "steady"
+    assert choice["max_tokens"] == 920
+    assert choice["reason"] == "history"
+
+    # Stories of a very different size have no history yet
+    assert stats.select(20000, default_model="default")["model"] == "default"
+
+def test_history_survives_restart(test_db, db_session):
+    """
+    Test that recorded generations are stored and loaded by a new instance.
+    """
+    stats = GenerationStats(session_factory=TestingSessionLocal)
+    for _ in range(5):
+        stats.record("TG-1", "m", 300, 666, 500, 4, 250.0, False)
+
+    reloaded = GenerationStats(session_factory=TestingSessionLocal)
+    assert reloaded.summary()[0]["generations"] == 5
+    assert reloaded.select(300)["model"] == "m"
@@ -0,0 +1,70 @@
+# tests/test_http_transport.py
+
+import asyncio
+from app.http_transport import HostRateLimiter, HTTPTransport
+
+def test_session_reused_per_host():
+    """
+    Test that calls to the same host share one pooled session and other hosts get their own.
+    """
+    transport = HTTPTransport(pool_maxsize=5)
+    first = transport.session_for("https://example.atlassian.net/rest/api/3/search")
+    second = transport.session_for("https://example.atlassian.net/rest/api/3/issue/TG-1")
+    other = transport.session_for("https://openrouter.ai/api/v1/chat/completions")
+
+    assert first is second, "Requests to the same host should reuse the pooled session"
+    assert first is not other, "Different hosts should use separate sessions"
+    assert first.get_adapter("https://example.atlassian.net")._pool_maxsize == 5
+    transport.close()
+
+def test_stats_and_close():
+    """
+    Test that pool statistics are reported per host and cleared on close.
+    """
+    transport = HTTPTransport(pool_connections=2, pool_maxsize=4, timeout=5)
+    transport.session_for("https://example.atlassian.net/rest/api/3/search")
+
+    stats = transport.stats()
+    assert stats["pool_connections"] == 2
+    assert stats["pool_maxsize"] == 4
+    assert stats["timeout"] == 5
+    host = stats["hosts"]["https://example.atlassian.net"]
+    assert host["requests"] == 0
+    assert host["connections_opened"] == 0
+
+    transport.close()
+    assert transport.stats()["hosts"] == {}
+
+def test_rate_limiter_spaces_requests_per_host():
+    """
+    Test that requests beyond the burst are spaced by the rate, independently per host.
+    """
+    limiter = HostRateLimiter(rate=20, burst=2)
+    waits = [limiter._reserve("https://aio.example.com/project/TG/testcase") for _ in range(5)]
+    other = limiter._reserve("https://example.atlassian.net/rest/api/3/search")
+
+    assert waits[:2] == [0.0, 0.0]
+    assert [round(wait, 2) for wait in waits[2:]] == [0.05, 0.1, 0.15]
+    assert other == 0.0
+    assert HostRateLimiter(rate=0).acquire("https://aio.example.com") == 0.0
+
+def test_async_client_replaced_per_event_loop_is_closed():
+    """
+    Test that an async client left behind by a finished event loop is closed by aclose.
+    """
+    transport = HTTPTransport()
+
+    async def client():
+        return transport.async_client_for("https://openrouter.ai/api/v1/chat/completions")
+
+    first = asyncio.run(client())
+    second = asyncio.run(client())
+    assert first is not second
+    assert not first.is_closed
+
+    async def close():
+        await transport.aclose()
+
+    asyncio.run(close())
+    assert first.is_closed
+    assert second.is_closed
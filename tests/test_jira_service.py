@@ -0,0 +1,280 @@
+# tests/test_jira_service.py
+
+import asyncio
+import httpx
+from app.jira_service import JiraService, AsyncJiraService
+from app.http_transport import HTTPTransport
+from app.story_cache import StoryCache
+from app import jira_mirror
+
+def make_issue(number: int) -> dict:
+    return {
+        "key": f"TG-{number}",
+        "id": str(10000 + number),
+        "fields": {"summary": f"Story {number}", "description": None, "status": {"name": "To Do"}}
+    }
+
+class PagedJiraTransport(HTTPTransport):
+    """
+    Transport serving a fake Jira project of `total` issues through /search pagination.
+    """
+    def __init__(self, total: int):
+        super().__init__()
+        self.issues = [make_issue(i) for i in range(1, total + 1)]
+        self.requested_pages = []
+
+    def _search(self, params):
+        start_at, max_results = params["startAt"], params["maxResults"]
+        self.requested_pages.append(start_at)
+        page = self.issues[start_at:start_at + max_results]
+        return httpx.Response(200, json={"startAt": start_at, "maxResults": max_results, "total": len(self.issues), "issues": page})
+
+    def request(self, method, url, **kwargs):
+        return self._search(kwargs["params"])
+
+    async def arequest(self, method, url, **kwargs):
+        return self._search(kwargs["params"])
+
+def test_get_all_user_stories_walks_all_pages():
+    """
+    Test that every page is fetched instead of silently truncating to the first one.
+    """
+    transport = PagedJiraTransport(total=250)
+    service = JiraService("https://example.atlassian.net", "qa@example.com", "token", transport=transport)
+
+    stories = service.get_all_user_stories("TG", "Story")
+
+    assert len(stories) == 250
+    assert stories[0]["key"] == "TG-1"
+    assert stories[-1]["key"] == "TG-250"
+    assert transport.requested_pages == [0, 100, 200]
+
+def test_iter_user_stories_is_lazy():
+    """
+    Test that consuming only the first stories does not fetch the whole project.
+    """
+    transport = PagedJiraTransport(total=1000)
+    service = JiraService("https://example.atlassian.net", "qa@example.com", "token", transport=transport)
+
+    iterator = service.iter_user_stories("TG", "Story", page_size=50)
+    first = [next(iterator) for _ in range(10)]
+    iterator.close()
+
+    assert first[-1]["key"] == "TG-10"
+    # Current page plus at most the prefetched next page
+    assert len(transport.requested_pages) <= 2
+
+def test_async_iter_user_stories_walks_all_pages():
+    """
+    Test that the async variant walks every page in order.
+    """
+    transport = PagedJiraTransport(total=120)
+    service = AsyncJiraService("https://example.atlassian.net", "qa@example.com", "token", transport=transport)
+
+    stories = asyncio.run(service.get_all_user_stories("TG", "Story"))
+
+    assert [story["key"] for story in stories] == [f"TG-{i}" for i in range(1, 121)]
+    assert transport.requested_pages == [0, 100]
+
+class FailingPageTransport(PagedJiraTransport):
+    """
+    Paged transport answering 500 for the page starting at `failing_start`.
+    """
+    def __init__(self, total: int, failing_start: int):
+        super().__init__(total)
+        self.failing_start = failing_start
+
+    def _search(self, params):
+        if params["startAt"] == self.failing_start:
+            self.requested_pages.append(params["startAt"])
+            return httpx.Response(500, text="Internal error")
+        return super()._search(params)
+
+def test_failed_page_raises_instead_of_truncating():
+    """
+    Test that a page failing mid-project raises in the sync and async services instead of returning part of the project.
+    """
+    sync_service = JiraService("https://example.atlassian.net", "qa@example.com", "token", transport=FailingPageTransport(250, 100))
+    async_service = AsyncJiraService("https://example.atlassian.net", "qa@example.com", "token", transport=FailingPageTransport(250, 100))
+
+    for fetch in (lambda: sync_service.get_all_user_stories("TG", "Story"), lambda: asyncio.run(async_service.get_all_user_stories("TG", "Story"))):
+        try:
+            fetch()
+            assert False, "A failed page must not return a truncated story list"
+        except RuntimeError as e:
+            assert "startAt=100" in str(e)
+
+    # Non-strict iteration still stops quietly at the failed page
+    partial = list(sync_service.iter_issues("project=TG", "summary", strict=False))
+    assert len(partial) == 100
+
+class IssueTransport(HTTPTransport):
+    """
+    Transport serving single-issue fetches and recording the requested fields.
+    """
+    def __init__(self):
+        super().__init__()
+        self.updated = "2025-01-01T10:00:00.000+0000"
+        self.requested_fields = []
+
+    def request(self, method, url, **kwargs):
+        fields = kwargs["params"]["fields"]
+        self.requested_fields.append(fields)
+        issue = make_issue(1)
+        issue["fields"]["updated"] = self.updated
+        if fields == "updated":
+            issue["fields"] = {"updated": self.updated}
+        return httpx.Response(200, json=issue)
+
+def test_story_cache_revalidates_by_updated_timestamp():
+    """
+    Test that stale cache entries are revalidated with an `updated`-only fetch
+    and only refetched in full when the story changed.
+    """
+    transport = IssueTransport()
+    cache = StoryCache(max_entries=10, ttl=0)
+    service = JiraService("https://example.atlassian.net", "qa@example.com", "token", transport=transport, story_cache=cache)
+
+    first = service.get_user_story_by_key("TG-1")
+    second = service.get_user_story_by_key("TG-1")
+    assert second == first and second is not first
+    assert transport.requested_fields == ["summary,description,status,updated", "updated"]
+
+    transport.updated = "2025-01-02T10:00:00.000+0000"
+    third = service.get_user_story_by_key("TG-1")
+    assert third["fields"]["updated"] == transport.updated
+    assert transport.requested_fields[-2:] == ["updated", "summary,description,status,updated"]
+
+    stats = cache.stats()
+    assert stats["misses"] == 2
+    assert stats["revalidated"] == 1
+
+def test_story_cache_fresh_hits_and_lru_eviction():
+    """
+    Test that fresh entries are served without any request and the least recently used entry is evicted.
+    """
+    transport = IssueTransport()
+    cache = StoryCache(max_entries=2, ttl=60)
+    service = JiraService("https://example.atlassian.net", "qa@example.com", "token", transport=transport, story_cache=cache)
+
+    first = service.get_user_story_by_key("TG-1")
+    first["fields"]["summary"] = "Modified by a caller"
+    second = service.get_user_story_by_key("TG-1")
+    assert len(transport.requested_fields) == 1
+    assert cache.stats()["hits"] == 1
+    assert second["fields"]["summary"] != "Modified by a caller"
+
+    service.get_user_story_by_key("TG-2")
+    service.get_user_story_by_key("TG-3")
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+class KeySearchTransport(HTTPTransport):
+    """
+    Transport answering `key in (...)` searches from a fake project of 150 issues.
+    """
+    def __init__(self):
+        super().__init__()
+        self.issues = {f"TG-{i}": make_issue(i) for i in range(1, 151)}
+        self.chunks = []
+
+    def _search(self, params):
+        keys = params["jql"][len("key in ("):-1].split(",")
+        self.chunks.append(keys)
+        # Jira returns matches in its own order, not the requested one
+        found = [self.issues[key] for key in reversed(keys) if key in self.issues]
+        return httpx.Response(200, json={"startAt": 0, "maxResults": params["maxResults"], "total": len(found), "issues": found})
+
+    def request(self, method, url, **kwargs):
+        return self._search(kwargs["params"])
+
+    async def arequest(self, method, url, **kwargs):
+        return self._search(kwargs["params"])
+
+def test_get_user_stories_by_keys_chunks_and_keeps_order():
+    """
+    Test that bulk fetch searches in chunks and reports results in input order with not-found keys.
+    """
+    transport = KeySearchTransport()
+    service = JiraService("https://example.atlassian.net", "qa@example.com", "token", transport=transport, story_cache=StoryCache())
+    keys = [f"TG-{i}" for i in range(200, 0, -1)]
+
+    result = service.get_user_stories_by_keys(keys)
+
+    assert [len(chunk) for chunk in transport.chunks] == [100, 100]
+    assert [item["key"] for item in result["results"]] == keys
+    assert all(item["story"]["key"] == item["key"] for item in result["results"] if item["found"])
+    assert result["not_found"] == [f"TG-{i}" for i in range(200, 150, -1)]
+    assert result["failed"] == []
+
+def test_async_get_user_stories_by_keys_populates_cache():
+    """
+    Test that the async bulk fetch fills the story cache so later single fetches skip Jira.
+    """
+    transport = KeySearchTransport()
+    cache = StoryCache(ttl=60)
+    service = AsyncJiraService("https://example.atlassian.net", "qa@example.com", "token", transport=transport, story_cache=cache)
+
+    result = asyncio.run(service.get_user_stories_by_keys(["tg-2", "TG-1", "TG-999"]))
+
+    assert [item["found"] for item in result["results"]] == [True, True, False]
+    assert result["not_found"] == ["TG-999"]
+    story = asyncio.run(service.get_user_story_by_key("TG-1"))
+    assert story["key"] == "TG-1"
+    assert len(transport.chunks) == 1
+
+def test_bulk_fetch_never_sends_invalid_keys_to_jql():
+    """
+    Test that keys that are not Jira issue keys are reported as invalid and kept out of the JQL.
+    """
+    transport = KeySearchTransport()
+    service = JiraService("https://example.atlassian.net", "qa@example.com", "token", transport=transport, story_cache=StoryCache())
+    injected = "TG-1) OR project = SECRET OR key in (X-1"
+
+    result = service.get_user_stories_by_keys([injected, " tg-2 ", "TG-", "TG-3"])
+
+    assert transport.chunks == [["TG-2", "TG-3"]]
+    assert [item["found"] for item in result["results"]] == [False, True, False, True]
+    assert result["results"][0]["error"] == "Invalid issue key"
+    assert result["invalid"] == [injected, "TG-"]
+    assert result["not_found"] == []
+
+class MirrorJiraService(JiraService):
+    """
+    JiraService returning canned issues and recording the JQL of each sync.
+    """
+    def __init__(self):
+        super().__init__("https://example.atlassian.net", "qa@example.com", "token", story_cache=StoryCache())
+        self.issues = []
+        self.queries = []
+
+    def iter_issues(self, jql, fields, page_size=None, strict=False):
+        self.queries.append(jql)
+        return iter(self.issues)
+
+def test_sync_project_is_incremental(test_db, db_session):
+    """
+    Test that the first sync pulls the whole project and later syncs only request recently updated issues.
+    """
+    service = MirrorJiraService()
+    issue = make_issue(1)
+    issue["fields"].update({
+        "updated": "2025-01-01T10:00:00.000+0000",
+        "issuetype": {"name": "Story"},
+        "description": {"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "Users log in"}]}]}
+    })
+    service.issues = [issue]
+
+    first = jira_mirror.sync_project(db_session, service, "TG")
+    assert first["incremental"] is False
+    assert first["written"] == 1
+    assert service.queries[0] == "project=TG ORDER BY updated ASC"
+
+    second = jira_mirror.sync_project(db_session, service, "TG")
+    assert second["incremental"] is True
+    assert second["written"] == 0
+    assert "updated >= -" in service.queries[1]
+
+    story = jira_mirror.get_mirrored_story(db_session, "TG-1")
+    assert story["description"] == "Users log in"
+    assert story["id"] == "10001"
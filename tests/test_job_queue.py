@@ -0,0 +1,128 @@
+# tests/test_job_queue.py
+
+import json
+from datetime import timedelta
+from app import crud, schemas
+from app.job_queue import JobQueue, job_summary
+from .conftest import TestingSessionLocal
+
+TEST_CASES = [{"title": f"Case {i}", "steps": []} for i in range(3)]
+
+class FakeAIService:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_and_normalize_test_cases(self, issue_key, model, temperature, max_tokens, story=None, use_cache=True):
+        self.calls += 1
+        return list(TEST_CASES)
+
+class FakePMService:
+    """
+    PMService stand-in generating three test cases, rejecting pushes of "Case 1"
+    and skipping cases it already created as unchanged, like the sync ledger.
+    """
+    def __init__(self):
+        self.ai_service = FakeAIService()
+        self.pushed = []
+        self.batches = []
+        self.known = set()
+
+    def push_test_cases(self, project_key, test_cases, concurrency=None):
+        self.batches.append(len(test_cases))
+        outcomes = []
+        for index, test_case in enumerate(test_cases):
+            title = test_case["title"]
+            self.pushed.append(title)
+            if title == "Case 1":
+                status, error = "failed", "rejected"
+            elif title in self.known:
+                status, error = "unchanged", None
+            else:
+                status, error = "created", None
+                self.known.add(title)
+            outcomes.append({"index": index, "title": title, "status": status, "error": error})
+        counts = {status: sum(1 for outcome in outcomes if outcome["status"] == status) for status in ("created", "updated", "unchanged", "failed")}
+        return {**counts, "results": outcomes}
+
+def make_queue(pm_service, push_batch=None):
+    return JobQueue(pm_service, session_factory=TestingSessionLocal, workers=0, push_batch=push_batch)
+
+def test_job_generates_and_pushes(test_db, db_session):
+    """
+    Test that a queued job generates, pushes every test case and records progress and failures.
+    """
+    pm_service = FakePMService()
+    queue = make_queue(pm_service)
+    job = queue.enqueue(db_session, schemas.JobCreate(issue_key="TG-1", project_key="TG"))
+    assert job.status == "queued"
+
+    assert queue.run_next() is True
+    assert queue.run_next() is False
+
+    db_session.expire_all()
+    summary = job_summary(crud.get_job(db_session, job.id), include_test_cases=True)
+    assert summary["status"] == "succeeded"
+    assert summary["progress"] == {"generated": 3, "pushed": 2, "push_unchanged": 0, "push_failed": 1, "push_position": 3}
+    assert summary["push_errors"] == [{"index": 1, "title": "Case 1", "error": "rejected"}]
+    assert pm_service.pushed == ["Case 0", "Case 1", "Case 2"]
+
+def test_interrupted_job_resumes_without_regenerating(test_db, db_session):
+    """
+    Test that a job left running by a shutdown is requeued and continues from its push position.
+    """
+    pm_service = FakePMService()
+    queue = make_queue(pm_service)
+    job = queue.enqueue(db_session, schemas.JobCreate(issue_key="TG-1", project_key="TG"))
+    job = crud.update_job(db_session, job, job.created_at, status="running", test_cases=json.dumps(TEST_CASES), generated=3, pushed=2, push_failed=0, push_position=2)
+
+    # Simulate a restart: running jobs go back to the queue
+    assert make_queue(pm_service).resume_interrupted() == 1
+    assert queue.run_next() is True
+    db_session.expire_all()
+    job = crud.get_job(db_session, job.id)
+
+    assert job.status == "succeeded"
+    assert pm_service.ai_service.calls == 0
+    assert pm_service.pushed == ["Case 2"]
+    assert job.pushed == 3
+    assert job.attempts == 1
+
+def test_resumed_batch_counts_unchanged_cases_separately(test_db, db_session):
+    """
+    Test that a job pushes in concurrent batches and that cases of an interrupted batch
+    which AIO already has are counted as unchanged, not pushed.
+    """
+    pm_service = FakePMService()
+    pm_service.known.add("Case 0")
+    queue = make_queue(pm_service, push_batch=2)
+    job = queue.enqueue(db_session, schemas.JobCreate(issue_key="TG-1", project_key="TG"))
+    crud.update_job(db_session, job, job.created_at, test_cases=json.dumps(TEST_CASES), generated=3)
+
+    assert queue.run_next() is True
+    db_session.expire_all()
+    summary = job_summary(crud.get_job(db_session, job.id), include_test_cases=True)
+
+    assert pm_service.batches == [2, 1]
+    assert summary["progress"] == {"generated": 3, "pushed": 1, "push_unchanged": 1, "push_failed": 1, "push_position": 3}
+    assert summary["push_errors"] == [{"index": 1, "title": "Case 1", "error": "rejected"}]
+
+def test_only_jobs_with_expired_leases_are_requeued(test_db, db_session):
+    """
+    Test that a job running under another process's live lease is left alone, and requeued once the lease expires.
+    """
+    pm_service = FakePMService()
+    running = make_queue(pm_service)
+    other = make_queue(pm_service)
+    job = running.enqueue(db_session, schemas.JobCreate(issue_key="TG-1", project_key="TG"))
+    claimed = crud.claim_next_job(db_session, job.created_at, running.owner, running._lease_expiry())
+    assert claimed.lease_owner == running.owner
+
+    assert other.resume_interrupted() == 0
+    assert running.renew_leases() == 1
+    assert other.renew_leases() == 0
+
+    crud.update_job(db_session, claimed, claimed.created_at, lease_expires_at=claimed.created_at - timedelta(seconds=1))
+    assert other.resume_interrupted() == 1
+    db_session.expire_all()
+    job = crud.get_job(db_session, job.id)
+    assert (job.status, job.lease_owner) == ("queued", None)
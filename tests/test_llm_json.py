@@ -0,0 +1,57 @@
+# tests/test_llm_json.py
+
+import json
+from app.llm_json import JSONArrayStreamParser, extract_json_array, strip_trailing_commas
+
+LLM_OUTPUT = (
+    "Here are the test cases [draft]:\n"
+    "[\n"
+    '  {"title": "Quote \\" and brace } in [text]", "steps": [{"step": "Open", "expectedResult": "Opened"}]},\n'
+    '  {"title": "Trailing comma", "steps": [],},\n'
+    '  {"title": "Cut off by max_tokens", "steps": [{"step": "Cli'
+)
+
+def feed_in_chunks(text: str, size: int):
+    parser = JSONArrayStreamParser()
+    objects = []
+    for start in range(0, len(text), size):
+        objects.extend(parser.feed(text[start:start + size]))
+    return parser, objects
+
+def test_stream_parser_emits_objects_regardless_of_chunking():
+    """
+    Test that complete objects are emitted for any chunk size, ignoring prose and bracketed text before the array.
+    """
+    for size in (1, 2, 3, 7, 64, len(LLM_OUTPUT)):
+        parser, objects = feed_in_chunks(LLM_OUTPUT, size)
+        assert [obj["title"] for obj in objects] == ['Quote " and brace } in [text]', "Trailing comma"]
+        assert parser.truncated
+        assert not parser.complete
+
+def test_stream_parser_stops_at_end_of_array():
+    """
+    Test that text after the closing bracket is ignored.
+    """
+    text = json.dumps([{"title": "One"}, {"title": "Two"}]) + ' and also [{"title": "Ignored"}]'
+    parser, objects = feed_in_chunks(text, 5)
+    assert [obj["title"] for obj in objects] == ["One", "Two"]
+    assert parser.complete
+
+def test_extract_json_array_salvages_truncated_output():
+    """
+    Test that complete objects are kept when the array is cut off, and trailing commas inside strings are preserved.
+    """
+    objects, complete = extract_json_array(LLM_OUTPUT)
+    assert [obj["title"] for obj in objects] == ['Quote " and brace } in [text]', "Trailing comma"]
+    assert not complete
+
+    text = 'Sure:\n[{"title": "Comma, }", "steps": [1, 2,],}, {"title": "Two"},\n]\nDone.'
+    objects, complete = extract_json_array(text)
+    assert objects == [{"title": "Comma, }", "steps": [1, 2]}, {"title": "Two"}]
+    assert complete
+
+def test_strip_trailing_commas_ignores_string_contents():
+    """
+    Test that only structural trailing commas are removed.
+    """
+    assert strip_trailing_commas('{"a": ", ]", "b": "\\\\", "c": [1,],}') == '{"a": ", ]", "b": "\\\\", "c": [1]}'
@@ -1,5 +1,7 @@
 # tests/test_main.py
 
+import json
+from datetime import datetime
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -131,4 +133,148 @@ def test_delete_case_api(test_db, db_session):
     get_response = client.get(f"/cases/{new_case.id}")
     assert get_response.status_code == 404
     assert get_response.json() == {"detail": "Case not found"}
-    
\ No newline at end of file
+    
+def test_transport_stats_api(test_db, db_session):
+    """
+    Test that the shared HTTP transport exposes its pool statistics.
+    """
+    response = client.get("/transport/stats")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert "pool_maxsize" in data
+    assert isinstance(data["hosts"], dict)
+
+def test_get_jira_stories_stream_api(test_db, db_session, monkeypatch):
+    """
+    Test that the stories endpoint streams one NDJSON line per story.
+    """
+    from app import main
+
+    async def fake_iter_user_stories(project_key, issue_type):
+        for number in range(1, 4):
+            yield {"key": f"TG-{number}", "summary": f"Story {number}", "description": None, "status": "To Do"}
+
+    monkeypatch.setattr(main.async_jira_service, "iter_user_stories", fake_iter_user_stories)
+
+    response = client.get("/jira/stories/", params={"project_key": "TG", "issue_type": "Story", "stream": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [story["key"] for story in lines] == ["TG-1", "TG-2", "TG-3"]
+
+def test_get_jira_stories_from_mirror_requires_sync(test_db, db_session):
+    """
+    Test that listing an unsynced project from the mirror is a 409 instead of an empty list, and that source is validated.
+    """
+    params = {"project_key": "TG", "issue_type": "Story", "source": "mirror"}
+    assert client.get("/jira/stories/", params=params).status_code == 409
+
+    crud.set_jira_sync_state(db_session, "TG", datetime(2025, 1, 1))
+    response = client.get("/jira/stories/", params=params)
+    assert response.status_code == 200
+    assert response.json() == []
+
+    assert client.get("/jira/stories/", params={**params, "source": "cache"}).status_code == 422
+
+def test_create_and_get_job_api(test_db, db_session):
+    """
+    Test that a job is queued immediately and can be polled by id.
+    """
+    response = client.post("/jobs", json={"issue_key": "TG-1", "project_key": "TG"})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.json()["status"] == "queued"
+
+    response = client.get(f"/jobs/{job_id}")
+    assert response.status_code == 200
+    assert response.json()["progress"]["generated"] == 0
+    assert response.json()["test_cases"] == []
+
+    assert client.post("/jobs", json={"issue_key": "TG-1"}).status_code == 400
+    assert client.get("/jobs/999999").status_code == 404
+
+def test_aio_outbox_api(test_db, db_session):
+    """
+    Test that outbox entries can be listed and inspected, and that only unsent entries are replayed.
+    """
+    now = datetime.now()
+    dead = crud.create_outbox_entry(db_session, "TG", "Login", json.dumps({"title": "Login", "steps": []}), now)
+    crud.update_outbox_entry(db_session, dead, now, status="dead", attempts=6, last_status_code=503, last_error="Service unavailable")
+    sent = crud.create_outbox_entry(db_session, "TG", "Logout", json.dumps({"title": "Logout", "steps": []}), now)
+    crud.update_outbox_entry(db_session, sent, now, status="sent", aio_key="TG-TC-1", sent_at=now)
+
+    response = client.get("/aio/outbox", params={"status": "dead"})
+    assert response.status_code == 200
+    assert response.json()["counts"] == {"dead": 1, "sent": 1}
+    assert [entry["title"] for entry in response.json()["entries"]] == ["Login"]
+    assert client.get(f"/aio/outbox/{dead.id}").json()["payload"] == {"title": "Login", "steps": []}
+
+    response = client.post(f"/aio/outbox/{dead.id}/replay")
+    assert response.status_code == 200
+    assert (response.json()["status"], response.json()["attempts"]) == ("pending", 0)
+    assert client.post(f"/aio/outbox/{sent.id}/replay").status_code == 409
+    assert client.get("/aio/outbox/999999").status_code == 404
+
+def test_race_stats_api(test_db, db_session):
+    """
+    Test that recorded races are aggregated per winning model.
+    """
+    now = datetime.now()
+    crud.create_model_race_result(db_session, "TG-1", "fast", 100.0, 0.0, ["fast", "slow"], [], now)
+    crud.create_model_race_result(db_session, "TG-2", "fast", 300.0, 0.0, ["fast", "slow"], [], now)
+
+    response = client.get("/ai/race/stats")
+    assert response.status_code == 200
+    assert response.json() == [{"model": "fast", "wins": 2, "avg_latency_ms": 200.0}]
+
+def test_prompt_token_report_api(test_db, db_session, monkeypatch):
+    """
+    Test that the token report compares the legacy prompt with the static-prefix prompt per story.
+    """
+    from app import main
+
+    async def fake_get_user_stories_by_keys(issue_keys, concurrency=None):
+        story = {"key": "TG-1", "id": "10001", "fields": {"summary": "User login", "description": None}}
+        return {"results": [{"key": "TG-1", "found": True, "story": story}, {"key": "TG-404", "found": False, "error": "Not found"}]}
+
+    monkeypatch.setattr(main.async_jira_service, "get_user_stories_by_keys", fake_get_user_stories_by_keys)
+
+    response = client.post("/ai/prompt/token-report", json={"issue_keys": ["TG-1", "TG-404"]})
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["not_found"] == ["TG-404"]
+    report = data["stories"][0]
+    assert report["key"] == "TG-1"
+    assert report["story_tokens"] < report["before_tokens"]
+    assert report["after_tokens"] == report["static_prefix_tokens"] + report["story_tokens"]
+
+def test_story_test_set_and_cycle_api_reports_aio_failures(test_db, db_session, monkeypatch):
+    """
+    Test that the one-shot set and cycle endpoint answers 502 with the AIO error when nothing could be grouped.
+    """
+    from app import main
+
+    result = {"test_cases": [{"title": "Login"}], "push": {"results": [{"status": "failed", "error": "HTTP 503"}]}, "test_set": None, "test_cycle": None}
+
+    async def fake_create_story_test_set_and_cycle(*args):
+        return result
+
+    monkeypatch.setattr(main.async_pm_service, "create_story_test_set_and_cycle", fake_create_story_test_set_and_cycle)
+    url = "/jira/project/TG/story/TG-1/create-test-set-and-cycle"
+
+    response = client.post(url)
+    assert response.status_code == 502
+    assert "HTTP 503" in response.json()["detail"]
+
+    result.update(push={"results": [{"status": "created", "key": "TG-TC-1"}]}, test_set={"status": "failed", "key": None, "error": "HTTP 400"})
+    response = client.post(url)
+    assert response.status_code == 502
+    assert response.json()["detail"] == "AIO test set was not created: HTTP 400"
+
+    result.update(test_set={"status": "created", "key": "TG-TS-1", "error": None}, test_cycle={"status": "created", "key": "TG-CY-1", "error": None})
+    response = client.post(url)
+    assert response.status_code == 200
+    assert response.json()["message"] == "Generated 1 test cases, test set TG-TS-1, test cycle TG-CY-1"
@@ -0,0 +1,364 @@
+# tests/test_pm_service.py
+
+import asyncio
+import time
+from datetime import timedelta
+import httpx
+import requests
+from app.aio_ledger import AIOSyncLedger
+from app import crud
+from app.aio_outbox import AIOOutbox, OutboxDrainer, backoff_delay
+from app.config import settings
+from app.schemas import JiraTestSetCreate
+from app.http_transport import HostRateLimiter, HTTPTransport
+from app.pm_service import AsyncPMService, PMService
+from .conftest import TestingSessionLocal
+
+class AIOTransport(HTTPTransport):
+    """
+    Transport answering AIO test case creates and updates after a delay, rejecting titles containing "bad".
+    Updates of keys in `deleted` answer 404; titles in `failures` first answer their listed statuses.
+    Test sets and cycles are created with their own keys; link batches containing "TG-TC-BAD" are rejected.
+    """
+    def __init__(self, delay: float = 0.0):
+        super().__init__()
+        self.delay = delay
+        self.created = []
+        self.updated = []
+        self.deleted = set()
+        self.failures = {}
+        self.links = []
+
+    def _answer(self, method, url, test_case):
+        if url.endswith(("/testset", "/testcycle")):
+            kind = "TS" if url.endswith("/testset") else "CY"
+            return 200, {"ID": 1, "key": f"TG-{kind}-1", "name": test_case["name"]}
+        if url.endswith(("/testcases", "/testsets")):
+            keys = test_case.get("testCaseKeys") or test_case.get("testSetKeys")
+            if "TG-TC-BAD" in keys:
+                return 400, {"message": "Unknown test case"}
+            self.links.append((url.split("/project/TG/")[-1], keys))
+            return 200, {}
+        if self.failures.get(test_case["title"]):
+            return self.failures[test_case["title"]].pop(0), {"message": "Service unavailable"}
+        if "bad" in test_case["title"]:
+            return 400, {"message": "Invalid steps"}
+        if method == "PUT":
+            key = url.rsplit("/", 1)[-1]
+            if key in self.deleted:
+                return 404, {"message": "Test case not found"}
+            self.updated.append(key)
+            return 200, {}
+        self.created.append(test_case["title"])
+        return 200, {"ID": len(self.created), "key": f"TG-TC-{len(self.created)}"}
+
+    async def arequest(self, method, url, **kwargs):
+        await asyncio.sleep(self.delay)
+        status, body = self._answer(method, url, kwargs["json"])
+        return httpx.Response(status, json=body)
+
+    def request(self, method, url, **kwargs):
+        time.sleep(self.delay)
+        status, body = self._answer(method, url, kwargs["json"])
+        response = requests.Response()
+        response.status_code = status
+        response._content = httpx.Response(status, json=body).content
+        return response
+
+class FakeAIService:
+    def __init__(self, titles):
+        self.titles = titles
+
+    def generate_and_normalize_test_cases(self, issue_key, model, temperature, max_tokens, story=None, use_cache=True):
+        return [{"title": title, "steps": []} for title in self.titles]
+
+class StreamingAIService:
+    """
+    AIService stand-in streaming one test case every `delay` seconds.
+    """
+    def __init__(self, titles, delay):
+        self.titles = titles
+        self.delay = delay
+
+    async def stream_test_cases(self, issue_key, model, temperature, max_tokens, story=None, use_cache=True):
+        for index, title in enumerate(self.titles):
+            await asyncio.sleep(self.delay)
+            yield {"event": "test_case", "index": index, "test_case": {"title": title, "steps": []}}
+        yield {"event": "done", "total": len(self.titles), "cached": False, "truncated": False, "finish_reason": "stop"}
+
+def make_service(service_class, transport, rate_limiter=None):
+    # Each service gets a ledger and outbox on the test database, emptied by the db_session fixture
+    return service_class(
+        aio_api_url="https://aio.example.com/api/v1",
+        aio_api_token="token",
+        jira_domain="https://example.atlassian.net",
+        jira_email="qa@example.com",
+        jira_api_token="token",
+        openrouter_url="https://openrouter.ai/api/v1/chat/completions",
+        openrouter_api_key="key",
+        transport=transport,
+        rate_limiter=rate_limiter or HostRateLimiter(rate=0),
+        ledger=AIOSyncLedger(session_factory=TestingSessionLocal),
+        outbox=AIOOutbox(session_factory=TestingSessionLocal)
+    )
+
+TEST_CASES = [{"title": f"Case {i}", "steps": []} for i in range(9)] + [{"title": "bad case", "steps": []}]
+
+def test_async_push_runs_concurrently_with_per_case_outcomes(test_db, db_session):
+    """
+    Test that a story's cases are pushed in about one round trip and each case reports its outcome.
+    """
+    transport = AIOTransport(delay=0.2)
+    service = make_service(AsyncPMService, transport)
+
+    started = time.perf_counter()
+    push = asyncio.run(service.push_test_cases("TG", TEST_CASES, concurrency=10))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.5
+    assert (push["total"], push["created"], push["failed"]) == (10, 9, 1)
+    assert [outcome["index"] for outcome in push["results"]] == list(range(10))
+    assert push["results"][0]["key"].startswith("TG-TC-")
+    failed = push["results"][9]
+    assert failed["status"] == "failed"
+    assert failed["status_code"] == 400
+    assert "Invalid steps" in failed["error"]
+
+def test_sync_push_respects_rate_limit(test_db, db_session):
+    """
+    Test that the thread pool push keeps outcomes in order and requests beyond the burst are spaced.
+    """
+    transport = AIOTransport()
+    service = make_service(PMService, transport, HostRateLimiter(rate=20, burst=5))
+
+    started = time.perf_counter()
+    push = service.push_test_cases("TG", TEST_CASES, concurrency=10)
+    elapsed = time.perf_counter() - started
+
+    assert [outcome["title"] for outcome in push["results"]] == [case["title"] for case in TEST_CASES]
+    assert push["created"] == 9
+    assert elapsed >= 0.2
+    assert "Invalid steps" in service.send_to_aio("TG", {"title": "bad again", "steps": []})["error"]
+
+def test_ledger_skips_unchanged_and_updates_changed_cases(test_db, db_session):
+    """
+    Test that pushing a story's cases again creates nothing: unchanged cases are skipped,
+    changed ones update their AIO test case and cases deleted in AIO are created again.
+    """
+    transport = AIOTransport()
+    service = make_service(PMService, transport)
+    cases = [{"title": f"Login {i}", "steps": [{"step": "Open", "data": "", "expectedResult": "Shown"}], "jiraRequirementIDs": ["10001"]} for i in range(3)]
+
+    first = service.push_test_cases("TG", cases)
+    assert (first["created"], first["unchanged"]) == (3, 0)
+    keys = [outcome["key"] for outcome in first["results"]]
+
+    regenerated = [dict(case) for case in cases]
+    regenerated[1]["steps"] = [{"step": "Open", "data": "", "expectedResult": "Login form shown"}]
+    regenerated[2]["precondition"] = "User is registered"
+    transport.deleted.add(keys[2])
+    second = asyncio.run(make_service(AsyncPMService, transport).push_test_cases("TG", regenerated))
+
+    assert [outcome["status"] for outcome in second["results"]] == ["unchanged", "updated", "created"]
+    assert second["results"][0]["key"] == keys[0]
+    assert second["results"][1]["key"] == keys[1]
+    assert transport.updated == [keys[1]]
+    assert len(transport.created) == 4
+
+    # The recreated case is tracked under its new key; another project is a separate identity
+    assert service.send_to_aio("TG", regenerated[2]) == "Test case unchanged, skipped"
+    assert service.send_to_aio("QA", cases[0]) == "Test case created successfully"
+
+def test_concurrent_pushes_of_one_case_create_it_once(test_db, db_session):
+    """
+    Test that the same case pushed concurrently, by duplicates in a batch and by two services,
+    is created once while the other pushes wait for it and report it unchanged.
+    """
+    transport = AIOTransport(delay=0.1)
+    case = {"title": "Login", "steps": [], "jiraRequirementIDs": ["10001"]}
+
+    async def push_twice():
+        return await asyncio.gather(
+            make_service(AsyncPMService, transport).push_test_cases("TG", [case, dict(case)]),
+            make_service(AsyncPMService, transport).sync_aio_test_case("TG", dict(case)),
+        )
+
+    batch, single = asyncio.run(push_twice())
+
+    assert transport.created == ["Login"]
+    statuses = [outcome["status"] for outcome in batch["results"]] + [single["status"]]
+    assert sorted(statuses) == ["created", "unchanged", "unchanged"]
+    assert len({outcome["key"] for outcome in batch["results"]} | {single["key"]}) == 1
+
+def test_failed_create_releases_its_claim(test_db, db_session):
+    """
+    Test that a case AIO rejected can be pushed again right away instead of waiting for its claim to expire.
+    """
+    transport = AIOTransport()
+    transport.failures["Login"] = [400]
+    service = make_service(PMService, transport)
+    case = {"title": "Login", "steps": []}
+
+    assert service.sync_aio_test_case("TG", case)["status"] == "failed"
+    started = time.perf_counter()
+    assert service.sync_aio_test_case("TG", case)["status"] == "created"
+    assert time.perf_counter() - started < 1.0
+
+def test_outbox_retries_failed_pushes_and_dead_letters(test_db, db_session):
+    """
+    Test that a push failing with 5xx is stored and delivered by the drainer, a 4xx answer is
+    dead-lettered at once, an entry failing every attempt is dead-lettered and replay sends it again.
+    """
+    transport = AIOTransport()
+    service = make_service(PMService, transport)
+    service.outbox = AIOOutbox(session_factory=TestingSessionLocal, max_attempts=3, backoff_base=0)
+    drainer = OutboxDrainer(service)
+    transport.failures = {"Flaky": [503, 502], "Down": [503, 503, 503]}
+
+    push = service.push_test_cases("TG", [{"title": "Flaky", "steps": []}, {"title": "Down", "steps": []}, {"title": "bad case", "steps": []}])
+    assert (push["failed"], push["retrying"]) == (3, 2)
+    assert push["results"][2]["outbox"] == "dead"
+
+    # Flaky succeeds on its third attempt; Down fails its third and last attempt
+    assert drainer.run_once() == 2
+    assert drainer.run_once() == 2
+    assert drainer.run_once() == 0
+    db_session.expire_all()
+    entries = {entry.title: entry for entry in crud.get_outbox_entries(db_session)}
+    assert (entries["Flaky"].status, entries["Flaky"].attempts) == ("sent", 3)
+    assert entries["Flaky"].aio_key == "TG-TC-1"
+    assert (entries["Down"].status, entries["Down"].attempts, entries["Down"].last_status_code) == ("dead", 3, 503)
+    assert (entries["bad case"].status, entries["bad case"].attempts) == ("dead", 1)
+
+    drainer.replay(db_session, entries["Down"])
+    assert drainer.run_once() == 1
+    db_session.expire_all()
+    assert crud.get_outbox_entry(db_session, entries["Down"].id).status == "sent"
+    assert transport.created == ["Flaky", "Down"]
+    assert crud.count_outbox_entries(db_session) == {"sent": 2, "dead": 1}
+
+def test_drainer_only_retries_pushes_whose_lease_expired(test_db, db_session):
+    """
+    Test that a drainer leaves an entry sent by a live push alone, and retries it once the sender's lease expired.
+    """
+    transport = AIOTransport()
+    service = make_service(PMService, transport)
+    drainer = OutboxDrainer(service)
+    entry_id = service.outbox.add("TG", {"title": "Login", "steps": []})
+
+    assert drainer.run_once() == 0
+    entry = crud.get_outbox_entry(db_session, entry_id)
+    assert entry.status == "sending" and entry.claimed_until > entry.created_at
+
+    crud.update_outbox_entry(db_session, entry, entry.created_at, claimed_until=entry.created_at - timedelta(seconds=1))
+    assert drainer.run_once() == 1
+    db_session.expire_all()
+    entry = crud.get_outbox_entry(db_session, entry_id)
+    assert (entry.status, entry.attempts, entry.claimed_until) == ("sent", 2, None)
+    assert transport.created == ["Login"]
+
+def test_backoff_grows_exponentially_with_jitter():
+    """
+    Test that retry delays double per attempt, stay within half and all of the nominal delay and are capped.
+    """
+    for attempts, nominal in ((1, 2.0), (2, 4.0), (4, 16.0)):
+        delays = [backoff_delay(attempts, 2.0, 300.0) for _ in range(50)]
+        assert all(nominal / 2 <= delay <= nominal for delay in delays)
+        assert len(set(delays)) > 1
+    assert backoff_delay(20, 2.0, 300.0) <= 300.0
+
+def test_pipelined_push_overlaps_generation(test_db, db_session):
+    """
+    Test that each streamed test case is pushed while the next ones are generated,
+    so the total time is about the generation time plus one push, not their sum.
+    """
+    transport = AIOTransport(delay=0.2)
+    service = make_service(AsyncPMService, transport)
+    service.ai_service = StreamingAIService([f"Case {i}" for i in range(5)] + ["bad case"], delay=0.2)
+
+    started = time.perf_counter()
+    result = asyncio.run(service.pipeline_generated_test_cases("TG", "TG-1", push_concurrency=1))
+    elapsed = time.perf_counter() - started
+
+    # Serial phases would take 1.2 s of generation plus 1.2 s of one-at-a-time pushes
+    assert elapsed < 2.0
+    assert result["generation"]["event"] == "done"
+    assert result["generation"]["generation_ms"] >= 1200
+    assert [case["title"] for case in result["test_cases"]] == [outcome["title"] for outcome in result["push"]["results"]]
+    assert (result["push"]["created"], result["push"]["failed"]) == (5, 1)
+
+def test_cancelled_pipeline_cancels_its_pending_pushes(test_db, db_session):
+    """
+    Test that cancelling a pipelined generation mid-stream cancels the pushes already started instead of orphaning them.
+    """
+    transport = AIOTransport(delay=1.0)
+    service = make_service(AsyncPMService, transport)
+    service.ai_service = StreamingAIService([f"Case {i}" for i in range(5)], delay=0.2)
+
+    async def run():
+        try:
+            await asyncio.wait_for(service.pipeline_generated_test_cases("TG", "TG-1"), timeout=0.5)
+            assert False, "The pipeline must be cancelled by the timeout"
+        except asyncio.TimeoutError:
+            pass
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert transport.created == []
+
+def test_test_set_links_keys_in_parallel_batches(test_db, db_session, monkeypatch):
+    """
+    Test that a test set's case keys are deduplicated and added in concurrent batches,
+    and that a rejected batch is reported without failing the others.
+    """
+    monkeypatch.setattr(settings, "AIO_LINK_BATCH_SIZE", 50)
+    transport = AIOTransport(delay=0.2)
+    service = make_service(AsyncPMService, transport)
+    keys = [f"TG-TC-{i}" for i in range(120)] + ["TG-TC-0", "TG-TC-BAD"]
+
+    started = time.perf_counter()
+    result = asyncio.run(service.create_aio_test_set("TG", JiraTestSetCreate(name="Login", test_case_keys=keys)))
+    elapsed = time.perf_counter() - started
+
+    # One create and three batches sent together: two round trips, not four
+    assert elapsed < 0.6
+    assert (result["status"], result["key"]) == ("created", "TG-TS-1")
+    assert [len(batch["keys"]) for batch in result["batches"]] == [50, 50, 21]
+    assert (result["linked"], result["link_failed"]) == (100, 21)
+    assert result["batches"][2]["status_code"] == 400
+    assert all(url == "testset/TG-TS-1/testcases" for url, _ in transport.links)
+
+def test_story_test_set_and_cycle(test_db, db_session):
+    """
+    Test that a story's pushed test cases are grouped in a new test set inside a new test cycle.
+    """
+    transport = AIOTransport()
+    service = make_service(PMService, transport)
+    service.ai_service = FakeAIService(["Login", "Logout", "bad case"])
+
+    result = service.create_story_test_set_and_cycle("TG", "TG-1")
+
+    assert (result["push"]["created"], result["push"]["failed"]) == (2, 1)
+    assert result["test_set"]["name"] == "TG-1 generated test cases"
+    assert sorted(result["test_set"]["batches"][0]["keys"]) == ["TG-TC-1", "TG-TC-2"]
+    assert (result["test_cycle"]["key"], result["test_cycle"]["linked"]) == ("TG-CY-1", 1)
+    assert transport.links[-1] == ("testcycle/TG-CY-1/testsets", ["TG-TS-1"])
+
+def test_async_connection_checks_await_the_services():
+    """
+    Test that the async Jira and AI connection checks await their services instead of inheriting the sync ones.
+    """
+    class JiraStub:
+        async def get_all_user_stories(self, project_key, issue_type):
+            return [{"key": "TG-1"}]
+
+    class AIStub:
+        async def process_jira_story_and_send_to_openrouter(self, **kwargs):
+            return {"test_cases": []}
+
+    service = make_service(AsyncPMService, AIOTransport())
+    service.jira_service = JiraStub()
+    service.ai_service = AIStub()
+
+    assert asyncio.run(service.test_jira_connection()) is True
+    assert asyncio.run(service.test_ai_connection()) is True